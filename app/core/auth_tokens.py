@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from cachetools import TLRUCache
+
+from source.load_env import SETTINGS
+from source.models.config.logging import logger
+
+# Verified claims are trusted this long before the token is checked again
+CLAIMS_CACHE_TTL = 60
+CLAIMS_CACHE_SIZE = 10000
+# Signing keys are refetched after this, or right away for an unknown kid
+JWKS_CACHE_TTL = 600
+JWT_AUDIENCE = "authenticated"
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+
+
+def _token_hash(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+def _claims_ttu(key: str, value: Tuple[Dict[str, Any], float], now: float) -> float:
+    claims, verified_at = value
+    return min(float(claims.get("exp", 0)), verified_at + CLAIMS_CACHE_TTL)
+
+
+class AccessTokenVerifier:
+    """
+    Verifies Supabase access tokens locally instead of asking the auth server.
+
+    Tokens signed with the project JWT secret are checked with HS256, tokens
+    signed with the asymmetric project keys against the cached JWKS. Verified
+    claims are kept by token hash until the token expires or CLAIMS_CACHE_TTL
+    passes, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        jwt_secret: Optional[str] = SETTINGS.supabase_jwt_secret,
+        supabase_url: Optional[str] = SETTINGS.supabase_url,
+    ):
+        self.jwt_secret = jwt_secret
+        self._jwks_client = (
+            jwt.PyJWKClient(
+                f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+                cache_keys=True,
+                lifespan=JWKS_CACHE_TTL,
+            )
+            if supabase_url
+            else None
+        )
+        self._claims: TLRUCache[str, Tuple[Dict[str, Any], float]] = TLRUCache(
+            maxsize=CLAIMS_CACHE_SIZE, ttu=_claims_ttu, timer=time.time
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _decode(self, access_token: str) -> Dict[str, Any]:
+        algorithm = jwt.get_unverified_header(access_token).get("alg")
+        options = {"require": ["exp", "sub"]}
+        if algorithm == "HS256":
+            if not self.jwt_secret:
+                raise jwt.InvalidTokenError("SUPABASE_JWT_SECRET is not set")
+            return jwt.decode(
+                access_token,
+                self.jwt_secret,
+                algorithms=["HS256"],
+                audience=JWT_AUDIENCE,
+                options=options,
+            )
+
+        if self._jwks_client is None:
+            raise jwt.InvalidTokenError("SUPABASE_URL is not set")
+        signing_key = self._jwks_client.get_signing_key_from_jwt(access_token)
+        return jwt.decode(
+            access_token,
+            signing_key.key,
+            algorithms=ASYMMETRIC_ALGORITHMS,
+            audience=JWT_AUDIENCE,
+            options=options,
+        )
+
+    def get_cached(self, access_token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._claims.get(_token_hash(access_token))
+        if entry is None:
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def verify(self, access_token: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the verified claims of the token, or None when it is expired,
+        invalid or can not be verified locally.
+        """
+        claims = self.get_cached(access_token)
+        if claims is not None:
+            return claims
+
+        self.misses += 1
+        try:
+            claims = self._decode(access_token)
+        except jwt.ExpiredSignatureError:
+            return None
+        except Exception as e:
+            logger.debug(f"Unable to verify access token locally: {e}")
+            return None
+
+        with self._lock:
+            self._claims[_token_hash(access_token)] = (claims, time.time())
+        return claims
+
+    async def verify_async(self, access_token: str) -> Optional[Dict[str, Any]]:
+        claims = self.get_cached(access_token)
+        if claims is not None:
+            return claims
+        # A JWKS fetch blocks, keep it off the event loop
+        return await asyncio.to_thread(self.verify, access_token)
+
+    def forget(self, access_token: str):
+        with self._lock:
+            self._claims.pop(_token_hash(access_token), None)
+
+
+token_verifier = AccessTokenVerifier()
@@ -12,18 +12,63 @@ from asgiref import sync
 # from source.models.config.default_env import IN_PRODUCTION
 from source.load_env import SETTINGS
 from source.models.config.logging import log_format, ColoredFormatter
-from celery.signals import after_setup_logger
+from source.chains.rate_limiter import PRIORITY_INTERACTIVE, llm_priority
+from source.chains.resilience import ProviderBackoff, ProviderUnavailable
+from celery.signals import after_setup_logger, before_task_publish, task_prerun
 
 _P = ParamSpec("_P")
 
 _R = TypeVar("_R")
 
+# Times a task is re-queued for a backing off llm provider before it fails
+PROVIDER_BACKOFF_MAX_RETRIES = 10
+
+
+def _retry_on_backoff(run):
+    # The run of a task without bind is a staticmethod, called without self
+    bound = not isinstance(run, staticmethod)
+    fun = run if bound else run.__func__
+
+    def run_with_retry(self, *args, **kwargs):
+        try:
+            return fun(self, *args, **kwargs) if bound else fun(*args, **kwargs)
+        except ProviderBackoff as e:
+            print(f"Task {self.name} deferred for {e.delay:.1f}s: {e}")
+            raise self.retry(
+                exc=ProviderUnavailable(str(e)),
+                countdown=e.delay,
+                max_retries=PROVIDER_BACKOFF_MAX_RETRIES,
+            )
+
+    run_with_retry.__name__ = fun.__name__
+    run_with_retry.__doc__ = fun.__doc__
+    return run_with_retry
+
+
+class ResilientTask(Task):
+    """
+    Re-queues the task with a countdown when the circuit of an llm provider
+    stays open, instead of sleeping in the worker.
+
+    The run of every task class is wrapped when the class is created, the
+    tracer calls run with its own request in place so replace, chords and
+    callbacks keep working.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        run = cls.__dict__.get("run")
+        if run is not None:
+            cls.run = _retry_on_backoff(run)
+
+
 celery_app = Celery(
     "tc_compute_api",
     broker=SETTINGS.redis_broker_url,
     backend=SETTINGS.redis_backend_url,
     include=[
         "source.panel.tasks",
+        "source.panel.pipeline",
         "source.helpers.communication",
         "source.helpers.push_notifications",
         "source.tasks.utils",
@@ -31,6 +76,7 @@ celery_app = Celery(
         "source.tasks.transcript",
     ],
     log="source.models.config.logging.CeleryLogger",
+    task_cls=ResilientTask,
 )
 
 # Ensure all handlers use the ColoredFormatter
@@ -46,6 +92,20 @@ def setup_celery_logger(logger, *args, **kwargs):
         )
 
 
+@before_task_publish.connect
+def propagate_llm_priority(headers=None, **kwargs):
+    # Tasks sent from a batch job stay in the batch lane of the rate limiter
+    if headers is not None:
+        headers.setdefault("llm_priority", llm_priority.get())
+
+
+@task_prerun.connect
+def apply_llm_priority(task=None, **kwargs):
+    llm_priority.set(
+        (task.request.get("llm_priority") if task else None) or PRIORITY_INTERACTIVE
+    )
+
+
 logging.config.dictConfig(
     {
         "version": 1,
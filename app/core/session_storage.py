@@ -1,10 +1,18 @@
-from cachetools import TTLCache
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import jwt
+from cachetools import TLRUCache, TTLCache
 
 from fastapi import HTTPException
 from supabase.client import AsyncClient, create_async_client, Client
 from supabase import ClientOptions, create_client
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 
+from app.core.auth_tokens import token_verifier
+from app.core.redis import get_async_redis_client, get_sync_redis_client
 from source.load_env import SETTINGS
 from source.models.config.logging import logger
 
@@ -64,6 +72,330 @@ def get_sync_supabase_client(
         raise e
 
 
+# Pooled clients are replaced this many seconds before their token expires
+TOKEN_EXPIRY_MARGIN = 60
+# Lifetime used when the expiry can not be read from the token
+DEFAULT_TOKEN_TTL = 3600
+
+
+def get_token_expiry(access_token: str) -> float:
+    """
+    Read the expiry timestamp from the access token without verifying it.
+    """
+    try:
+        claims = jwt.decode(access_token, options={"verify_signature": False})
+        return float(claims["exp"])
+    except Exception:
+        return time.time() + DEFAULT_TOKEN_TTL
+
+
+class PooledClient:
+    def __init__(
+        self,
+        client: Union[Client, AsyncClient],
+        access_token: str,
+        refresh_token: Optional[str],
+    ):
+        self.client = client
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = get_token_expiry(access_token)
+
+
+def _pooled_client_ttu(key: str, value: PooledClient, now: float) -> float:
+    return value.expires_at - TOKEN_EXPIRY_MARGIN
+
+
+class SupabaseClientPool:
+    """
+    Process wide pool of authenticated Supabase clients keyed by access token.
+
+    A client keeps its HTTP connections open, so reusing it across sessions
+    and tasks avoids new TLS handshakes and repeated set_session calls. Clients
+    are evicted when their token is about to expire and recreated on the next
+    request, which refreshes the session with the refresh token.
+    """
+
+    def __init__(self, maxsize: int = 1000):
+        self._sync_clients: TLRUCache[str, PooledClient] = TLRUCache(
+            maxsize=maxsize, ttu=_pooled_client_ttu, timer=time.time
+        )
+        self._async_clients: TLRUCache[str, PooledClient] = TLRUCache(
+            maxsize=maxsize, ttu=_pooled_client_ttu, timer=time.time
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, clients: TLRUCache, access_token: str) -> Optional[PooledClient]:
+        with self._lock:
+            pooled = clients.get(access_token)
+            if pooled is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return pooled
+
+    def _store(self, clients: TLRUCache, access_token: str, pooled: PooledClient):
+        with self._lock:
+            # Reachable with both the original and the refreshed token
+            clients[access_token] = pooled
+            clients[pooled.access_token] = pooled
+
+    def get_sync_client(
+        self, access_token: str, refresh_token: Optional[str] = None
+    ) -> PooledClient:
+        pooled = self._get(self._sync_clients, access_token)
+        if pooled is not None:
+            return pooled
+
+        client = get_sync_supabase_client(access_token)
+        auth_resp = client.auth.set_session(
+            access_token=access_token, refresh_token=refresh_token
+        )
+        pooled = PooledClient(
+            client,
+            auth_resp.session.access_token or access_token,
+            auth_resp.session.refresh_token or refresh_token,
+        )
+        self._store(self._sync_clients, access_token, pooled)
+        return pooled
+
+    async def get_async_client(
+        self, access_token: str, refresh_token: Optional[str] = None
+    ) -> PooledClient:
+        pooled = self._get(self._async_clients, access_token)
+        if pooled is not None:
+            return pooled
+
+        client = await get_supabase_client(access_token)
+        auth_resp = await client.auth.set_session(
+            access_token=access_token, refresh_token=refresh_token
+        )
+        pooled = PooledClient(
+            client,
+            auth_resp.session.access_token or access_token,
+            auth_resp.session.refresh_token or refresh_token,
+        )
+        self._store(self._async_clients, access_token, pooled)
+        return pooled
+
+    def has_sync_client(self, access_token: str) -> bool:
+        with self._lock:
+            return access_token in self._sync_clients
+
+    def has_async_client(self, access_token: str) -> bool:
+        with self._lock:
+            return access_token in self._async_clients
+
+    def evict(self, access_token: str):
+        with self._lock:
+            for clients in (self._sync_clients, self._async_clients):
+                pooled = clients.pop(access_token, None)
+                if pooled is not None:
+                    clients.pop(pooled.access_token, None)
+
+
+client_pool = SupabaseClientPool()
+
+
+SESSION_KEY_PREFIX = "session_storage"
+# Lifetime of shared sessions, matches the local storage_cache
+SESSION_TTL = 3600
+# Max time a process holds the refresh lock or waits for another to finish
+SESSION_REFRESH_TIMEOUT = 10
+SESSION_REFRESH_POLL_INTERVAL = 0.1
+
+
+def _session_key(access_token: str) -> str:
+    digest = hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+    return f"{SESSION_KEY_PREFIX}:{digest}"
+
+
+def _refresh_lock_key(access_token: str) -> str:
+    return f"{_session_key(access_token)}:refresh"
+
+
+class SharedSessionStore:
+    """
+    Redis tier behind the local storage_cache.
+
+    Holds the current token pair of each session so API workers and Celery
+    workers reuse a session another process already set up, and makes token
+    refreshes single-flight across processes: refresh tokens are single use,
+    so only the process holding the refresh lock calls set_session with an
+    expiring token while the others wait for the refreshed pair.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, int] = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_waits": 0,
+            "errors": 0,
+        }
+
+    def count(self, name: str):
+        self.stats[name] += 1
+
+    def _decode(self, data: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError:
+            return None
+
+    def _encode(self, storage: "SessionStorage") -> str:
+        return json.dumps(
+            {
+                "access_token": storage.access_token,
+                "refresh_token": storage.refresh_token,
+                "expires_at": storage.expires_at,
+            }
+        )
+
+    def load(self, session_key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self._decode(get_sync_redis_client().get(_session_key(session_key)))
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to load shared session: {e}")
+            return None
+
+    async def load_async(self, session_key: str) -> Optional[Dict[str, Any]]:
+        try:
+            redis_client = await get_async_redis_client()
+            return self._decode(await redis_client.get(_session_key(session_key)))
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to load shared session: {e}")
+            return None
+
+    def save(self, session_key: str, storage: "SessionStorage"):
+        try:
+            get_sync_redis_client().set(
+                _session_key(session_key), self._encode(storage), ex=SESSION_TTL
+            )
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to save shared session: {e}")
+
+    async def save_async(self, session_key: str, storage: "SessionStorage"):
+        try:
+            redis_client = await get_async_redis_client()
+            await redis_client.set(
+                _session_key(session_key), self._encode(storage), ex=SESSION_TTL
+            )
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to save shared session: {e}")
+
+    async def delete_async(self, session_key: str):
+        try:
+            redis_client = await get_async_redis_client()
+            await redis_client.delete(_session_key(session_key))
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to delete shared session: {e}")
+
+    def acquire_refresh(self, session_key: str) -> bool:
+        try:
+            return bool(
+                get_sync_redis_client().set(
+                    _refresh_lock_key(session_key),
+                    "1",
+                    nx=True,
+                    ex=SESSION_REFRESH_TIMEOUT,
+                )
+            )
+        except Exception as e:
+            # Without Redis every process refreshes on its own
+            self.count("errors")
+            logger.error(f"Unable to acquire session refresh lock: {e}")
+            return True
+
+    async def acquire_refresh_async(self, session_key: str) -> bool:
+        try:
+            redis_client = await get_async_redis_client()
+            return bool(
+                await redis_client.set(
+                    _refresh_lock_key(session_key),
+                    "1",
+                    nx=True,
+                    ex=SESSION_REFRESH_TIMEOUT,
+                )
+            )
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to acquire session refresh lock: {e}")
+            return True
+
+    def release_refresh(self, session_key: str):
+        try:
+            get_sync_redis_client().delete(_refresh_lock_key(session_key))
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to release session refresh lock: {e}")
+
+    async def release_refresh_async(self, session_key: str):
+        try:
+            redis_client = await get_async_redis_client()
+            await redis_client.delete(_refresh_lock_key(session_key))
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to release session refresh lock: {e}")
+
+    def wait_for_refresh(self, session_key: str) -> Optional[Dict[str, Any]]:
+        self.count("refresh_waits")
+        deadline = time.time() + SESSION_REFRESH_TIMEOUT
+        try:
+            redis_client = get_sync_redis_client()
+            while time.time() < deadline and redis_client.exists(
+                _refresh_lock_key(session_key)
+            ):
+                time.sleep(SESSION_REFRESH_POLL_INTERVAL)
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to wait for session refresh: {e}")
+        return self.load(session_key)
+
+    async def wait_for_refresh_async(
+        self, session_key: str
+    ) -> Optional[Dict[str, Any]]:
+        self.count("refresh_waits")
+        deadline = time.time() + SESSION_REFRESH_TIMEOUT
+        try:
+            redis_client = await get_async_redis_client()
+            while time.time() < deadline and await redis_client.exists(
+                _refresh_lock_key(session_key)
+            ):
+                await asyncio.sleep(SESSION_REFRESH_POLL_INTERVAL)
+        except Exception as e:
+            self.count("errors")
+            logger.error(f"Unable to wait for session refresh: {e}")
+        return await self.load_async(session_key)
+
+
+shared_sessions = SharedSessionStore()
+
+
+def get_session_stats() -> Dict[str, int]:
+    """
+    Hit and miss counters of the session tiers in this process.
+    """
+    return {
+        **shared_sessions.stats,
+        "local_size": len(storage_cache),
+        "client_pool_hits": client_pool.hits,
+        "client_pool_misses": client_pool.misses,
+        "verified_token_hits": token_verifier.hits,
+        "verified_token_misses": token_verifier.misses,
+    }
+
+
 class SessionStorage:
     sync_supabase_client: Optional[Client] = None
     storage: Dict[str, Any] = {}
@@ -72,6 +404,9 @@ class SessionStorage:
     refresh_token: Optional[str] = None
     code: Optional[str] = None
     redirect: Optional[str] = None
+    expires_at: Optional[float] = None
+    # Access token the session was created with, key of the cache tiers
+    session_key: Optional[str] = None
 
     def __init__(
         self,
@@ -81,61 +416,100 @@ class SessionStorage:
         redirect: Optional[str] = None,
         supabase_client: Optional[AsyncClient] = None,
         sync_supabase_client: Optional[Client] = None,
+        session_key: Optional[str] = None,
     ):
+        self.session_key = session_key or access_token
         self.access_token = access_token
         self.refresh_token = refresh_token
         self.code = code
         self.redirect = redirect
         self.supabase_client = supabase_client
         self.sync_supabase_client = sync_supabase_client
+        self.expires_at = None
         self.storage = {}
 
+    def _is_expiring(self) -> bool:
+        return (
+            self.expires_at is not None
+            and self.expires_at - TOKEN_EXPIRY_MARGIN <= time.time()
+        )
+
+    def _update_tokens(self, pooled: PooledClient):
+        self.access_token = pooled.access_token or self.access_token
+        self.refresh_token = pooled.refresh_token or self.refresh_token
+        self.expires_at = pooled.expires_at
+
+    def _adopt_shared_tokens(self, data: Optional[Dict[str, Any]]):
+        if data and data.get("access_token"):
+            self.access_token = data["access_token"]
+            self.refresh_token = data.get("refresh_token") or self.refresh_token
+            self.expires_at = data.get("expires_at")
+
+    async def _refresh_async(self):
+        if client_pool.has_async_client(self.access_token):
+            return
+        if await shared_sessions.acquire_refresh_async(self.session_key):
+            shared_sessions.count("refreshes")
+            try:
+                pooled = await client_pool.get_async_client(
+                    self.access_token, self.refresh_token
+                )
+                self._update_tokens(pooled)
+                await shared_sessions.save_async(self.session_key, self)
+            finally:
+                await shared_sessions.release_refresh_async(self.session_key)
+        else:
+            self._adopt_shared_tokens(
+                await shared_sessions.wait_for_refresh_async(self.session_key)
+            )
+
+    def _refresh_sync(self):
+        if client_pool.has_sync_client(self.access_token):
+            return
+        if shared_sessions.acquire_refresh(self.session_key):
+            shared_sessions.count("refreshes")
+            try:
+                pooled = client_pool.get_sync_client(
+                    self.access_token, self.refresh_token
+                )
+                self._update_tokens(pooled)
+                shared_sessions.save(self.session_key, self)
+            finally:
+                shared_sessions.release_refresh(self.session_key)
+        else:
+            self._adopt_shared_tokens(
+                shared_sessions.wait_for_refresh(self.session_key)
+            )
+
     async def get_supabase_client(self) -> AsyncClient:
-        if self.supabase_client is None:
+        if self.supabase_client is None or self._is_expiring():
             try:
-                self.supabase_client = await get_supabase_client(self.access_token)
+                await self._refresh_async()
+                pooled = await client_pool.get_async_client(
+                    self.access_token, self.refresh_token
+                )
             except Exception as e:
                 logger.error(e)
                 raise e
-            auth_resp = await self.supabase_client.auth.set_session(
-                access_token=self.access_token, refresh_token=self.refresh_token
-            )
-            self.access_token = (
-                auth_resp.session.access_token
-                if auth_resp.session.access_token is not None
-                else self.access_token
-            )
-            self.refresh_token = (
-                auth_resp.session.refresh_token
-                if auth_resp.session.refresh_token is not None
-                else self.refresh_token
-            )
+            self._update_tokens(pooled)
+            self.supabase_client = pooled.client
 
         return self.supabase_client
 
     def get_sync_supabase_client(self) -> Client:
-        if self.sync_supabase_client is None:
-            self.sync_supabase_client = get_sync_supabase_client(self.access_token)
+        if self.sync_supabase_client is None or self._is_expiring():
             try:
                 logger.debug(f"tokens {self.access_token=} {self.refresh_token=}")
-                logger.debug(f"client {self.sync_supabase_client=}")
-                auth_resp = self.sync_supabase_client.auth.set_session(
-                    access_token=self.access_token, refresh_token=self.refresh_token
-                )
-                logger.debug(f"{auth_resp=}")
-                self.access_token = (
-                    auth_resp.session.access_token
-                    if auth_resp.session.access_token is not None
-                    else self.access_token
-                )
-                self.refresh_token = (
-                    auth_resp.session.refresh_token
-                    if auth_resp.session.refresh_token is not None
-                    else self.refresh_token
+                self._refresh_sync()
+                pooled = client_pool.get_sync_client(
+                    self.access_token, self.refresh_token
                 )
+                logger.debug(f"client {pooled.client=}")
             except Exception as e:
                 logger.error(f"error while initializing storage client {e=}")
                 raise e
+            self._update_tokens(pooled)
+            self.sync_supabase_client = pooled.client
         return self.sync_supabase_client
 
     def get(self, key: str, default: Any = None) -> Any:
@@ -148,6 +522,73 @@ class SessionStorage:
 storage_cache: TTLCache[str, SessionStorage] = TTLCache(maxsize=1000, ttl=3600)
 
 
+def _cached_storage(
+    access_token: str, refresh_token: Optional[str], code: Optional[str]
+) -> SessionStorage:
+    shared_sessions.count("local_hits")
+    logger.info(
+        f"Loading existing storage for {access_token=} {refresh_token=} {code=}"
+    )
+    storage = storage_cache[access_token]
+    # Keep the pair of a session that has already been refreshed, the
+    # refresh token sent with the original access token is used up
+    if refresh_token is not None and storage.access_token == access_token:
+        storage.refresh_token = refresh_token
+    return storage
+
+
+def _init_storage(
+    shared_session: Optional[Dict[str, Any]],
+    access_token: str,
+    refresh_token: Optional[str],
+    code: Optional[str],
+    redirect: Optional[str],
+    supabase_client: Optional[AsyncClient],
+    sync_supabase_client: Optional[Client],
+) -> SessionStorage:
+    if shared_session is not None:
+        shared_sessions.count("redis_hits")
+        logger.info(f"Loading shared storage for {access_token=} {code=}")
+        storage = SessionStorage(
+            access_token=shared_session.get("access_token") or access_token,
+            refresh_token=shared_session.get("refresh_token") or refresh_token,
+            code=code,
+            redirect=redirect,
+            supabase_client=supabase_client,
+            sync_supabase_client=sync_supabase_client,
+            session_key=access_token,
+        )
+        storage.expires_at = shared_session.get("expires_at")
+        storage_cache[access_token] = storage
+        return storage
+
+    shared_sessions.count("misses")
+    logger.info(
+        f"Initializing new storage for {access_token=} {refresh_token=} {code=}"
+    )
+    if (
+        refresh_token is None
+        and code is None
+        and supabase_client is None
+        and sync_supabase_client is None
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Unauthorized access: a refresh token, code, or client is required to initialize the session.",
+        )
+
+    storage = SessionStorage(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        code=code,
+        redirect=redirect,
+        supabase_client=supabase_client,
+        sync_supabase_client=sync_supabase_client,
+    )
+    storage_cache[access_token] = storage
+    return storage
+
+
 def get_storage(
     access_token: str,
     refresh_token: Optional[str] = None,
@@ -156,46 +597,48 @@ def get_storage(
     supabase_client: Optional[AsyncClient] = None,
     sync_supabase_client: Optional[Client] = None,
 ) -> SessionStorage:
-    global storage_cache
+    if access_token in storage_cache:
+        return _cached_storage(access_token, refresh_token, code)
 
-    if access_token not in storage_cache:
-        logger.info(
-            f"Initializing new storage for {access_token=} {refresh_token=} {code=}"
-        )
-        if (
-            refresh_token is None
-            and code is None
-            and supabase_client is None
-            and sync_supabase_client is None
-        ):
-            raise HTTPException(
-                status_code=401,
-                detail="Unauthorized access: a refresh token, code, or client is required to initialize the session.",
-            )
+    shared_session = shared_sessions.load(access_token) if access_token else None
+    return _init_storage(
+        shared_session,
+        access_token,
+        refresh_token,
+        code,
+        redirect,
+        supabase_client,
+        sync_supabase_client,
+    )
 
-        storage_cache[access_token] = SessionStorage(
-            access_token=access_token,
-            refresh_token=refresh_token,
-            code=code,
-            redirect=redirect,
-            supabase_client=supabase_client,
-            sync_supabase_client=sync_supabase_client,
-        )
-    else:
-        logger.info(
-            f"Loading existing storage for {access_token=} {refresh_token=} {code=}"
-        )
-        storage_cache[access_token].access_token = (
-            access_token
-            if access_token is not None
-            else storage_cache[access_token].access_token
-        )
-        storage_cache[access_token].refresh_token = (
-            refresh_token
-            if refresh_token is not None
-            else storage_cache[access_token].refresh_token
-        )
-    return storage_cache[access_token]
+
+async def get_storage_async(
+    access_token: str,
+    refresh_token: Optional[str] = None,
+    code: Optional[str] = None,
+    redirect: Optional[str] = None,
+    supabase_client: Optional[AsyncClient] = None,
+    sync_supabase_client: Optional[Client] = None,
+) -> SessionStorage:
+    """
+    get_storage for the event loop, the shared session is loaded with the
+    async Redis client.
+    """
+    if access_token in storage_cache:
+        return _cached_storage(access_token, refresh_token, code)
+
+    shared_session = (
+        await shared_sessions.load_async(access_token) if access_token else None
+    )
+    return _init_storage(
+        shared_session,
+        access_token,
+        refresh_token,
+        code,
+        redirect,
+        supabase_client,
+        sync_supabase_client,
+    )
 
 
 async def clean_storage(access_token: str) -> None:
@@ -205,6 +648,9 @@ async def clean_storage(access_token: str) -> None:
         if session_storage.supabase_client is not None:
             try:
                 await session_storage.supabase_client.auth.sign_out()
+                client_pool.evict(access_token)
+                token_verifier.forget(access_token)
+                await shared_sessions.delete_async(access_token)
                 del storage_cache[access_token]
             except Exception as e:
                 logger.error(f"Error while signing out and cleaning storage: {e}")
@@ -1,8 +1,13 @@
-import json
 import time
 from typing import Annotated, AsyncGenerator, Awaitable, Callable, Optional, Tuple
 
-from app.core.session_storage import SessionStorage, get_storage, get_supabase_client
+from app.core.auth_tokens import token_verifier
+from app.core.session_storage import (
+    SessionStorage,
+    get_storage,
+    get_storage_async,
+    get_supabase_client,
+)
 from supabase.client import AsyncClient, create_async_client, Client, create_client
 from supabase import ClientOptions
 from supabase_auth.types import Session
@@ -182,9 +187,8 @@ async def _get_supabase_client(
 ) -> AsyncGenerator[AsyncClient, None]:
     try:
         if access_token is not None:
-            supabase_client: AsyncClient = await get_storage(
-                access_token
-            ).get_supabase_client()
+            store: SessionStorage = await get_storage_async(access_token)
+            supabase_client: AsyncClient = await store.get_supabase_client()
 
             yield supabase_client
         else:
@@ -224,6 +228,46 @@ def get_supabase_tokens_sync(supabase: Client) -> Tuple[str, str]:
     return session.access_token, session.refresh_token
 
 
+def get_request_tokens(request: Request) -> Tuple[Optional[str], Optional[str]]:
+    authorization_header: Optional[str] = request.headers.get("Authorization")
+    refresh_header: Optional[str] = request.headers.get("Refresh-Authorization")
+
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
+
+    if authorization_header:
+        _, __, access_token = authorization_header.partition(" ")
+
+    if refresh_header:
+        _, __, refresh_token = refresh_header.partition(" ")
+
+    return access_token or None, refresh_token or None
+
+
+async def get_verified_session(request: Request) -> Optional[Tuple[str, str, str]]:
+    """
+    Authenticate the request without the auth server when its access token
+    verifies locally. Returns the user id and the current token pair of the
+    session, or None when the request needs the full session setup, e.g. for
+    an expired token, an auth code or a session unknown to this process.
+    """
+    access_token, refresh_token = get_request_tokens(request)
+    if not access_token or "code" in request.query_params:
+        return None
+
+    claims = await token_verifier.verify_async(access_token)
+    if claims is None:
+        return None
+
+    try:
+        store: SessionStorage = await get_storage_async(access_token, refresh_token)
+    except HTTPException:
+        return None
+
+    request.state.auth_claims = claims
+    return claims["sub"], store.access_token, store.refresh_token
+
+
 async def get_supabase_client_by_request(
     request: Request, anon_paths=[]
 ) -> Tuple[Optional[AsyncClient], Optional[SessionStorage]]:
@@ -246,21 +290,12 @@ async def get_supabase_client_by_request(
 
         return supabase_client, None
 
-    authorization_header: Optional[str] = request.headers.get("Authorization")
-    refresh_header: Optional[str] = request.headers.get("Refresh-Authorization")
     code_header: Optional[str] = request.headers.get("Auth-Code")
 
-    access_token: Optional[str] = None
-    refresh_token: Optional[str] = None
+    access_token, refresh_token = get_request_tokens(request)
     code: Optional[str] = None
     redirect: Optional[str] = None
 
-    if authorization_header:
-        _, __, access_token = authorization_header.partition(" ")
-
-    if refresh_header:
-        _, __, refresh_token = refresh_header.partition(" ")
-
     if "code" in request.query_params:
         redirect = f"{request.url.scheme}://{request.url.netloc}{request.url.path.split('?')[0]}"
 
@@ -271,7 +306,9 @@ async def get_supabase_client_by_request(
 
         logger.debug(f"Extracted tokens: {access_token=} {refresh_token=} {code=}")
 
-    store: SessionStorage = get_storage(access_token, refresh_token, code, redirect)
+    store: SessionStorage = await get_storage_async(
+        access_token, refresh_token, code, redirect
+    )
     supabase_client: AsyncClient = await store.get_supabase_client()
 
     return supabase_client, store
@@ -300,49 +337,60 @@ async def supabase_middleware(
     ):
         return await call_next(request)
 
-    supabase_client: AsyncClient | None = None
-    try:
-        supabase_client, _ = await get_supabase_client_by_request(request, anon_paths)
-    except HTTPException as e:
-        return JSONResponse(status_code=e.status_code, content={"error": e.detail})
-    except Exception as e:
-        logger.error(f"Error occurred while getting supabase client: {str(e)}")
-        return JSONResponse(status_code=500, content={"error": "Internal Server Error"})
-    try:
-        session = None
-        if supabase_client:
-            session = await supabase_client.auth.get_session()
-
-        if session is None or session.user is None:
+    verified_session = await get_verified_session(request)
+    if verified_session is not None:
+        user_id, access_token, refresh_token = verified_session
+    else:
+        supabase_client: AsyncClient | None = None
+        try:
+            supabase_client, _ = await get_supabase_client_by_request(
+                request, anon_paths
+            )
+        except HTTPException as e:
+            return JSONResponse(status_code=e.status_code, content={"error": e.detail})
+        except Exception as e:
+            logger.error(f"Error occurred while getting supabase client: {str(e)}")
+            return JSONResponse(
+                status_code=500, content={"error": "Internal Server Error"}
+            )
+        try:
+            session = None
+            if supabase_client:
+                session = await supabase_client.auth.get_session()
+
+            if session is None or session.user is None:
+                return JSONResponse(
+                    status_code=401,
+                    content={"error": "Invalid authentication credentials"},
+                )
+        except AuthApiError as e:
+            logger.error(f"Error occurred while getting session: {str(e)}")
             return JSONResponse(
                 status_code=401, content={"error": "Invalid authentication credentials"}
             )
-    except AuthApiError as e:
-        logger.error(f"Error occurred while getting session: {str(e)}")
-        return JSONResponse(
-            status_code=401, content={"error": "Invalid authentication credentials"}
+        except Exception as e:
+            logger.error(f"Error occurred while getting session: {str(e)}")
+            return JSONResponse(
+                status_code=500, content={"error": "Internal Server Error"}
+            )
+        user_id, access_token, refresh_token = (
+            session.user.id,
+            session.access_token,
+            session.refresh_token,
         )
-    except Exception as e:
-        logger.error(f"Error occurred while getting session: {str(e)}")
-        return JSONResponse(status_code=500, content={"error": "Internal Server Error"})
 
-    logger.info(f"Properly authenticated user {session.user.id}")
+    logger.info(f"Properly authenticated user {user_id}")
 
-    try:
-        if request.headers.get("content-type") == "application/json":
-            request_data = await request.json()
-            if "input" in request_data:
-                request_data["input"]["tokens"] = {
-                    "access": session.access_token,
-                    "refresh": session.refresh_token,
-                }
-                request._body = json.dumps(request_data).encode("utf-8")
-    except json.JSONDecodeError:
-        return JSONResponse(status_code=400, content={"error": "Invalid JSON"})
+    request.state.supabase_tokens = (access_token, refresh_token)
 
     response = await call_next(request)
 
     return response
 
 
+def _get_supabase_tokens(request: Request) -> Optional[Tuple[str, str]]:
+    return getattr(request.state, "supabase_tokens", None)
+
+
 SupaClientDep = Annotated[AsyncClient, Depends(_get_supabase_client)]
+SupaTokensDep = Annotated[Optional[Tuple[str, str]], Depends(_get_supabase_tokens)]
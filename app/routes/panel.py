@@ -1,18 +1,22 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel, ValidationError
 from typing import List
 from app.core.supabase import (
+    AccessTokenDep,
     SupaClientDep,
+    SupaTokensDep,
     allow_anonymous_login,
-    get_supabase_tokens,
     get_sync_supabase_client,
 )
+from source.helpers.panel_cache import etag_matches, panel_details_etag
 from source.helpers.routes import handle_exception
 from source.api.panel.read import (
     PanelDetailsResponse,
     get_panel,
     get_panel_details,
     get_panel_files,
+    get_public_panel_details,
     get_panel_transcript_sources_w_id,
     list_panel_audios_w_id,
     list_panel_transcript_audios_w_id,
@@ -61,25 +65,18 @@ allow_anonymous_login("/panel", ["GET"])
 @router.post("/panel/news_links")
 async def api_fetch_news_links(
     configs: dict,
-    supabase: SupaClientDep,
 ):
     try:
         print(f"{configs=}")
-        tokens = await get_supabase_tokens(supabase)
-        supabase_sync = get_sync_supabase_client(
-            access_token=tokens[0], refresh_token=tokens[1]
-        )
-
         sources = manage_news_sources(metadata=configs)
 
-        news_links: List[WebSourceCollection | WebSource] = fetch_links(
-            supabase_sync,
+        # Fetches the feeds and groups the items with sync calls
+        news_links: List[WebSourceCollection | WebSource] = await asyncio.to_thread(
+            fetch_links,
             sources,
-            dry_run=True,
             guidance=configs.get("news_guidance", ""),
             min_amount=int(configs.get("segments", 5)),
             max_ids=int(configs.get("news_items", 5)),
-            tokens=tokens,
         )
         return {
             "news_links": [
@@ -234,15 +231,13 @@ async def api_update_panel_audio(
 @router.post("/panel/")
 async def api_create_panel(
     request_data: PanelRequestData,
-    supabase: SupaClientDep,
+    tokens: SupaTokensDep,
 ):
     try:
         # Convert request_data to a JSON-serializable format
         request_data_json = request_data.to_json()
 
-        task = create_panel_task.delay(
-            await get_supabase_tokens(supabase), request_data_json
-        )
+        task = create_panel_task.delay(tokens, request_data_json)
         return {"task_id": task.id}
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
@@ -253,13 +248,11 @@ async def api_create_panel(
 @router.post("/panel/transcript")
 async def api_create_panel_transcript(
     request_data: PanelRequestData,
-    supabase: SupaClientDep,
+    tokens: SupaTokensDep,
 ):
     try:
         request_data_json = request_data.to_json()
-        task = create_panel_transcription_task.delay(
-            await get_supabase_tokens(supabase), request_data_json
-        )
+        task = create_panel_transcription_task.delay(tokens, request_data_json)
         return {"task_id": task.id}
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
@@ -270,13 +263,11 @@ async def api_create_panel_transcript(
 @router.post("/panel/audio")
 async def api_create_panel_audio(
     request_data: PanelRequestData,
-    supabase: SupaClientDep,
+    tokens: SupaTokensDep,
 ):
     try:
         request_data_json = request_data.to_json()
-        task = create_panel_audio_task.delay(
-            await get_supabase_tokens(supabase), request_data_json
-        )
+        task = create_panel_audio_task.delay(tokens, request_data_json)
         return {"task_id": task.id}
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
@@ -322,26 +313,37 @@ async def api_list_panel_audios_w_id(
         raise handle_exception(e, "Audios not found for the given panel ID", 404)
 
 
-@router.get("/panel/{panel_id}/details")
+@router.get("/panel/{panel_id}/details", response_model=PanelDetailsResponse)
 async def api_get_panel_details(
     panel_id: str,
+    request: Request,
+    access_token: AccessTokenDep,
     supabase: SupaClientDep,
-) -> PanelDetailsResponse:
+) -> Response:
     try:
-        panel = await get_panel_details(supabase, panel_id)
-        return panel
+        if access_token is None:
+            # Anonymous readers only see public panels, which are shared
+            data, etag = await get_public_panel_details(supabase, panel_id)
+        else:
+            data = (await get_panel_details(supabase, panel_id)).model_dump_json()
+            etag = panel_details_etag(data)
     except Exception as e:
         raise handle_exception(e, "Panel not found", 404)
 
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type="application/json", headers=headers)
+
 
 # New endpoint for creating a public panelpanel
 @router.post("/panel/discussion")
 async def api_create_panel_panel(
     request_data: PanelRequestData,
-    supabase: SupaClientDep,
+    tokens: SupaTokensDep,
 ):
     try:
-        panel_id = create_panel(await get_supabase_tokens(supabase), request_data)
+        panel_id = create_panel(tokens, request_data)
         return {"panel_id": panel_id}
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
@@ -351,10 +353,10 @@ async def api_create_panel_panel(
 
 @router.post("/panel/generate_transcripts")
 async def api_generate_transcripts(
-    supabase: SupaClientDep,
+    tokens: SupaTokensDep,
 ):
     try:
-        task = generate_transcripts_task.delay(await get_supabase_tokens(supabase))
+        task = generate_transcripts_task.delay(tokens)
         return {"task_id": task.id}
     except Exception as e:
         raise handle_exception(e, "Failed to generate transcripts", 500)
@@ -413,13 +415,13 @@ async def api_update_panel_transcript_file(
     transcript_id: str,
     request_data: TranscriptUpdateRequest,
     supabase: SupaClientDep,
+    tokens: SupaTokensDep,
 ):
     """
     Updates the content of an existing transcript file in Supabase storage.
     The transcript history metadata is managed within the upload function.
     """
     try:
-        tokens = await get_supabase_tokens(supabase)
         supabase_sync = get_sync_supabase_client(
             access_token=tokens[0], refresh_token=tokens[1]
         )
@@ -1,6 +1,11 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
 from app.core.celery_app import check_task_status, test_task
+from app.core.session_storage import get_session_stats
 from app.core.supabase import excempt_from_auth_check_with_prefix
+from source.chains.chain_factory import get_cached_chain_ids
+from source.chains.resilience import get_resilience_stats
+from source.chains.response_cache import get_response_cache_stats
 
 router = APIRouter()
 
@@ -34,3 +39,36 @@ async def start_test_task():
     """
     task = test_task.delay()
     return {"task_id": task.id}
+
+
+@router.get("/system/session_stats")
+async def session_stats():
+    """
+    Endpoint to get the session cache hit and miss counters of this process.
+
+    Returns:
+        dict: The counters of the local and shared session tiers.
+    """
+    return get_session_stats()
+
+
+@router.get("/system/llm_cache_stats")
+async def llm_cache_stats():
+    """
+    Endpoint to get the response cache counters of the cached chains.
+
+    Returns:
+        dict: The hits, misses, hit ratio and entries per chain.
+    """
+    return await asyncio.to_thread(get_response_cache_stats, get_cached_chain_ids())
+
+
+@router.get("/system/llm_resilience_stats")
+async def llm_resilience_stats():
+    """
+    Endpoint to get the rate limit retry counters of the llm providers.
+
+    Returns:
+        dict: The retries, deferred tasks, opened circuits and waited seconds per provider.
+    """
+    return await asyncio.to_thread(get_resilience_stats)
@@ -1,8 +1,14 @@
+import asyncio
 import json
-from typing import List, Optional
+from typing import List, Optional, Tuple, Union
 from uuid import UUID
 from pydantic import BaseModel
 from supabase import AsyncClient
+from source.helpers.panel_cache import (
+    get_cached_panel_details,
+    panel_details_etag,
+    store_panel_details,
+)
 from source.models.supabase.panel import (
     PanelDiscussion,
     PanelTranscript,
@@ -85,31 +91,40 @@ async def list_panel_audios_w_id(
     )
 
 
+async def get_file_urls(
+    supabase: AsyncClient, records: List[Union[PanelTranscript, PanelAudio]]
+) -> dict[UUID, str]:
+    # Generate file URLs using Supabase storage
+    urls = await asyncio.gather(
+        *(
+            supabase.storage.from_(record.bucket_id).get_public_url(record.file)
+            for record in records
+        )
+    )
+    return {record.id: url.rstrip("?") for record, url in zip(records, urls)}
+
+
 async def get_panel_files(supabase: AsyncClient, panel_id):
-    transcript_records = await PanelTranscript.fetch_existing_from_supabase(
-        supabase, {"panel_id": panel_id}
+    transcript_records, audio_records = await asyncio.gather(
+        list_panel_transcripts_w_id(supabase, panel_id),
+        list_panel_audios_w_id(supabase, panel_id),
     )
-    audio_records = await PanelAudio.fetch_existing_from_supabase(
-        supabase, {"panel_id": panel_id}
+    transcript_urls, audio_urls = await asyncio.gather(
+        get_file_urls(supabase, transcript_records),
+        get_file_urls(supabase, audio_records),
     )
 
-    # Generate file URLs using Supabase storage
-    transcript_urls = {
-        record.id: (
-            await supabase.storage.from_(record.bucket_id).get_public_url(record.file)
-        ).rstrip("?")
-        for record in transcript_records
-    }
-    audio_urls = {
-        record.id: (
-            await supabase.storage.from_(record.bucket_id).get_public_url(record.file)
-        ).rstrip("?")
-        for record in audio_records
-    }
-
     return transcript_urls, audio_urls
 
 
+async def get_panel_transcript_sources_w_ids(
+    supabase: AsyncClient, transcript_ids: List[UUID]
+) -> dict[str, List[PanelTranscriptSourceReference]]:
+    return await PanelTranscriptSourceReference.fetch_grouped_from_supabase(
+        supabase, transcript_ids, id_column="transcript_id"
+    )
+
+
 class PanelDetailsResponse(BaseModel):
     panel: PanelDiscussion
     transcripts: Optional[List[PanelTranscript]] = None
@@ -125,16 +140,18 @@ class PanelDetailsResponse(BaseModel):
 
 
 async def get_panel_details(supabase: AsyncClient, panel_id):
-    panel = await get_panel(supabase, panel_id)
-    transcripts = await list_panel_transcripts_w_id(supabase, panel_id)
-    audios = await list_panel_audios_w_id(supabase, panel_id)
-    transcript_urls, audio_urls = await get_panel_files(supabase, panel_id)
-
-    transcript_sources = {}
-    for transcript in transcripts:
-        sources = await get_panel_transcript_sources_w_id(supabase, transcript.id)
-        if sources and len(sources) > 0:
-            transcript_sources[transcript.id] = sources
+    panel, transcripts, audios = await asyncio.gather(
+        get_panel(supabase, panel_id),
+        list_panel_transcripts_w_id(supabase, panel_id),
+        list_panel_audios_w_id(supabase, panel_id),
+    )
+    transcript_sources, transcript_urls, audio_urls = await asyncio.gather(
+        get_panel_transcript_sources_w_ids(
+            supabase, [transcript.id for transcript in transcripts]
+        ),
+        get_file_urls(supabase, transcripts),
+        get_file_urls(supabase, audios),
+    )
 
     return PanelDetailsResponse(
         panel=panel,
@@ -144,3 +161,23 @@ async def get_panel_details(supabase: AsyncClient, panel_id):
         audios=audios,
         audio_urls=audio_urls,
     )
+
+
+async def get_public_panel_details(supabase: AsyncClient, panel_id) -> Tuple[str, str]:
+    """
+    Return the (json, etag) of the panel details, public panels are served
+    from the shared cache until one of their rows is written.
+    """
+    cached = await get_cached_panel_details(panel_id)
+    if cached is not None:
+        return cached
+
+    details = await get_panel_details(supabase, panel_id)
+    data = details.model_dump_json()
+    if not details.panel.is_public:
+        return data, panel_details_etag(data)
+
+    etag = await store_panel_details(
+        panel_id, data, [transcript.id for transcript in details.transcripts]
+    )
+    return data, etag
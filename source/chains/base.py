@@ -1,36 +1,20 @@
 import asyncio
-import re
 from typing import Dict
-from langchain_core.runnables import RunnableSequence, RunnableLambda
+from langchain_core.runnables import RunnableConfig, RunnableSequence, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
-from openai import RateLimitError
-from google.api_core.exceptions import ResourceExhausted
-
-# , BadRequestError
-from random import randint
-from time import sleep
 
+from source.chains.resilience import (
+    DEFAULT_PROVIDER,
+    MAX_RATE_LIMIT_RETRIES,
+    RATE_LIMIT_ERRORS,
+    get_circuit,
+    provider_name,
+    record_metrics,
+)
 from source.helpers.shared import print_params
 from source.prompts.base import PromptFormatter
 
 
-def extract_delay_from_error(error_message: str) -> int:
-    print(f"Retry parse {error_message=}")
-
-    # Match case 1: "retry after X seconds"
-    match = re.search(r"retry after (\d+) seconds", error_message, re.IGNORECASE)
-    if match:
-        return int(match.group(1)) + randint(3, 9)
-
-    # Match case 2: "_chat_with_retry in X seconds"
-    match = re.search(r"in (\d+) seconds", error_message, re.IGNORECASE)
-    if match:
-        return int(match.group(1)) + randint(3, 9)
-
-    # Fallback if no match is found
-    return randint(10, 60)
-
-
 def keep_chain_params(params: Dict):
     print_params(params)
     if "orig_params" in params.keys() and isinstance(params["orig_params"], Dict):
@@ -47,46 +31,55 @@ def log_chain_params(params):
     return params
 
 
-def get_error_message(params):
-    error_message = {}
-    if isinstance(params, dict):
-        error_message = params.get("rate_limit_error", {})
-
-    if isinstance(error_message, dict):
-        if "error" in error_message.keys():
-            error_message = error_message.get("error")
-        return error_message.get("message", "")
-
-    if isinstance(error_message, RateLimitError):
-        return error_message.message
-
-    if isinstance(error_message, ResourceExhausted):
-        return error_message.message
-
-
 # Retry logic for RateLimitError
-def retry_with_delay(chain: RunnableSequence, async_mode: bool = False):
-    if async_mode:
-
-        async def retry(params):
-            delay = extract_delay_from_error(get_error_message(params))
-            print(f"Retrying after {delay} seconds due to RateLimitError...")
-            await asyncio.sleep(delay)
-            return await chain.ainvoke(params)
-
-    else:
-
-        def retry(params):
-            delay = extract_delay_from_error(get_error_message(params))
-            print(f"Retrying after {delay} seconds due to RateLimitError...")
-            sleep(delay)
-            return chain.invoke(params)
-
-    return chain.with_fallbacks(
-        [RunnableLambda(retry), RunnableLambda(retry)],
-        exceptions_to_handle=(RateLimitError, ResourceExhausted),
-        exception_key="rate_limit_error",
-    )
+def retry_with_delay(
+    chain: RunnableSequence, async_mode: bool = False, provider: str = DEFAULT_PROVIDER
+):
+    """
+    Retry the chain on rate limit errors with exponential backoff. The
+    provider's circuit is checked before each call, only when it stays open
+    for long a Celery task is re-queued instead of blocking the worker. Both
+    invoke and ainvoke are supported, async_mode is kept for the callers.
+    """
+    circuit = get_circuit(provider)
+
+    async def aretry(params, config: RunnableConfig):
+        attempt = 0
+        while True:
+            await circuit.await_open()
+            try:
+                result = await chain.ainvoke(params, config)
+            except RATE_LIMIT_ERRORS as e:
+                attempt += 1
+                if attempt > MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = circuit.record_failure(e, attempt)
+                print(f"Retrying after {delay:.1f} seconds due to {repr(e)}...")
+                await asyncio.to_thread(record_metrics, provider, retries=1)
+                await circuit.abackoff(delay)
+                continue
+            circuit.record_success()
+            return result
+
+    def retry(params, config: RunnableConfig):
+        attempt = 0
+        while True:
+            circuit.wait_open()
+            try:
+                result = chain.invoke(params, config)
+            except RATE_LIMIT_ERRORS as e:
+                attempt += 1
+                if attempt > MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = circuit.record_failure(e, attempt)
+                print(f"Retrying after {delay:.1f} seconds due to {repr(e)}...")
+                record_metrics(provider, retries=1)
+                circuit.backoff(delay)
+                continue
+            circuit.record_success()
+            return result
+
+    return RunnableLambda(retry, afunc=aretry, name=chain.get_name())
 
 
 class BaseChain:
@@ -154,7 +147,9 @@ class BaseChain:
         else:
             raise ValueError("Either parent_chain or prompt_template must be provided.")
 
-        self.chain = retry_with_delay(self.chain, self.async_mode)
+        self.chain = retry_with_delay(
+            self.chain, self.async_mode, provider_name(self.llm)
+        )
 
         self.chain.name = f"{self.name}-base"
 
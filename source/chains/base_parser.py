@@ -18,6 +18,7 @@ from pydantic import ValidationError
 
 # from source.models.config.logging import logger
 from source.chains.base import BaseChain, retry_with_delay
+from source.chains.resilience import provider_name
 from source.helpers.shared import get_text_from_completion, print_params
 from source.prompts.base import PromptFormatter
 from source.prompts.actions import error_retry
@@ -109,7 +110,9 @@ class BaseParserChain(BaseChain):
             prompt_value=self.prompt_template,
             params=RunnablePassthrough(),
         )
-        parser_chain = retry_with_delay(parser_chain, self.async_mode)
+        parser_chain = retry_with_delay(
+            parser_chain, self.async_mode, provider_name(self.llm)
+        )
         parser_chain.name = f"{self.name}-parser-initial"
 
         parser_retry_chain = (
@@ -117,7 +120,9 @@ class BaseParserChain(BaseChain):
             | self.error_prompt.get_agent_prompt_template()
             | self.retry_llm  # (llms[self.llm_id] if self.llm_id == "json" else get_llm("instruct_detailed"))
         )
-        parser_retry_chain = retry_with_delay(parser_retry_chain, self.async_mode)
+        parser_retry_chain = retry_with_delay(
+            parser_retry_chain, self.async_mode, provider_name(self.retry_llm)
+        )
         parser_retry_chain.name = f"{self.name}-parser-retry"
 
         retry_parser = RetryWithErrorOutputParser(
@@ -6,6 +6,7 @@ from langchain_core.output_parsers import BaseOutputParser, PydanticOutputParser
 from langchain.output_parsers.retry import RetryWithErrorOutputParser
 from langchain_core.messages import AIMessage, SystemMessage, HumanMessage, BaseMessage
 from source.chains.base import retry_with_delay
+from source.chains.resilience import provider_name
 from langchain_core.runnables import (
     RunnableSequence,
     RunnableParallel,
@@ -125,13 +126,17 @@ class BaseValidationChain(BaseChain):
             | self.validation_prompt.get_chat_prompt_template()
             | self.validation_llm
         )
-        self.validation_chain = retry_with_delay(self.validation_chain, self.async_mode)
+        self.validation_chain = retry_with_delay(
+            self.validation_chain, self.async_mode, provider_name(self.validation_llm)
+        )
         self.validation_chain.name = f"{self.name}-validation-initial"
 
         self.retry_chain: RunnableSequence = (
             self.error_prompt.get_chat_prompt_template() | self.retry_llm
         )
-        self.retry_chain = retry_with_delay(self.retry_chain, self.async_mode)
+        self.retry_chain = retry_with_delay(
+            self.retry_chain, self.async_mode, provider_name(self.retry_llm)
+        )
         self.retry_chain.name = f"{self.name}-validation-retry"
 
         parser = self.output_parser or self.prompt.parser
@@ -162,7 +167,9 @@ class BaseValidationChain(BaseChain):
         ):
             self.verify_chain = add_format_instructions(parser) | self.verify_chain
 
-        self.verify_chain = retry_with_delay(self.verify_chain, self.async_mode)
+        self.verify_chain = retry_with_delay(
+            self.verify_chain, self.async_mode, provider_name(self.llm)
+        )
         self.verify_chain.name = f"{self.name}-validation-verify"
 
         self.chain = RunnableLambda(
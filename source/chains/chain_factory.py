@@ -1,8 +1,9 @@
-from typing import Dict, Union
+from typing import Dict, List, Optional, Union
 from langchain_core.runnables import RunnableSequence
 from langchain.chains.combine_documents.stuff import create_stuff_documents_chain
 
-# from source.load_env import SETTINGS # Removed unused import
+from source.load_env import SETTINGS
+from source.models.config.llm_settings import ProviderModelSettings
 from source.models.config.default_env import DEVMODE
 from source.prompts.base import PromptFormatter
 
@@ -11,7 +12,8 @@ from .base import BaseChain
 from .chain import Chain
 
 # Import LLM factory function
-from .llm_factory import get_llm
+from .llm_factory import get_llm, get_llm_config
+from .response_cache import ChainResponseCache
 
 # --- Import ALL necessary prompt formatters ---
 # Actions
@@ -108,8 +110,13 @@ def init_chain(
     check_for_hallucinations=False,
     ChainType: type[BaseChain] = Chain,  # Use type hint for class
     sync_mode: bool = False,
+    chain_id: Optional[str] = None,
+    cache_ttl: Optional[int] = None,
 ) -> BaseChain:
-    """Initializes a chain instance with specified LLMs and prompt."""
+    """
+    Initializes a chain instance with specified LLMs and prompt. With a
+    cache_ttl the responses of the main llm are cached for chain_id.
+    """
     if retry_id is None:
         # Default retry LLM based on whether the main LLM ID suggests structured output
         retry_id = "structured_detailed" if "structured" in id else "instruct_detailed"
@@ -119,9 +126,16 @@ def init_chain(
     if check_for_hallucinations and not DEVMODE:
         validation_llm_instance = get_llm(validate_id)
 
+    llm = get_llm(id)
+    if cache_ttl and SETTINGS.llm_cache_enabled:
+        # The llms are shared between chains, the cache belongs to this one
+        llm = llm.model_copy(
+            update={"cache": ChainResponseCache(chain_id or id, cache_ttl)}
+        )
+
     # Create the chain instance
     chain_instance = ChainType(
-        llm=get_llm(id),
+        llm=llm,
         retry_llm=get_llm(retry_id),
         prompt=prompt,
         validation_llm=validation_llm_instance,
@@ -132,9 +146,22 @@ def init_chain(
     return chain_instance
 
 
+# Response cache ttls in seconds, only for chains on a deterministic model
+# that give the same answer to the same prompt
+RESPONSE_CACHE_DAY = 24 * 60 * 60
+RESPONSE_CACHE_WEEK = 7 * 24 * 60 * 60
+
 # Configuration mapping chain IDs to their setup parameters
 # Format: chain_id: (llm_id, prompt_formatter, check_hallucinations, sync_mode)
-CHAIN_CONFIG: Dict[str, tuple[str, PromptFormatter, bool, bool]] = {
+# or with a response cache ttl to opt in to the response cache:
+# chain_id: (llm_id, prompt_formatter, check_hallucinations, sync_mode, cache_ttl)
+CHAIN_CONFIG: Dict[
+    str,
+    Union[
+        tuple[str, PromptFormatter, bool, bool],
+        tuple[str, PromptFormatter, bool, bool, int],
+    ],
+] = {
     "combine_bullets": ("instruct", combine_description, False, False),
     "summary": (
         "instruct_detailed" if not DEVMODE else "instruct",
@@ -229,8 +256,20 @@ CHAIN_CONFIG: Dict[str, tuple[str, PromptFormatter, bool, bool]] = {
         False,
         False,
     ),  # Assuming 'tester' LLM exists
-    "web_source_builder": ("structured", web_source_builder, True, False),
-    "web_source_builder_sync": ("structured", web_source_builder, True, True),
+    "web_source_builder": (
+        "structured",
+        web_source_builder,
+        True,
+        False,
+        RESPONSE_CACHE_WEEK,
+    ),
+    "web_source_builder_sync": (
+        "structured",
+        web_source_builder,
+        True,
+        True,
+        RESPONSE_CACHE_WEEK,
+    ),
     "transcript_writer": (
         "instruct_detailed_warm",
         transcript_writer,
@@ -344,28 +383,37 @@ CHAIN_CONFIG: Dict[str, tuple[str, PromptFormatter, bool, bool]] = {
         group_rss_items,
         False,
         False,
+        RESPONSE_CACHE_DAY,
     ),
     "group_rss_items_sync": (
         "instruct_detailed",
         group_rss_items,
         False,
         True,
+        RESPONSE_CACHE_DAY,
     ),
     "validate_news_article": (
         "instruct",
         validate_news_article,
         False,
         False,
+        RESPONSE_CACHE_WEEK,
     ),
     "validate_news_article_sync": (
         "instruct",
         validate_news_article,
         False,
         True,
+        RESPONSE_CACHE_WEEK,
     ),
 }
 
 
+def get_cached_chain_ids() -> List[str]:
+    """Chains that opted in to the response cache."""
+    return [chain_id for chain_id, config in CHAIN_CONFIG.items() if len(config) > 4]
+
+
 def get_base_chain(chain_id: str) -> Union[BaseChain, RunnableSequence]:
     """Retrieves or initializes and caches a base chain instance (or RunnableSequence for special cases)."""
     global chains
@@ -373,12 +421,16 @@ def get_base_chain(chain_id: str) -> Union[BaseChain, RunnableSequence]:
         return chains[chain_id]
 
     if chain_id in CHAIN_CONFIG:
-        llm_id, prompt, check_for_hallucinations, sync_mode = CHAIN_CONFIG[chain_id]
+        llm_id, prompt, check_for_hallucinations, sync_mode, *cache_ttl = CHAIN_CONFIG[
+            chain_id
+        ]
         chains[chain_id] = init_chain(
             id=llm_id,  # Pass the LLM ID correctly
             prompt=prompt,
             check_for_hallucinations=check_for_hallucinations,
             sync_mode=sync_mode,
+            chain_id=chain_id,
+            cache_ttl=cache_ttl[0] if cache_ttl else None,
         )
         return chains[chain_id]
 
@@ -415,6 +467,14 @@ def get_base_chain(chain_id: str) -> Union[BaseChain, RunnableSequence]:
     raise ValueError(f"Unknown chain identifier: {chain_id}")
 
 
+def get_chain_model_settings(chain_id: str) -> ProviderModelSettings:
+    """Model settings of the main llm of a chain in CHAIN_CONFIG, the llm is not initialized."""
+    if chain_id not in CHAIN_CONFIG:
+        raise ValueError(f"Unknown chain identifier: {chain_id}")
+    _, model_settings, _ = get_llm_config(CHAIN_CONFIG[chain_id][0])
+    return model_settings
+
+
 def get_chain(
     chain_id: str, custom_prompt: tuple[str, str] | None = None
 ) -> RunnableSequence:
@@ -1,4 +1,4 @@
-from typing import Dict, Literal, Union
+from typing import Dict, Literal, Optional, Tuple, Union
 
 from langchain.callbacks.manager import CallbackManager
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
@@ -23,6 +23,12 @@ from langchain_community.chat_models.azureml_endpoint import (
 )
 
 
+from source.chains.rate_limiter import (
+    RATELIMIT_KEY_PREFIX,
+    Bucket,
+    RateLimitUsageHandler,
+    RedisRateLimiter,
+)
 from source.load_env import SETTINGS
 from source.models.config.logging import logger
 from source.models.config.default_env import DEBUGMODE
@@ -35,23 +41,73 @@ limiters: Dict[str, BaseRateLimiter] = {}
 llms: Dict[str, BaseLLM] = {}
 
 
-def get_limiter(model_config: ProviderModelSettings) -> Union[BaseRateLimiter, None]:
+def get_limiter(
+    model_config: ProviderModelSettings, provider: Optional[ProviderSettings] = None
+) -> Union[BaseRateLimiter, None]:
+    """
+    Shared rate limiter of the model with the request and token buckets of
+    the model and of its provider, None when the model has no limits.
+    """
     id = f"{model_config.provider}_{model_config.type}"
     if id in limiters.keys():
         return limiters[id]
 
-    limiter = (
-        InMemoryRateLimiter(
+    if not model_config or model_config.ratelimit_per_sec is None:
+        return None
+
+    model_key = f"{model_config.provider}:{model_config.model}"
+    request_buckets = [
+        Bucket(
+            key=f"{RATELIMIT_KEY_PREFIX}:requests:{model_key}",
+            rate=model_config.ratelimit_per_sec,
+            capacity=max(model_config.ratelimit_bucket or 1, 1),
+            cost=1,
+            required=1,
+        )
+    ]
+    token_buckets = []
+    if model_config.ratelimit_tokens_per_min:
+        token_buckets.append(
+            Bucket(
+                key=f"{RATELIMIT_KEY_PREFIX}:tokens:{model_key}",
+                rate=model_config.ratelimit_tokens_per_min / 60,
+                capacity=model_config.ratelimit_tokens_per_min,
+                cost=0,
+                required=1,
+            )
+        )
+    if provider is not None and provider.ratelimit_per_sec:
+        request_buckets.append(
+            Bucket(
+                key=f"{RATELIMIT_KEY_PREFIX}:requests:{provider.type}",
+                rate=provider.ratelimit_per_sec,
+                capacity=max(provider.ratelimit_bucket or 1, 1),
+                cost=1,
+                required=1,
+            )
+        )
+    if provider is not None and provider.ratelimit_tokens_per_min:
+        token_buckets.append(
+            Bucket(
+                key=f"{RATELIMIT_KEY_PREFIX}:tokens:{provider.type}",
+                rate=provider.ratelimit_tokens_per_min / 60,
+                capacity=provider.ratelimit_tokens_per_min,
+                cost=0,
+                required=1,
+            )
+        )
+
+    limiter = RedisRateLimiter(
+        request_buckets=request_buckets,
+        token_buckets=token_buckets,
+        check_every_n_seconds=model_config.ratelimit_interval or 0.1,
+        fallback=InMemoryRateLimiter(
             requests_per_second=model_config.ratelimit_per_sec,
             check_every_n_seconds=model_config.ratelimit_interval,
             max_bucket_size=model_config.ratelimit_bucket,
-        )
-        if model_config and model_config.ratelimit_per_sec is not None
-        else None
+        ),
     )
-
-    if limiter:
-        limiters[id] = limiter
+    limiters[id] = limiter
 
     return limiter
 
@@ -66,12 +122,15 @@ def init_llm(
         f"Initializing llm: {model.model=} with {model.context_size=} and {temperature=}..."
     )
 
+    rate_limiter = get_limiter(model, provider)
+    callbacks = [StreamingStdOutCallbackHandler()] if debug_mode else []
+    if isinstance(rate_limiter, RedisRateLimiter) and rate_limiter.token_buckets:
+        callbacks.append(RateLimitUsageHandler(rate_limiter))
+
     common_kwargs = {
         "verbose": debug_mode,
-        "rate_limiter": get_limiter(model),
-        "callback_manager": (
-            CallbackManager([StreamingStdOutCallbackHandler()]) if debug_mode else None
-        ),
+        "rate_limiter": rate_limiter,
+        "callback_manager": CallbackManager(callbacks) if callbacks else None,
     }
 
     # Handle temperature setting based on model type
@@ -196,32 +255,15 @@ def init_llm(
 temperature_map = {"default": 0.2, "zero": 0, "warm": 0.5}
 
 
-def get_llm(
+def get_llm_config(
     id: str = "default",
-    provider: Literal[
-        "OLLAMA",
-        "GROQ",
-        "BEDROCK",
-        "OPENAI",  # Added OPENAI for completeness, though not in original init_llm
-        "ANTHROPIC",  # Added ANTHROPIC for completeness
-        "AZURE",
-        "AZURE_ML",
-        "GEMINI",
-        None,
-    ] = None,
+    provider: Optional[str] = None,
     temperature: Literal["default", "zero", "warm", None] = None,
-) -> BaseLLM:
-    global llms
-    global SETTINGS
-
-    # Construct a unique key including temperature if specified
-    temp_key_part = f"_temp-{temperature}" if temperature else ""
-    provider_key_part = f"_provider-{provider}" if provider else ""
-    llm_key = f"{id}{temp_key_part}{provider_key_part}"
-
-    if llm_key in llms:
-        return llms[llm_key]
-
+) -> Tuple[ProviderSettings, ProviderModelSettings, float]:
+    """
+    Resolve the provider and model settings and the temperature of an llm id
+    without initializing the llm.
+    """
     llm_type = id
     temp_setting = temperature
 
@@ -276,6 +318,38 @@ def get_llm(
     if llm_config is None:
         raise ValueError(f"Could not determine LLM configuration for type: {llm_type}")
 
+    return provider_config, llm_config, temperature_value
+
+
+def get_llm(
+    id: str = "default",
+    provider: Literal[
+        "OLLAMA",
+        "GROQ",
+        "BEDROCK",
+        "OPENAI",  # Added OPENAI for completeness, though not in original init_llm
+        "ANTHROPIC",  # Added ANTHROPIC for completeness
+        "AZURE",
+        "AZURE_ML",
+        "GEMINI",
+        None,
+    ] = None,
+    temperature: Literal["default", "zero", "warm", None] = None,
+) -> BaseLLM:
+    global llms
+
+    # Construct a unique key including temperature if specified
+    temp_key_part = f"_temp-{temperature}" if temperature else ""
+    provider_key_part = f"_provider-{provider}" if provider else ""
+    llm_key = f"{id}{temp_key_part}{provider_key_part}"
+
+    if llm_key in llms:
+        return llms[llm_key]
+
+    provider_config, llm_config, temperature_value = get_llm_config(
+        id, provider, temperature
+    )
+
     # Initialize and cache the LLM
     logger.debug(
         f"Initializing LLM with key: {llm_key}, config: {llm_config.model}, provider: {provider_config.type}, temp: {temperature_value}"
@@ -0,0 +1,244 @@
+import asyncio
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, NamedTuple, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter, InMemoryRateLimiter
+
+from app.core.redis import get_sync_redis_client
+from source.models.config.logging import logger
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+# Lane of the llm calls made in this context, batch calls wait while
+# interactive ones are queued
+llm_priority: ContextVar[str] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+RATELIMIT_KEY_PREFIX = "llm_ratelimit"
+RATELIMIT_WAITERS_KEY = f"{RATELIMIT_KEY_PREFIX}:waiters"
+# A queued interactive call refreshes its entry on every check, entries older
+# than this belong to callers that are gone
+RATELIMIT_WAITER_TTL = 10
+RATELIMIT_MAX_SLEEP = 1.0
+
+# KEYS[1] is the waiters set, the rest are buckets. ARGV holds the lane, the
+# waiter id, the waiter ttl and (rate, capacity, cost, required) per bucket.
+# Returns "0" when all buckets had the required tokens and the cost was taken,
+# otherwise the seconds to wait.
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local lane = ARGV[1]
+local waiter = ARGV[2]
+local waiters = KEYS[1]
+redis.call('ZREMRANGEBYSCORE', waiters, '-inf', now - tonumber(ARGV[3]))
+if lane ~= 'interactive' and redis.call('ZCARD', waiters) > 0 then
+    return '0.05'
+end
+
+local wait = 0
+local levels = {}
+for i = 2, #KEYS do
+    local base = 4 + (i - 2) * 4
+    local rate = tonumber(ARGV[base])
+    local capacity = tonumber(ARGV[base + 1])
+    local required = tonumber(ARGV[base + 3])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < required then
+        wait = math.max(wait, (required - tokens) / rate)
+    end
+end
+
+if wait > 0 then
+    if lane == 'interactive' then
+        redis.call('ZADD', waiters, now, waiter)
+        redis.call('EXPIRE', waiters, 60)
+    end
+    return tostring(wait)
+end
+
+for i = 2, #KEYS do
+    local base = 4 + (i - 2) * 4
+    local rate = tonumber(ARGV[base])
+    local capacity = tonumber(ARGV[base + 1])
+    local cost = tonumber(ARGV[base + 2])
+    redis.call('HSET', KEYS[i], 'tokens', levels[i] - cost, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 60)
+end
+redis.call('ZREM', waiters, waiter)
+return '0'
+"""
+
+# Takes the used tokens from a token bucket after the call, the bucket may go
+# below zero so the following calls wait until it has refilled.
+DEBIT_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+tokens = math.max(-capacity, tokens - amount)
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(tokens)
+"""
+
+
+class Bucket(NamedTuple):
+    key: str
+    rate: float
+    capacity: float
+    # Taken on acquire, token buckets are charged after the call instead
+    cost: float
+    required: float
+
+
+@contextmanager
+def batch_priority():
+    """
+    Run the llm calls of the block, and of the Celery tasks sent from it, in
+    the batch lane.
+    """
+    token = llm_priority.set(PRIORITY_BATCH)
+    try:
+        yield
+    finally:
+        llm_priority.reset(token)
+
+
+class RedisRateLimiter(BaseRateLimiter):
+    """
+    Token bucket rate limiter shared by all processes through Redis.
+
+    Every call takes a request from the request buckets of the model and of
+    the provider and needs the token buckets to be above zero. The tokens
+    a call used are charged by RateLimitUsageHandler once it has finished.
+    While an interactive call waits, batch calls are held back. When Redis
+    can not be reached the limiter falls back to a local bucket.
+    """
+
+    def __init__(
+        self,
+        request_buckets: List[Bucket],
+        token_buckets: List[Bucket],
+        check_every_n_seconds: float,
+        fallback: Optional[InMemoryRateLimiter] = None,
+    ):
+        self.request_buckets = request_buckets
+        self.token_buckets = token_buckets
+        self.check_every_n_seconds = check_every_n_seconds
+        self.fallback = fallback
+        self._acquire_script = None
+        self._debit_script = None
+
+    def _try_acquire(self, lane: str, waiter: str) -> float:
+        if self._acquire_script is None:
+            self._acquire_script = get_sync_redis_client().register_script(
+                ACQUIRE_SCRIPT
+            )
+        buckets = self.request_buckets + self.token_buckets
+        args = [lane, waiter, RATELIMIT_WAITER_TTL]
+        for bucket in buckets:
+            args.extend([bucket.rate, bucket.capacity, bucket.cost, bucket.required])
+        return float(
+            self._acquire_script(
+                keys=[RATELIMIT_WAITERS_KEY, *(bucket.key for bucket in buckets)],
+                args=args,
+            )
+        )
+
+    def _sleep_time(self, wait: float) -> float:
+        return min(max(wait, self.check_every_n_seconds), RATELIMIT_MAX_SLEEP)
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        lane = llm_priority.get()
+        waiter = uuid.uuid4().hex
+        while True:
+            try:
+                wait = self._try_acquire(lane, waiter)
+            except Exception as e:
+                logger.error(f"Unable to reach shared rate limiter: {e}")
+                return (
+                    self.fallback.acquire(blocking=blocking) if self.fallback else True
+                )
+            if wait <= 0:
+                return True
+            if not blocking:
+                return False
+            time.sleep(self._sleep_time(wait))
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        lane = llm_priority.get()
+        waiter = uuid.uuid4().hex
+        while True:
+            try:
+                wait = await asyncio.to_thread(self._try_acquire, lane, waiter)
+            except Exception as e:
+                logger.error(f"Unable to reach shared rate limiter: {e}")
+                return (
+                    await self.fallback.aacquire(blocking=blocking)
+                    if self.fallback
+                    else True
+                )
+            if wait <= 0:
+                return True
+            if not blocking:
+                return False
+            await asyncio.sleep(self._sleep_time(wait))
+
+    def record_tokens(self, amount: int):
+        if not self.token_buckets or amount <= 0:
+            return
+        try:
+            if self._debit_script is None:
+                self._debit_script = get_sync_redis_client().register_script(
+                    DEBIT_SCRIPT
+                )
+            for bucket in self.token_buckets:
+                self._debit_script(
+                    keys=[bucket.key], args=[bucket.rate, bucket.capacity, amount]
+                )
+        except Exception as e:
+            logger.error(f"Unable to record token usage: {e}")
+
+
+def _total_tokens(response: LLMResult) -> int:
+    total = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                total += usage.get("total_tokens", 0)
+    if not total and response.llm_output:
+        usage = response.llm_output.get("token_usage") or response.llm_output.get(
+            "usage", {}
+        )
+        total = (usage or {}).get("total_tokens", 0)
+    return total
+
+
+class RateLimitUsageHandler(BaseCallbackHandler):
+    """
+    Charges the tokens used by the finished calls to the token buckets of
+    the limiter.
+    """
+
+    def __init__(self, limiter: RedisRateLimiter):
+        self.limiter = limiter
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        self.limiter.record_tokens(_total_tokens(response))
@@ -0,0 +1,235 @@
+import asyncio
+import random
+import re
+import time
+from typing import Any, Dict, Optional
+
+from celery import current_task
+from google.api_core.exceptions import ResourceExhausted
+from langchain_core.runnables import RunnableSequence
+from openai import RateLimitError
+
+from app.core.redis import get_sync_redis_client
+from source.models.config.logging import logger
+
+RATE_LIMIT_ERRORS = (RateLimitError, ResourceExhausted)
+DEFAULT_PROVIDER = "default"
+
+MAX_RATE_LIMIT_RETRIES = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+# A circuit open for longer re-queues the Celery task instead of sleeping,
+# backoff between the retries of a call always sleeps
+INLINE_MAX_WAIT = 5.0
+
+CIRCUIT_KEY_PREFIX = "llm_circuit"
+CIRCUIT_FAILURE_WINDOW = 60
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN = 30.0
+# The open state is read from Redis at most this often per process
+CIRCUIT_CHECK_INTERVAL = 1.0
+
+STATS_KEY_PREFIX = "llm_resilience:stats"
+
+
+class ProviderBackoff(BaseException):
+    """
+    Raised in a Celery task when the circuit of the provider stays open for
+    longer than INLINE_MAX_WAIT, the task is re-queued with the remaining
+    time as countdown.
+
+    A BaseException so the chain fallbacks and the retry loops catching
+    Exception let it through to the task.
+    """
+
+    def __init__(self, provider: str, delay: float):
+        super().__init__(f"Provider {provider} is backing off for {delay:.1f}s")
+        self.provider = provider
+        self.delay = delay
+
+
+class ProviderUnavailable(RuntimeError):
+    """
+    Raised by a task that was re-queued for a backing off provider too many
+    times. A normal Exception, so failure handling and error callbacks run.
+    """
+
+
+def provider_name(llm: Any) -> str:
+    if llm is None:
+        return DEFAULT_PROVIDER
+    llm = getattr(llm, "bound", llm)
+    if isinstance(llm, RunnableSequence):
+        llm = getattr(llm.first, "bound", llm.first)
+    try:
+        return llm._llm_type
+    except Exception:
+        return type(llm).__name__
+
+
+def retry_after_from_error(error: Exception) -> Optional[float]:
+    """
+    The delay the provider asked for, from the retry-after headers of the
+    response or from the error message.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+
+    message = str(getattr(error, "message", None) or error)
+    match = re.search(r"(?:retry after|in) (\d+(?:\.\d+)?) seconds", message, re.I)
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Exponential backoff with jitter, never shorter than the delay the
+    provider asked for.
+    """
+    backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+    backoff = backoff / 2 + random.uniform(0, backoff / 2)
+    if retry_after is not None:
+        backoff = max(backoff, retry_after + random.uniform(0, retry_after / 4))
+    return min(BACKOFF_MAX, backoff)
+
+
+def in_celery_task() -> bool:
+    return current_task is not None and not current_task.request.called_directly
+
+
+def record_metrics(provider: str, **values: float):
+    try:
+        pipe = get_sync_redis_client().pipeline()
+        for field, value in values.items():
+            pipe.hincrbyfloat(f"{STATS_KEY_PREFIX}:{provider}", field, value)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Unable to record llm resilience metrics: {e}")
+
+
+def get_resilience_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Retries, deferred tasks, opened circuits and waited seconds per provider,
+    shared by all processes.
+    """
+    redis_client = get_sync_redis_client()
+    return {
+        key.removeprefix(f"{STATS_KEY_PREFIX}:"): {
+            field: float(value) for field, value in redis_client.hgetall(key).items()
+        }
+        for key in redis_client.scan_iter(f"{STATS_KEY_PREFIX}:*")
+    }
+
+
+class ProviderCircuit:
+    """
+    Circuit breaker of a provider shared through Redis. Rate limit failures
+    are counted over CIRCUIT_FAILURE_WINDOW, past the threshold or when the
+    provider asks for a long wait the circuit opens and calls wait for it
+    to close instead of hitting the provider.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._key = f"{CIRCUIT_KEY_PREFIX}:{provider}"
+        self._open_until = 0.0
+        self._checked_at = 0.0
+        self._failing = False
+
+    def open_remaining(self) -> float:
+        now = time.time()
+        if now - self._checked_at >= CIRCUIT_CHECK_INTERVAL:
+            self._checked_at = now
+            try:
+                self._open_until = float(
+                    get_sync_redis_client().hget(self._key, "open_until") or 0
+                )
+            except Exception as e:
+                logger.error(f"Unable to read circuit of {self.provider}: {e}")
+        return max(0.0, self._open_until - now)
+
+    def record_failure(self, error: Exception, attempt: int) -> float:
+        """
+        Count the failure and return the delay before the next attempt.
+        """
+        retry_after = retry_after_from_error(error)
+        delay = backoff_delay(attempt, retry_after)
+        self._failing = True
+        try:
+            redis_client = get_sync_redis_client()
+            pipe = redis_client.pipeline()
+            pipe.hincrby(self._key, "failures", 1)
+            pipe.expire(self._key, CIRCUIT_FAILURE_WINDOW)
+            failures = pipe.execute()[0]
+            if failures >= CIRCUIT_FAILURE_THRESHOLD or delay >= CIRCUIT_COOLDOWN:
+                self._open_until = time.time() + max(delay, CIRCUIT_COOLDOWN)
+                self._checked_at = time.time()
+                redis_client.hset(self._key, "open_until", self._open_until)
+                redis_client.expire(
+                    self._key,
+                    int(max(delay, CIRCUIT_COOLDOWN)) + CIRCUIT_FAILURE_WINDOW,
+                )
+                record_metrics(self.provider, circuit_opened=1)
+                logger.warning(
+                    f"Circuit of {self.provider} open for {max(delay, CIRCUIT_COOLDOWN):.1f}s"
+                )
+        except Exception as e:
+            logger.error(f"Unable to record failure of {self.provider}: {e}")
+        return delay
+
+    def record_success(self):
+        if not self._failing:
+            return
+        self._failing = False
+        try:
+            get_sync_redis_client().hdel(self._key, "failures")
+        except Exception as e:
+            logger.error(f"Unable to reset circuit of {self.provider}: {e}")
+
+    def _open_delay(self) -> float:
+        delay = self.open_remaining()
+        if delay > INLINE_MAX_WAIT and in_celery_task():
+            record_metrics(self.provider, deferred=1)
+            raise ProviderBackoff(self.provider, delay)
+        return delay
+
+    def _backoff_delay(self, delay: float) -> float:
+        # Once open, the wait is left to the circuit check before the call
+        return 0.0 if self.open_remaining() > 0 else delay
+
+    def wait_open(self):
+        self._sleep(self._open_delay())
+
+    async def await_open(self):
+        await self._asleep(self._open_delay())
+
+    def backoff(self, delay: float):
+        self._sleep(self._backoff_delay(delay))
+
+    async def abackoff(self, delay: float):
+        await self._asleep(self._backoff_delay(delay))
+
+    def _sleep(self, delay: float):
+        if delay > 0:
+            record_metrics(self.provider, wait_seconds=delay)
+            time.sleep(delay)
+
+    async def _asleep(self, delay: float):
+        if delay > 0:
+            await asyncio.to_thread(record_metrics, self.provider, wait_seconds=delay)
+            await asyncio.sleep(delay)
+
+
+circuits: Dict[str, ProviderCircuit] = {}
+
+
+def get_circuit(provider: str) -> ProviderCircuit:
+    if provider not in circuits:
+        circuits[provider] = ProviderCircuit(provider)
+    return circuits[provider]
@@ -0,0 +1,121 @@
+import hashlib
+import re
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from app.core.redis import get_sync_redis_client
+from source.load_env import SETTINGS
+from source.models.config.logging import logger
+
+RESPONSE_KEY_PREFIX = "llm_cache:response"
+RESPONSE_INDEX_PREFIX = "llm_cache:index"
+RESPONSE_STATS_PREFIX = "llm_cache:stats"
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+class ChainResponseCache(BaseCache):
+    """
+    Redis backed response cache of a single chain. The llm of an opted in
+    chain is given its own instance, so a hit skips the provider and is
+    counted for that chain.
+
+    Entries are keyed by the chain id and a hash of the normalized prompt
+    and the llm string, which holds the model id and the temperature. Each
+    chain keeps at most max_entries responses, the least recently used are
+    evicted first.
+    """
+
+    def __init__(
+        self,
+        chain_id: str,
+        ttl: int,
+        max_entries: int = SETTINGS.llm_cache_max_entries,
+    ):
+        self.chain_id = chain_id
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._index_key = f"{RESPONSE_INDEX_PREFIX}:{chain_id}"
+        self._stats_key = f"{RESPONSE_STATS_PREFIX}:{chain_id}"
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256(
+            f"{normalize_prompt(prompt)}\n{llm_string}".encode("utf-8")
+        ).hexdigest()
+        return f"{RESPONSE_KEY_PREFIX}:{self.chain_id}:{digest}"
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        try:
+            redis_client = get_sync_redis_client()
+            data = redis_client.get(key)
+            pipe = redis_client.pipeline()
+            pipe.hincrby(self._stats_key, "hits" if data else "misses", 1)
+            if data:
+                pipe.zadd(self._index_key, {key: time.time()})
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Unable to read llm cache of {self.chain_id}: {e}")
+            return None
+        if not data:
+            return None
+        try:
+            return loads(data)
+        except Exception as e:
+            logger.error(f"Unable to load cached response of {self.chain_id}: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        key = self._key(prompt, llm_string)
+        try:
+            redis_client = get_sync_redis_client()
+            pipe = redis_client.pipeline()
+            pipe.set(key, dumps(list(return_val)), ex=self.ttl)
+            pipe.zadd(self._index_key, {key: time.time()})
+            pipe.zcard(self._index_key)
+            size = pipe.execute()[-1]
+            if size > self.max_entries:
+                evicted = redis_client.zpopmin(self._index_key, size - self.max_entries)
+                if evicted:
+                    redis_client.delete(*(key for key, _ in evicted))
+        except Exception as e:
+            logger.error(f"Unable to store llm cache of {self.chain_id}: {e}")
+
+    def clear(self, **kwargs: Any):
+        try:
+            redis_client = get_sync_redis_client()
+            keys = redis_client.zrange(self._index_key, 0, -1)
+            redis_client.delete(self._index_key, *keys)
+        except Exception as e:
+            logger.error(f"Unable to clear llm cache of {self.chain_id}: {e}")
+
+
+def get_response_cache_stats(chain_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Hits, misses and hit ratio of the response caches of the chains, shared
+    by all processes.
+    """
+    redis_client = get_sync_redis_client()
+    pipe = redis_client.pipeline()
+    for chain_id in chain_ids:
+        pipe.hgetall(f"{RESPONSE_STATS_PREFIX}:{chain_id}")
+        pipe.zcard(f"{RESPONSE_INDEX_PREFIX}:{chain_id}")
+    results = pipe.execute()
+
+    stats = {}
+    for i, chain_id in enumerate(chain_ids):
+        counters, size = results[2 * i], results[2 * i + 1]
+        hits = int(counters.get("hits", 0))
+        misses = int(counters.get("misses", 0))
+        stats[chain_id] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+            "entries": size,
+        }
+    return stats
@@ -0,0 +1,136 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from cachetools import TTLCache
+
+from app.core.redis import get_async_redis_client, get_sync_redis_client
+from source.models.config.logging import logger
+
+ACL_USER_VERSION_PREFIX = "acl_version:user"
+ACL_GROUP_VERSION_PREFIX = "acl_version:group"
+# Snapshots are also dropped after this when Redis can not be reached
+ACL_SNAPSHOT_TTL = 300
+ACL_SNAPSHOT_CACHE_SIZE = 1000
+
+# The version of the user followed by the versions of their groups
+AclVersion = Tuple[Optional[str], ...]
+
+
+class ACLSnapshot:
+    """
+    The items a user can reach through their ACL groups, loaded from
+    acl_group_users_with_items. acl_group_ids holds every group of the user
+    from acl_group_users, also the ones without items, so adding items to
+    them invalidates it.
+    """
+
+    def __init__(
+        self, rows: Iterable, acl_group_ids: Iterable, version: AclVersion = ()
+    ):
+        self.version = version
+        self.acl_group_ids: Set[str] = {str(group_id) for group_id in acl_group_ids}
+        self.items: Dict[str, Set[str]] = {}
+        for row in rows:
+            self.items.setdefault(row.item_type, set()).add(str(row.item_id))
+
+    def has_access(self, item_id: UUID, item_type: str) -> bool:
+        return str(item_id) in self.items.get(item_type, ())
+
+    def filter_accessible(self, item_ids: Iterable, item_type: str) -> List:
+        accessible = self.items.get(item_type, set())
+        return [item_id for item_id in item_ids if str(item_id) in accessible]
+
+
+_snapshots: TTLCache[str, ACLSnapshot] = TTLCache(
+    maxsize=ACL_SNAPSHOT_CACHE_SIZE, ttl=ACL_SNAPSHOT_TTL
+)
+_snapshots_lock = threading.Lock()
+
+
+def _user_version_key(auth_id) -> str:
+    return f"{ACL_USER_VERSION_PREFIX}:{auth_id}"
+
+
+def _group_version_key(acl_group_id) -> str:
+    return f"{ACL_GROUP_VERSION_PREFIX}:{acl_group_id}"
+
+
+async def get_acl_version(
+    auth_id: UUID, acl_group_ids: Iterable
+) -> Optional[AclVersion]:
+    """
+    Current version of the user's group memberships and of the items of
+    their groups, None when Redis can not be reached.
+    """
+    keys = [_user_version_key(auth_id)] + [
+        _group_version_key(group_id)
+        for group_id in sorted(set(map(str, acl_group_ids)))
+    ]
+    try:
+        redis_client = await get_async_redis_client()
+        return tuple(await redis_client.mget(keys))
+    except Exception as e:
+        logger.error(f"Unable to read acl version for {auth_id}: {e}")
+        return None
+
+
+async def get_acl_snapshot(auth_id: UUID) -> Optional[ACLSnapshot]:
+    """
+    The cached snapshot of the user while it is current. Without Redis the
+    snapshot is used until ACL_SNAPSHOT_TTL.
+    """
+    with _snapshots_lock:
+        snapshot = _snapshots.get(str(auth_id))
+    if snapshot is None:
+        return None
+    version = await get_acl_version(auth_id, snapshot.acl_group_ids)
+    if version is not None and snapshot.version != version:
+        return None
+    return snapshot
+
+
+def store_acl_snapshot(auth_id: UUID, snapshot: ACLSnapshot):
+    with _snapshots_lock:
+        _snapshots[str(auth_id)] = snapshot
+
+
+def invalidate_user_acl(auth_ids: Iterable):
+    """
+    Bump the version of the users whose group memberships changed, so every
+    process reloads their snapshot.
+    """
+    auth_ids = {str(auth_id) for auth_id in auth_ids if auth_id}
+    if not auth_ids:
+        return
+    with _snapshots_lock:
+        for auth_id in auth_ids:
+            _snapshots.pop(auth_id, None)
+    try:
+        pipe = get_sync_redis_client().pipeline()
+        for auth_id in auth_ids:
+            pipe.incr(_user_version_key(auth_id))
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Unable to invalidate acl of {auth_ids}: {e}")
+
+
+def invalidate_item_acl(acl_group_ids: Iterable):
+    """
+    Bump the version of the groups whose items changed, which invalidates
+    the snapshots of their users only.
+    """
+    acl_group_ids = {str(group_id) for group_id in acl_group_ids if group_id}
+    if not acl_group_ids:
+        return
+    with _snapshots_lock:
+        for auth_id, snapshot in list(_snapshots.items()):
+            if snapshot.acl_group_ids & acl_group_ids:
+                _snapshots.pop(auth_id, None)
+    try:
+        pipe = get_sync_redis_client().pipeline()
+        for group_id in acl_group_ids:
+            pipe.incr(_group_version_key(group_id))
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Unable to invalidate acl items of {acl_group_ids}: {e}")
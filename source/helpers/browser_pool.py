@@ -0,0 +1,232 @@
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Optional, TypeVar
+
+from celery.signals import worker_process_shutdown
+from playwright.async_api import (
+    async_playwright,
+    Browser as AsyncBrowser,
+    BrowserContext as AsyncBrowserContext,
+    Page as AsyncPage,
+    Playwright as AsyncPlaywright,
+)
+
+from source.load_env import SETTINGS
+from source.models.config.logging import logger
+
+R = TypeVar("R")
+
+
+class PooledBrowser:
+    """
+    A launched Chromium with its contexts and idle pages. A retired browser
+    takes no new pages and is closed once its last page is returned.
+    """
+
+    def __init__(
+        self,
+        playwright: AsyncPlaywright,
+        browser: AsyncBrowser,
+        contexts: list[AsyncBrowserContext],
+    ):
+        self.playwright = playwright
+        self.browser = browser
+        self.contexts = contexts
+        self.idle_pages: list[AsyncPage] = []
+        self.in_use = 0
+        self.navigations = 0
+        self.retired = False
+        self._next_context = 0
+
+    def is_healthy(self) -> bool:
+        return self.browser.is_connected()
+
+    async def new_page(self) -> AsyncPage:
+        context = self.contexts[self._next_context % len(self.contexts)]
+        self._next_context += 1
+        return await context.new_page()
+
+    async def close(self):
+        for page in self.idle_pages:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self.idle_pages = []
+        self.contexts = []
+        try:
+            await self.browser.close()
+        except Exception as e:
+            logger.error(f"Error while closing pooled browser: {e}")
+        try:
+            await self.playwright.stop()
+        except Exception as e:
+            logger.error(f"Error while stopping pooled playwright: {e}")
+
+
+class BrowserPool:
+    """
+    One Chromium per worker process, shared by every LinkResolver.
+
+    The browser runs on a dedicated event loop in a daemon thread, so it
+    survives between tasks and sync callers from any thread can run
+    coroutines on it with run(). Pages are spread over a few isolated
+    contexts, kept open for reuse and bounded by a semaphore. The browser is
+    recycled after a number of navigations or when it has disconnected: new
+    pages go to a fresh browser while the old one drains.
+    """
+
+    def __init__(
+        self,
+        contexts: int = SETTINGS.browser_pool_contexts,
+        max_pages: int = SETTINGS.browser_pool_max_pages,
+        max_navigations: int = SETTINGS.browser_pool_max_navigations,
+    ):
+        self.context_count = max(1, contexts)
+        self.max_pages = max(1, max_pages)
+        self.max_navigations = max_navigations
+
+        self._pid: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+        self._browser: Optional[PooledBrowser] = None
+        # Retired browsers that still have pages in use
+        self._draining: set[PooledBrowser] = set()
+        self._pages: Optional[asyncio.Semaphore] = None
+        self._browser_lock: Optional[asyncio.Lock] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._thread_lock:
+            # A forked worker can not use the parent's thread or browser
+            if self._pid != os.getpid() or self._thread is None:
+                self._pid = os.getpid()
+                self._loop = asyncio.new_event_loop()
+                self._pages = None
+                self._browser_lock = None
+                self._browser = None
+                self._draining = set()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="browser-pool", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro: Awaitable[R], timeout: Optional[float] = None) -> R:
+        """
+        Run the coroutine on the pool's event loop and wait for the result.
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("BrowserPool.run can not be called from the pool loop")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    async def _launch(self) -> PooledBrowser:
+        playwright = await async_playwright().start()
+        try:
+            browser = await playwright.chromium.launch()
+            contexts = [await browser.new_context() for _ in range(self.context_count)]
+        except Exception:
+            await playwright.stop()
+            raise
+        return PooledBrowser(playwright, browser, contexts)
+
+    async def _retire(self, browser: PooledBrowser):
+        browser.retired = True
+        if browser.in_use == 0:
+            await browser.close()
+        else:
+            self._draining.add(browser)
+
+    async def _acquire(self) -> PooledBrowser:
+        """
+        Return the current browser with one more page counted as in use, so
+        it can not be closed before the page is returned.
+        """
+        async with self._browser_lock:
+            browser = self._browser
+            if browser is not None and (
+                not browser.is_healthy()
+                or 0 < self.max_navigations <= browser.navigations
+            ):
+                logger.info(
+                    f"Recycling pooled browser after {browser.navigations} navigations"
+                )
+                self._browser = None
+                await self._retire(browser)
+
+            if self._browser is None:
+                self._browser = await self._launch()
+            self._browser.in_use += 1
+            return self._browser
+
+    async def _release(
+        self, browser: PooledBrowser, page: Optional[AsyncPage], healthy: bool
+    ):
+        browser.in_use -= 1
+        browser.navigations += 1
+        if page is not None and not page.is_closed():
+            if healthy and not browser.retired:
+                try:
+                    await page.goto("about:blank")
+                    browser.idle_pages.append(page)
+                    page = None
+                except Exception:
+                    pass
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+        if browser.retired and browser.in_use == 0 and browser in self._draining:
+            self._draining.discard(browser)
+            await browser.close()
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[AsyncPage]:
+        """
+        Borrow a page, waits while max_pages pages are in use.
+        """
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+            self._pages = asyncio.Semaphore(self.max_pages)
+
+        async with self._pages:
+            browser = await self._acquire()
+            page = None
+            healthy = False
+            try:
+                page = browser.idle_pages.pop() if browser.idle_pages else None
+                if page is None or page.is_closed():
+                    page = await browser.new_page()
+                yield page
+                healthy = True
+            finally:
+                await self._release(browser, page, healthy)
+
+    async def _stop(self):
+        browsers = list(self._draining)
+        if self._browser is not None:
+            browsers.append(self._browser)
+        self._browser = None
+        self._draining = set()
+        for browser in browsers:
+            await browser.close()
+
+    def close(self):
+        if self._loop is not None and self._pid == os.getpid():
+            try:
+                self.run(self._stop(), timeout=30)
+            except Exception as e:
+                logger.error(f"Error while closing browser pool: {e}")
+
+
+browser_pool = BrowserPool()
+
+
+@worker_process_shutdown.connect
+def close_browser_pool(**kwargs):
+    browser_pool.close()
@@ -154,8 +154,17 @@ def generate_email_from_template(
     # Prepare dynamic content for HTML and text
     body_html = ""
     body_text = f"{config.title}\n\n"
+    # Load panels and source references for all transcripts at once
+    panels = PanelDiscussion.fetch_many_from_supabase_sync(
+        supabase, [transcript.panel_id for transcript in transcripts]
+    )
+    source_references = PanelTranscriptSourceReference.fetch_grouped_from_supabase_sync(
+        supabase,
+        [transcript.id for transcript in transcripts],
+        id_column="transcript_id",
+    )
     for transcript in transcripts:
-        panel = PanelDiscussion.fetch_from_supabase_sync(supabase, transcript.panel_id)
+        panel = panels.get(str(transcript.panel_id))
         panel_title = panel.title if panel else "Unknown Panel"
         transcript_title = transcript.title or "Unknown Transcript"
         player_url = (
@@ -167,9 +176,7 @@ def generate_email_from_template(
             for subject in metadata.get("subjects", [])
         ]
         description = metadata.get("description", "No description available.")
-        sources = PanelTranscriptSourceReference.fetch_existing_from_supabase_sync(
-            supabase, filter={"transcript_id": transcript.id}
-        )
+        sources = source_references.get(str(transcript.id), [])
         sources_html = "".join(
             f'<li><a href="{source.data.get("url", "#")}" style="font-family: {config.font_family}; color: {config.link_color}; text-decoration: underline;">{source.data.get("title", "Unknown Source")}</a></li>'
             for source in sources
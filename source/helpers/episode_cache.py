@@ -0,0 +1,149 @@
+import json
+import re
+import threading
+from typing import Optional
+
+from cachetools import TTLCache
+from supabase import Client
+
+from app.core.redis import get_sync_redis_client
+from source.models.config.logging import logger
+from source.models.structures.panel import TranscriptMetadata
+from source.models.supabase.panel import PanelTranscript
+
+EPISODE_KEY_PREFIX = "episode_context"
+# Entries are keyed by content, so they only expire to free space
+EPISODE_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+EPISODE_LOCAL_CACHE_SIZE = 200
+# Length of the transcript excerpt used when the episode has no subjects
+EPISODE_EXCERPT_LENGTH = 1500
+
+
+class EpisodeContext:
+    """
+    What the prompts need of a previous episode: a compact summary built from
+    the transcript metadata and, when requested, the full transcript.
+    """
+
+    def __init__(self, summary: str, content: Optional[str] = None):
+        self.summary = summary
+        self.content = content
+
+    def to_json(self) -> str:
+        return json.dumps({"summary": self.summary, "content": self.content})
+
+    @classmethod
+    def from_json(cls, data: str) -> "EpisodeContext":
+        return cls(**json.loads(data))
+
+
+_local_episodes: TTLCache[str, EpisodeContext] = TTLCache(
+    maxsize=EPISODE_LOCAL_CACHE_SIZE, ttl=EPISODE_CACHE_MAX_AGE
+)
+_local_lock = threading.Lock()
+
+
+def _episode_key(transcript: PanelTranscript) -> str:
+    # The content hash recorded on upload, the file path for older records
+    metadata = transcript.metadata or {}
+    content_hash = metadata.get("transcript_hashes", {}).get(transcript.file)
+    version = content_hash or f"{transcript.file}:{transcript.updated_at}"
+    return f"{EPISODE_KEY_PREFIX}:{transcript.id}:{version}"
+
+
+def transcript_excerpt(content: str, length: int = EPISODE_EXCERPT_LENGTH) -> str:
+    text = re.sub(r"<[^>]+>", " ", content)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text[:length] + ("..." if len(text) > length else "")
+
+
+def summarize_episode(
+    transcript: PanelTranscript, content: Optional[str] = None
+) -> Optional[str]:
+    """
+    Describe the episode with the title, description and subjects written by
+    the summary writer. Falls back to an excerpt of the content, returns None
+    when neither is available.
+    """
+    try:
+        metadata = TranscriptMetadata(**(transcript.metadata or {}))
+    except Exception as e:
+        logger.debug(f"Unable to read metadata of transcript {transcript.id}: {e}")
+        metadata = TranscriptMetadata()
+
+    lines = []
+    if metadata.description:
+        lines.append(f"Description: {metadata.description}")
+    if metadata.subjects:
+        lines.append("Subjects:")
+        lines.extend(
+            f" - {subject.title}: {subject.description}"
+            for subject in metadata.subjects
+        )
+    elif content:
+        lines.append(f"Excerpt: {transcript_excerpt(content)}")
+
+    return "\n".join(lines) if lines else None
+
+
+def _get(key: str) -> Optional[EpisodeContext]:
+    with _local_lock:
+        episode = _local_episodes.get(key)
+    if episode is not None:
+        return episode
+    try:
+        data = get_sync_redis_client().get(key)
+    except Exception as e:
+        logger.error(f"Unable to read episode context {key}: {e}")
+        return None
+    if not data:
+        return None
+    episode = EpisodeContext.from_json(data)
+    with _local_lock:
+        _local_episodes[key] = episode
+    return episode
+
+
+def _store(key: str, episode: EpisodeContext):
+    with _local_lock:
+        _local_episodes[key] = episode
+    try:
+        get_sync_redis_client().set(key, episode.to_json(), ex=EPISODE_CACHE_MAX_AGE)
+    except Exception as e:
+        logger.error(f"Unable to store episode context {key}: {e}")
+
+
+def get_episode_context(
+    supabase_client: Client, transcript: PanelTranscript, load_content: bool = False
+) -> Optional[EpisodeContext]:
+    """
+    Return the context of the episode from the local or Redis cache, the
+    transcript file is only downloaded when the content is requested or
+    needed for the summary and has not been cached before.
+    """
+    key = _episode_key(transcript)
+    episode = _get(key)
+    if episode is not None and (episode.content is not None or not load_content):
+        return episode
+
+    summary = summarize_episode(transcript)
+    content = None
+    if load_content or summary is None:
+        try:
+            print(
+                f"Load transcript: {transcript.title}, from {transcript.bucket_id} with name {transcript.file}"
+            )
+            response = supabase_client.storage.from_(transcript.bucket_id).download(
+                transcript.file
+            )
+            content = response.decode("utf-8")
+        except Exception as e:
+            print(f"Failed to load transcript {transcript.title} because {repr(e)}")
+            if summary is None:
+                return None
+        if summary is None:
+            summary = summarize_episode(transcript, content)
+
+    episode = EpisodeContext(summary, content)
+    _store(key, episode)
+    return episode
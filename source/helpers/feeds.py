@@ -0,0 +1,225 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import re
+import time
+from typing import List, Optional, Union
+
+import aiohttp
+import feedparser
+from feedparser.util import FeedParserDict
+from pygooglenews import GoogleNews
+
+from app.core.redis import get_sync_redis_client
+from source.models.config.logging import logger
+from source.models.structures.sources import GoogleNewsConfig, GooglenewsFeedType
+
+FEED_KEY_PREFIX = "feed"
+# Feeds younger than this are used without asking the upstream
+FEED_CACHE_TTL = 300
+# Parsed feeds are kept longer so a 304 response can reuse them
+FEED_MAX_AGE = 24 * 60 * 60
+FEED_TIMEOUT = 20
+FEED_CONCURRENCY = 8
+
+FeedRequest = Union[str, GoogleNewsConfig]
+
+
+def parse_since_value(since_value):
+    if since_value is None:
+        return None
+    print(f"GoogleNews: Parsing since value: {since_value}")
+    pattern = r"(\d+)([hdm])"
+    matches = re.findall(pattern, since_value)
+
+    total_timedelta = datetime.timedelta()
+
+    for amount, unit in matches:
+        time_amount = int(amount)
+
+        if unit == "h":
+            total_timedelta += datetime.timedelta(hours=time_amount)
+        elif unit == "d":
+            total_timedelta += datetime.timedelta(days=time_amount)
+        elif unit == "m":
+            total_timedelta += datetime.timedelta(days=(time_amount * 30.44))
+
+    return total_timedelta
+
+
+def google_news_feed_parse(config: GoogleNewsConfig) -> dict:
+    gn = GoogleNews(lang=config.lang, country=config.country)
+    time_span = parse_since_value(config.since)
+
+    print(f"GoogleNews: Time span for news items: {time_span}")
+    if config.feed_type == GooglenewsFeedType.SEARCH or config.query:
+        config.feed_type = GooglenewsFeedType.SEARCH
+        print(f"GoogleNews: Searching news with query: {config.query}")
+        news = gn.search(config.query, when=config.since)
+    elif config.feed_type == GooglenewsFeedType.LOCATION or config.location:
+        config.feed_type = GooglenewsFeedType.LOCATION
+        if isinstance(config.location, list):
+            news = gn.geo_multiple_headlines(config.location)
+        else:
+            news = gn.geo_headlines(config.location)
+    elif config.feed_type == GooglenewsFeedType.TOPIC or config.topic:
+        config.feed_type = GooglenewsFeedType.TOPIC
+        if isinstance(config.topic, list):
+            news = gn.topic_multiple_headlines(config.topic, time_span=time_span)
+        else:
+            news = gn.topic_headlines(config.topic)
+    else:
+        news = gn.top_news()
+
+    return news
+
+
+def _feed_key(key: str) -> str:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return f"{FEED_KEY_PREFIX}:{digest}"
+
+
+def _request_key(request: FeedRequest) -> str:
+    if isinstance(request, GoogleNewsConfig):
+        return f"google_news:{request.model_dump_json()}"
+    return request
+
+
+def _json_default(obj):
+    # struct_time values of the parsed dates and the bozo exception
+    if isinstance(obj, time.struct_time):
+        return list(obj)
+    return str(obj)
+
+
+def _json_object_hook(obj: dict) -> FeedParserDict:
+    # Parsed dates are stored as lists by _json_default
+    for key, value in obj.items():
+        if key.endswith("_parsed") and isinstance(value, list) and len(value) == 9:
+            obj[key] = time.struct_time(value)
+    # Restore the attribute access used by create_web_source, e.g. entry.title
+    return FeedParserDict(obj)
+
+
+def _load_entry(key: str) -> Optional[dict]:
+    try:
+        data = get_sync_redis_client().get(_feed_key(key))
+        return json.loads(data, object_hook=_json_object_hook) if data else None
+    except Exception as e:
+        logger.error(f"Unable to load cached feed {key}: {e}")
+        return None
+
+
+def _store_entry(key: str, entry: dict):
+    try:
+        get_sync_redis_client().set(
+            _feed_key(key), json.dumps(entry, default=_json_default), ex=FEED_MAX_AGE
+        )
+    except Exception as e:
+        logger.error(f"Unable to cache feed {key}: {e}")
+
+
+def _parse_entry(entry: dict) -> FeedParserDict:
+    return entry["feed"]
+
+
+def _is_fresh(entry: Optional[dict]) -> bool:
+    return entry is not None and time.time() - entry["fetched_at"] < FEED_CACHE_TTL
+
+
+async def fetch_feed(session: aiohttp.ClientSession, url: str) -> FeedParserDict:
+    """
+    Fetch and parse a feed through the shared cache, revalidating stale
+    entries with ETag and Last-Modified.
+    """
+    entry = _load_entry(url)
+    if _is_fresh(entry):
+        print(f"Feeds: Cache hit for {url}")
+        return _parse_entry(entry)
+
+    headers = {}
+    if entry is not None and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry is not None and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        async with session.get(url, headers=headers, allow_redirects=True) as response:
+            if response.status == 304 and entry is not None:
+                print(f"Feeds: Not modified {url}")
+                entry["fetched_at"] = time.time()
+                _store_entry(url, entry)
+                return _parse_entry(entry)
+            response.raise_for_status()
+            body = await response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except Exception as e:
+        if entry is not None:
+            print(f"Feeds: Using stale {url} after fetch failed: {e}")
+            return _parse_entry(entry)
+        raise
+
+    feed = await asyncio.to_thread(feedparser.parse, body)
+    _store_entry(
+        url,
+        {
+            "feed": feed,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        },
+    )
+    return feed
+
+
+async def fetch_google_feed(config: GoogleNewsConfig) -> FeedParserDict:
+    """
+    Google News is fetched by pygooglenews, which has no conditional GET, so
+    only the shared cache applies.
+    """
+    key = _request_key(config)
+    entry = _load_entry(key)
+    if _is_fresh(entry):
+        print(f"Feeds: Cache hit for {key}")
+        return _parse_entry(entry)
+
+    news = await asyncio.to_thread(google_news_feed_parse, config.model_copy())
+    _store_entry(key, {"feed": news, "fetched_at": time.time()})
+    return news
+
+
+async def fetch_feeds(requests: List[FeedRequest]) -> List[Optional[FeedParserDict]]:
+    """
+    Fetch all feeds concurrently, returns None for feeds that failed.
+    """
+    semaphore = asyncio.Semaphore(FEED_CONCURRENCY)
+
+    async with aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=FEED_TIMEOUT)
+    ) as session:
+
+        async def fetch(request: FeedRequest) -> Optional[FeedParserDict]:
+            async with semaphore:
+                try:
+                    if isinstance(request, GoogleNewsConfig):
+                        return await fetch_google_feed(request)
+                    return await fetch_feed(session, request)
+                except Exception as e:
+                    print(f"Feeds: Unable to fetch {_request_key(request)}: {e}")
+                    return None
+
+        return await asyncio.gather(*(fetch(request) for request in requests))
+
+
+def fetch_feeds_sync(requests: List[FeedRequest]) -> List[Optional[FeedParserDict]]:
+    """
+    fetch_feeds for sync callers, e.g. Celery tasks. Code running on an event
+    loop awaits fetch_feeds or calls this through asyncio.to_thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(fetch_feeds(requests))
+    raise RuntimeError("fetch_feeds_sync can not be called from a running event loop")
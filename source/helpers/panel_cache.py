@@ -0,0 +1,128 @@
+import hashlib
+from typing import Iterable, List, Optional, Set, Tuple
+
+from app.core.redis import get_async_redis_client, get_sync_redis_client
+from source.models.config.logging import logger
+
+PANEL_DETAILS_KEY_PREFIX = "panel_details"
+PANEL_TRANSCRIPT_KEY_PREFIX = "panel_details:transcript"
+# Upper bound for staleness, writes through the panel models invalidate earlier
+PANEL_DETAILS_TTL = 10 * 60
+
+
+def _details_key(panel_id) -> str:
+    return f"{PANEL_DETAILS_KEY_PREFIX}:{panel_id}"
+
+
+def _transcript_key(transcript_id) -> str:
+    return f"{PANEL_TRANSCRIPT_KEY_PREFIX}:{transcript_id}"
+
+
+def panel_details_etag(data: str) -> str:
+    return f'"{hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def get_cached_panel_details(panel_id) -> Optional[Tuple[str, str]]:
+    """
+    Return the cached (json, etag) of the public panel details.
+    """
+    try:
+        redis_client = await get_async_redis_client()
+        entry = await redis_client.hgetall(_details_key(panel_id))
+        if entry and "data" in entry and "etag" in entry:
+            logger.info(f"Panel details cache hit for {panel_id}")
+            return entry["data"], entry["etag"]
+    except Exception as e:
+        logger.error(f"Unable to read panel details cache for {panel_id}: {e}")
+    return None
+
+
+async def store_panel_details(
+    panel_id, data: str, transcript_ids: Iterable = ()
+) -> str:
+    """
+    Cache the json of the public panel details and return its etag. The
+    transcripts point back to the panel so writes of their source
+    references can find the entry.
+    """
+    etag = panel_details_etag(data)
+    try:
+        redis_client = await get_async_redis_client()
+        pipe = redis_client.pipeline()
+        key = _details_key(panel_id)
+        pipe.hset(key, mapping={"data": data, "etag": etag})
+        pipe.expire(key, PANEL_DETAILS_TTL)
+        for transcript_id in transcript_ids:
+            pipe.set(
+                _transcript_key(transcript_id), str(panel_id), ex=PANEL_DETAILS_TTL
+            )
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Unable to store panel details cache for {panel_id}: {e}")
+    return etag
+
+
+def _invalidation_keys(
+    panel_ids: Iterable, transcript_ids: Iterable
+) -> Tuple[Set[str], List[str]]:
+    keys = {_details_key(panel_id) for panel_id in panel_ids if panel_id}
+    transcript_keys = [
+        _transcript_key(transcript_id)
+        for transcript_id in transcript_ids
+        if transcript_id
+    ]
+    return keys, transcript_keys
+
+
+def invalidate_panel_details(panel_ids: Iterable = (), transcript_ids: Iterable = ()):
+    """
+    Drop the cached details of the panels, and of the panels the transcripts
+    were cached with.
+    """
+    keys, transcript_keys = _invalidation_keys(panel_ids, transcript_ids)
+    if not keys and not transcript_keys:
+        return
+
+    try:
+        redis_client = get_sync_redis_client()
+        if transcript_keys:
+            keys.update(
+                _details_key(panel_id)
+                for panel_id in redis_client.mget(transcript_keys)
+                if panel_id
+            )
+        if keys:
+            redis_client.delete(*keys)
+    except Exception as e:
+        logger.error(f"Unable to invalidate panel details cache: {e}")
+
+
+async def invalidate_panel_details_async(
+    panel_ids: Iterable = (), transcript_ids: Iterable = ()
+):
+    """
+    invalidate_panel_details for the async model writes.
+    """
+    keys, transcript_keys = _invalidation_keys(panel_ids, transcript_ids)
+    if not keys and not transcript_keys:
+        return
+
+    try:
+        redis_client = await get_async_redis_client()
+        if transcript_keys:
+            keys.update(
+                _details_key(panel_id)
+                for panel_id in await redis_client.mget(transcript_keys)
+                if panel_id
+            )
+        if keys:
+            await redis_client.delete(*keys)
+    except Exception as e:
+        logger.error(f"Unable to invalidate panel details cache: {e}")
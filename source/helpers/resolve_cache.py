@@ -0,0 +1,271 @@
+import hashlib
+import json
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import requests
+
+from app.core.redis import get_sync_redis_client
+from source.load_env import SETTINGS
+from source.models.config.logging import logger
+from source.models.structures.url_result import UrlResult
+
+URL_KEY_PREFIX = "url_result:url"
+CONTENT_KEY_PREFIX = "url_result:content"
+FAILED_URL_KEY_PREFIX = "url_result:failed"
+DOMAIN_STATS_PREFIX = "url_result:domain"
+IMAGE_URL_KEY_PREFIX = "url_result:image_url"
+IMAGE_KEY_PREFIX = "url_result:image"
+REVALIDATE_TIMEOUT = 10
+# Unresolvable urls, e.g. 4xx or rejected articles, are not retried before this
+FAILED_URL_TTL = 30 * 60
+
+# Hosts whose pages mostly need the browser skip the http fast path
+DOMAIN_STATS_MAX_AGE = 30 * 24 * 60 * 60
+DOMAIN_MIN_ATTEMPTS = 3
+DOMAIN_ESCALATION_RATIO = 0.6
+
+# Query parameters that do not change the content of the page
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ref"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize the url so the same article found through different feeds maps
+    to the same cache key: lowercase scheme and host, no default port, no
+    fragment, no tracking parameters and sorted query parameters.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (
+        scheme == "https" and netloc.endswith(":443")
+    ):
+        netloc = netloc.rsplit(":", 1)[0]
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+
+    return urlunparse(
+        (scheme, netloc, parsed.path or "/", parsed.params, urlencode(query), "")
+    )
+
+
+def _url_key(url: str) -> str:
+    digest = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+    return f"{URL_KEY_PREFIX}:{digest}"
+
+
+def _content_key(content_hash: str) -> str:
+    return f"{CONTENT_KEY_PREFIX}:{content_hash}"
+
+
+def _revalidate(entry: dict) -> bool:
+    """
+    Check with a conditional request whether the cached page is still current.
+    """
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    if not headers:
+        return False
+
+    try:
+        with requests.get(
+            entry["url"],
+            headers=headers,
+            timeout=REVALIDATE_TIMEOUT,
+            allow_redirects=True,
+            stream=True,
+        ) as response:
+            if response.status_code == 304:
+                return True
+            etag = response.headers.get("etag")
+            return bool(etag and etag == entry.get("etag"))
+    except Exception as e:
+        logger.debug(f"Unable to revalidate {entry.get('url')}: {e}")
+        return False
+
+
+def get_cached_url_result(url: str) -> Optional[UrlResult]:
+    """
+    Return the cached UrlResult for the url if it is fresh or the origin
+    confirms it has not changed since it was resolved.
+    """
+    try:
+        redis_client = get_sync_redis_client()
+        entry_data = redis_client.get(_url_key(url))
+        if not entry_data:
+            return None
+        entry = json.loads(entry_data)
+
+        if time.time() - entry.get("checked_at", 0) > SETTINGS.resolve_cache_ttl:
+            if not _revalidate(entry):
+                return None
+            entry["checked_at"] = time.time()
+            _store_entry(redis_client, [url, entry["url"]], entry)
+
+        result_data = redis_client.get(_content_key(entry["content_hash"]))
+        if not result_data:
+            return None
+
+        result = UrlResult.model_validate_json(result_data)
+        result.orig_url = url
+        logger.info(f"Resolve cache hit for {url}")
+        return result
+    except Exception as e:
+        logger.error(f"Unable to read resolve cache for {url}: {e}")
+        return None
+
+
+def _store_entry(redis_client, urls: list[str], entry: dict):
+    data = json.dumps(entry)
+    for url in set(urls):
+        if url:
+            redis_client.set(_url_key(url), data, ex=SETTINGS.resolve_cache_max_age)
+
+
+def store_url_result(url: str, result: UrlResult, response_headers: dict = None):
+    """
+    Store the result by the hash of its content, and point both the original
+    and the resolved url to it.
+    """
+    try:
+        result_data = result.model_dump_json()
+        content_hash = hashlib.sha256(
+            (result.human_readable_content or result_data).encode("utf-8")
+        ).hexdigest()
+        response_headers = response_headers or {}
+
+        redis_client = get_sync_redis_client()
+        redis_client.set(
+            _content_key(content_hash),
+            result_data,
+            ex=SETTINGS.resolve_cache_max_age,
+        )
+        _store_entry(
+            redis_client,
+            [url, result.resolved_url],
+            {
+                "url": result.resolved_url or url,
+                "content_hash": content_hash,
+                "etag": response_headers.get("etag"),
+                "last_modified": response_headers.get("last-modified"),
+                "checked_at": time.time(),
+            },
+        )
+    except Exception as e:
+        logger.error(f"Unable to store resolve cache for {url}: {e}")
+
+
+def _failed_url_key(url: str) -> str:
+    digest = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+    return f"{FAILED_URL_KEY_PREFIX}:{digest}"
+
+
+def get_cached_failure(url: str) -> Optional[str]:
+    """
+    Return the reason the url was recently found unresolvable.
+    """
+    try:
+        return get_sync_redis_client().get(_failed_url_key(url))
+    except Exception as e:
+        logger.error(f"Unable to read resolve failure cache for {url}: {e}")
+        return None
+
+
+def store_url_failure(url: str, reason: str):
+    """
+    Remember an unresolvable url for FAILED_URL_TTL, so links repeated across
+    feeds are not fetched and validated again right away.
+    """
+    try:
+        get_sync_redis_client().set(
+            _failed_url_key(url), reason or "failed", ex=FAILED_URL_TTL
+        )
+    except Exception as e:
+        logger.error(f"Unable to store resolve failure cache for {url}: {e}")
+
+
+def _domain_key(url: str) -> str:
+    return f"{DOMAIN_STATS_PREFIX}:{urlparse(url).netloc.lower()}"
+
+
+def record_resolve_path(url: str, escalated: bool):
+    """
+    Count whether the url needed the browser or could be fetched over http.
+    """
+    try:
+        redis_client = get_sync_redis_client()
+        key = _domain_key(url)
+        pipe = redis_client.pipeline()
+        pipe.hincrby(key, "escalated" if escalated else "http", 1)
+        pipe.expire(key, DOMAIN_STATS_MAX_AGE)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Unable to record resolve stats for {url}: {e}")
+
+
+def prefers_browser(url: str) -> bool:
+    """
+    True when the host has been escalated to the browser often enough that
+    trying the http fast path first is wasted time.
+    """
+    try:
+        stats = get_sync_redis_client().hgetall(_domain_key(url)) or {}
+        escalated = int(stats.get("escalated", 0))
+        total = escalated + int(stats.get("http", 0))
+        return (
+            total >= DOMAIN_MIN_ATTEMPTS
+            and escalated / total >= DOMAIN_ESCALATION_RATIO
+        )
+    except Exception as e:
+        logger.error(f"Unable to read resolve stats for {url}: {e}")
+        return False
+
+
+def _image_url_key(url: str) -> str:
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return f"{IMAGE_URL_KEY_PREFIX}:{digest}"
+
+
+def get_cached_image(url: str = None, content_hash: str = None) -> Optional[str]:
+    """
+    Return the encoded data uri of an image by its url or by the hash of its
+    original bytes.
+    """
+    try:
+        redis_client = get_sync_redis_client()
+        if content_hash is None and url is not None:
+            content_hash = redis_client.get(_image_url_key(url))
+        if not content_hash:
+            return None
+        return redis_client.get(f"{IMAGE_KEY_PREFIX}:{content_hash}")
+    except Exception as e:
+        logger.error(f"Unable to read image cache for {url or content_hash}: {e}")
+        return None
+
+
+def store_cached_image(url: str, content_hash: str, data: Optional[str] = None):
+    """
+    Point the url to the image hash, and store the encoded image if given.
+    """
+    try:
+        redis_client = get_sync_redis_client()
+        pipe = redis_client.pipeline()
+        pipe.set(_image_url_key(url), content_hash, ex=SETTINGS.resolve_cache_max_age)
+        if data is not None:
+            pipe.set(
+                f"{IMAGE_KEY_PREFIX}:{content_hash}",
+                data,
+                ex=SETTINGS.resolve_cache_max_age,
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Unable to store image cache for {url}: {e}")
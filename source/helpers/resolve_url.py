@@ -1,26 +1,125 @@
+import asyncio
 import base64
 from datetime import datetime
+import hashlib
 import json
+from typing import Optional
 from urllib.parse import urljoin, urlparse
-from playwright.sync_api import sync_playwright, Page, Playwright, Browser
-from playwright.async_api import (
-    async_playwright,
-    Page as AsyncPage,
-    Playwright as AsyncPlaywright,
-    Browser as AsyncBrowser,
-)
+from weakref import WeakKeyDictionary
+import aiohttp
+from playwright.async_api import Page as AsyncPage
 from bs4 import BeautifulSoup, Tag
 import trafilatura
-from source.llm_exec.news_exec import validate_news_article, validate_news_article_sync
+from source.helpers.browser_pool import browser_pool
+from source.helpers.resolve_cache import (
+    get_cached_failure,
+    get_cached_image,
+    get_cached_url_result,
+    prefers_browser,
+    record_resolve_path,
+    store_cached_image,
+    store_url_failure,
+    store_url_result,
+)
+from source.llm_exec.news_exec import validate_news_article_sync
 from source.models.config.logging import logger
-import asyncio
-import nest_asyncio
 from PIL import Image
 import io
 
 from source.models.structures.url_result import UrlResult
 
 
+HTTP_TIMEOUT = 15
+HTTP_POOL_LIMIT = 20
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9,fi;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+}
+# Less text than this means a js shell or a wall instead of the article
+MIN_HTTP_TEXT_LENGTH = 500
+BROWSER_REQUIRED_MARKERS = [
+    "cf-chl",
+    "challenge-platform",
+    "<title>just a moment...</title>",
+]
+# Also found in noscript footers of full articles, these only count when the
+# page has less text than JS_MARKER_MAX_TEXT_LENGTH
+JS_REQUIRED_MARKERS = [
+    "enable javascript",
+    "javascript is required",
+    "please enable js",
+]
+JS_MARKER_MAX_TEXT_LENGTH = 2000
+
+# Images are fetched in parallel over the shared http session
+IMAGE_FETCH_CONCURRENCY = 4
+IMAGE_FETCH_RETRIES = 3
+# Other 4xx responses are final and not retried
+IMAGE_RETRYABLE_CLIENT_ERRORS = {408, 429}
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+IMAGE_FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+
+# 4xx responses that are worth retrying later, 403 is also used by challenges
+RETRYABLE_CLIENT_ERRORS = {403, 408, 429}
+
+
+class UnresolvableUrlError(Exception):
+    """
+    The url does not lead to a valid article, e.g. it answers with a 4xx or
+    its content is rejected by the validation. Only these failures are
+    cached, network and provider errors are retried on the next resolve.
+    """
+
+
+_http_sessions: "WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+    WeakKeyDictionary()
+)
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    Shared keep-alive session for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_POOL_LIMIT, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            headers=HTTP_HEADERS,
+        )
+        _http_sessions[loop] = session
+    return session
+
+
+def needs_browser(
+    status: int, resolved_url: str, content: str, text: Optional[str]
+) -> bool:
+    """
+    Check if a plain http response is a js shell, a consent wall or a
+    Cloudflare challenge instead of the article. The text is the one
+    extracted from the content.
+    """
+    if status >= 400:
+        return True
+    if "consent" in urlparse(resolved_url).netloc.lower():
+        return True
+    lower_content = content.lower()
+    if any(marker in lower_content for marker in BROWSER_REQUIRED_MARKERS):
+        return True
+    text_length = len(text) if text else 0
+    if any(marker in lower_content for marker in JS_REQUIRED_MARKERS):
+        return text_length < JS_MARKER_MAX_TEXT_LENGTH
+    return text_length < MIN_HTTP_TEXT_LENGTH
+
+
 def parse_publish_date(date_str):
     try:
         return datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S%z") if date_str else None
@@ -40,6 +139,37 @@ def parse_publish_date(date_str):
                     return None
 
 
+def sniff_image_format(image_data: bytes) -> Optional[str]:
+    """Detect the image format from the bytes instead of the content-type."""
+    try:
+        with Image.open(io.BytesIO(image_data)) as img:
+            return img.format
+    except Exception:
+        return None
+
+
+def encode_image(image_data: bytes) -> Optional[str]:
+    """Resize a supported image and encode it as a data uri."""
+    if sniff_image_format(image_data) not in IMAGE_FORMATS:
+        return None
+    image_bytes = process_image(image_data)
+    base64_data = base64.b64encode(image_bytes).decode("utf-8")
+    return f"data:image/jpeg;base64,{base64_data}"
+
+
+async def read_limited(response: aiohttp.ClientResponse, max_bytes: int) -> bytes:
+    """Read the body, raising if it is larger than max_bytes."""
+    content_length = response.content_length
+    if content_length is not None and content_length > max_bytes:
+        raise ValueError(f"Content too large: {content_length} bytes")
+    data = bytearray()
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        data.extend(chunk)
+        if len(data) > max_bytes:
+            raise ValueError(f"Content larger than {max_bytes} bytes")
+    return bytes(data)
+
+
 def process_image(image_data: bytes) -> bytes:
     """Rescale and convert image to JPG format."""
     with Image.open(io.BytesIO(image_data)) as img:
@@ -88,20 +218,12 @@ def clean_html(content: str) -> str:
 
 
 class LinkResolver:
-    is_async: bool = False
-    playwright: Playwright = None
-    browser: Browser = None
-    page: Page = None
-    async_playwright: AsyncPlaywright = None
-    async_browser: AsyncBrowser = None
     async_page: AsyncPage = None
+    response_headers: dict = None
 
     def __init__(self, reformat_text=False):
-        if not asyncio.get_event_loop().is_running():
-            self.playwright = sync_playwright().start()
-            self.browser = self.playwright.chromium.launch()
-        else:
-            self.is_async = True
+        # Pages are borrowed from the worker's browser pool on a cache miss
+        self.response_headers = {}
 
         self.reformat_text = reformat_text
 
@@ -125,56 +247,6 @@ class LinkResolver:
             "non-specific-custom": "#AcceptCookiesButton, #acceptCookies, .cookie-accept, #cookie-accept, .gdpr-cookie--accept-all, button[class*='accept'], button[id*='accept'], button[class*='accept'], button[class*='agree'], button[id*='accept'], #cookiebanner button, button[class*='cookie'], button[name='agree'], button[data-action='acceptAll'], button[data-cookiebanner='accept_button'], button:has-text('Accept'), a:has-text('Accept'), span:has-text('Accept all cookies')",
         }
 
-    def _get_page_sync(self, url):
-        self.page = (
-            self.browser.new_page()
-        )  # Use the incognito context to create a new page
-        self.page.goto(url)
-
-    def _cloudfare_sync(self):
-        # Check for Cloudflare challenge
-        if "cloudflare" in self.page.content().lower():
-            logger.info("Cloudflare challenge detected, attempting to bypass.")
-            self.page.wait_for_timeout(
-                5000
-            )  # Wait for 5 seconds to let Cloudflare challenge pass
-            self.page.reload()
-            self.page.wait_for_load_state("networkidle")
-
-    def _resolve_content_sync(self, url) -> tuple[str, str]:
-        max_tries = 5
-        tries = 0
-        original_url = url
-        resolved_url = self.page.url
-
-        while (resolved_url != original_url and tries < max_tries) or tries == 0:
-            original_url = resolved_url
-            if "chrome-error://chromewebdata/" in resolved_url:
-                raise Exception("Encountered a chrome-error URL")
-
-            # Try to accept consent using known selectors
-            for selector in self.consent_accept_selectors.values():
-                if self.page.locator(selector).count() > 0:
-                    try:
-                        self.page.click(selector)
-                        self.page.wait_for_load_state("networkidle")
-                    except Exception as e:
-                        logger.error(f"Error clicking consent button: {e}")
-                    break
-
-            resolved_url = self.page.url
-            tries += 1
-
-        if resolved_url != original_url:
-            raise Exception(
-                "Final URL differs from the original URL after maximum retries"
-            )
-
-        # Get the page content
-        content = self.page.content()
-
-        return resolved_url, content
-
     def _parse_content(self, content) -> tuple[str, dict, list[tuple[int, str]]]:
         soup = BeautifulSoup(content, "html.parser")
 
@@ -225,135 +297,86 @@ class LinkResolver:
 
         return text, metadata, image_urls
 
-    def _fetch_images_sync(self, image_urls: list[tuple[int, str]]) -> list[dict]:
-        image_data = []
-        for index, img_src in image_urls:
-            max_retries = 3
-            if img_src.startswith("data:"):
-                logger.info(f"Adding inline/data image as is: {img_src}")
-                image_data.append({"index": index, "url": img_src, "data": img_src})
-                continue
-            if not img_src.startswith("http") and self.page.url:
-                host = f"{urlparse(self.page.url).scheme}://{urlparse(self.page.url).netloc}"
-                img_src = urljoin(host, img_src)
-            for attempt in range(max_retries):
-                try:
-                    with self.page.expect_response(img_src) as response_info:
-                        self.page.goto(img_src)
-                    response = response_info.value
-                    if response.ok:
-                        mime_type = response.headers.get("content-type", "image/jpeg")
-                        image_bytes = response.body()
-                        image_bytes = process_image(image_bytes)
-                        base64_data = base64.b64encode(image_bytes).decode("utf-8")
-                        image_data.append(
-                            {
-                                "index": index,
-                                "url": img_src,
-                                "data": f"data:{mime_type};base64,{base64_data}",
-                            }
-                        )
-                        break
-                except Exception as e:
-                    logger.error(
-                        f"Attempt {attempt + 1} failed to fetch or encode image {img_src}: {e}"
-                    )
-                    if attempt == max_retries - 1:
-                        logger.error(
-                            f"Giving up on image {img_src} after {max_retries} attempts"
-                        )
-        return image_data
+    async def _fetch_image_async(
+        self, semaphore: asyncio.Semaphore, index: int, img_src: str
+    ) -> Optional[dict]:
+        if img_src.startswith("data:"):
+            logger.info(f"Adding inline/data image as is: {img_src}")
+            return {"index": index, "url": img_src, "data": img_src}
+
+        # Shared hero images and logos are encoded only once
+        cached_data = get_cached_image(url=img_src)
+        if cached_data:
+            return {"index": index, "url": img_src, "data": cached_data}
+
+        session = await get_http_session()
+        for attempt in range(IMAGE_FETCH_RETRIES):
+            try:
+                async with semaphore:
+                    async with session.get(img_src, allow_redirects=True) as response:
+                        response.raise_for_status()
+                        image_bytes = await read_limited(response, MAX_IMAGE_BYTES)
+
+                content_hash = hashlib.sha256(image_bytes).hexdigest()
+                data = get_cached_image(content_hash=content_hash)
+                if data:
+                    store_cached_image(img_src, content_hash)
+                else:
+                    data = await asyncio.to_thread(encode_image, image_bytes)
+                    if data is None:
+                        logger.info(f"Skipping unsupported image {img_src}")
+                        return None
+                    store_cached_image(img_src, content_hash, data)
+
+                return {"index": index, "url": img_src, "data": data}
+            except ValueError as e:
+                logger.info(f"Skipping image {img_src}: {e}")
+                return None
+            except aiohttp.ClientResponseError as e:
+                if (
+                    400 <= e.status < 500
+                    and e.status not in IMAGE_RETRYABLE_CLIENT_ERRORS
+                ):
+                    logger.info(f"Skipping image {img_src}: {e.status}")
+                    return None
+                logger.error(
+                    f"Attempt {attempt + 1} failed to fetch image {img_src}: {e}"
+                )
+            except Exception as e:
+                logger.error(
+                    f"Attempt {attempt + 1} failed to fetch or encode image {img_src}: {e}"
+                )
+        logger.error(
+            f"Giving up on image {img_src} after {IMAGE_FETCH_RETRIES} attempts"
+        )
+        return None
 
     async def _fetch_images_async(
-        self, image_urls: list[tuple[int, str]]
+        self, image_urls: list[tuple[int, str]], base_url: str
     ) -> list[dict]:
-        image_data = []
-        for index, img_src in image_urls:
-            max_retries = 3
-            if img_src.startswith("data:"):
-                logger.info(f"Adding inline/data image as is: {img_src}")
-                image_data.append({"index": index, "url": img_src, "data": img_src})
-                continue
-            if not img_src.startswith("http") and self.async_page.url:
-                host = f"{urlparse(self.async_page.url).scheme}://{urlparse(self.async_page.url).netloc}"
-                img_src = urljoin(host, img_src)
-            for attempt in range(max_retries):
-                try:
-                    async with self.async_page.expect_response(
+        semaphore = asyncio.Semaphore(IMAGE_FETCH_CONCURRENCY)
+        results = await asyncio.gather(
+            *(
+                self._fetch_image_async(
+                    semaphore,
+                    index,
+                    (
                         img_src
-                    ) as response_info:
-                        await self.async_page.goto(img_src)
-                    response = await response_info.value
-                    if response.ok:
-                        mime_type = response.headers.get("content-type", "image/jpeg")
-                        image_bytes = await response.body()
-                        image_bytes = process_image(image_bytes)
-                        base64_data = base64.b64encode(image_bytes).decode("utf-8")
-                        image_data.append(
-                            {
-                                "index": index,
-                                "url": img_src,
-                                "data": f"data:{mime_type};base64,{base64_data}",
-                            }
-                        )
-                        break
-                except Exception as e:
-                    logger.error(
-                        f"Attempt {attempt + 1} failed to fetch or encode image {img_src}: {e}"
-                    )
-                    if attempt == max_retries - 1:
-                        logger.error(
-                            f"Giving up on image {img_src} after {max_retries} attempts"
-                        )
-        return image_data
-
-    def _resolve_text_w_metadata_sync(
-        self, content, title=None, description=None, resolve_images: bool = False
-    ) -> tuple[str, dict, list[dict]]:
-        text, metadata, image_urls = self._parse_content(content)
-        title = title or metadata.get("title", "")
-        description = description or metadata.get("description", "")
-
-        # text = text_format_sync(text)
-
-        # Validate content
-        if text:
-            is_valid, explanation = validate_news_article_sync(text, title, description)
-            if not is_valid:
-                raise Exception(f"Content validation failed: {explanation}")
-        else:
-            raise Exception(f"Unable to fetch text for {title=}")
-
-        if resolve_images:
-            image_data = self._fetch_images_sync(image_urls)
-        else:
-            image_data = None
-        return text, metadata, image_data
-
-    async def _resolve_text_w_metadata_async(
-        self, content, title=None, description=None, resolve_images: bool = False
-    ) -> tuple[str, dict, list[dict]]:
-        text, metadata, image_urls = self._parse_content(content)
-        title = title or metadata.get("title", "")
-        description = description or metadata.get("description", "")
-
-        # text = await text_format(text)
-
-        # Validate content
-        if text:
-            is_valid, explanation = await validate_news_article(
-                text, title, description
+                        if img_src.startswith(("http", "data:"))
+                        else urljoin(base_url, img_src)
+                    ),
+                )
+                for index, img_src in image_urls
             )
-            if not is_valid:
-                raise Exception(f"Content validation failed: {explanation}")
-        else:
-            raise Exception(f"Unable to fetch text for {title=}")
+        )
+        return [result for result in results if result is not None]
 
-        if resolve_images:
-            image_data = await self._fetch_images_async(image_urls)
-        else:
-            image_data = None
-        return text, metadata, image_data
+    def _validate_text(self, text: str, title: str, description: str):
+        if not text:
+            raise UnresolvableUrlError(f"Unable to fetch text for {title=}")
+        is_valid, explanation = validate_news_article_sync(text, title, description)
+        if not is_valid:
+            raise UnresolvableUrlError(f"Content validation failed: {explanation}")
 
     def _build_results(self, url, resolved_url, content, text, metadata, image_data):
         return UrlResult(
@@ -374,34 +397,15 @@ class LinkResolver:
             image_data=image_data,
         )
 
-    def _resolve_url_sync(
-        self, url: str, title=None, description=None, resolve_images: bool = False
-    ) -> UrlResult:
-        # Updated to include image data
-        self._get_page_sync(url)
-        self._cloudfare_sync()
-
-        resolved_url, content = self._resolve_content_sync(url)
-
-        if not content:
-            raise Exception("Content could not be loaded")
-
-        text, metadata, image_data = self._resolve_text_w_metadata_sync(
-            content, title, description, resolve_images
-        )
-
-        results = self._build_results(
-            url, resolved_url, content, text, metadata, image_data
-        )
-
-        self.page.close()
-        self.page = None
-
-        return results
-
     async def _get_page_async(self, url):
-        self.async_page = await self.async_browser.new_page()
-        await self.async_page.goto(url)
+        response = await self.async_page.goto(url)
+        self.response_headers = response.headers if response else {}
+        if (
+            response is not None
+            and 400 <= response.status < 500
+            and response.status not in RETRYABLE_CLIENT_ERRORS
+        ):
+            raise UnresolvableUrlError(f"{url} responded with {response.status}")
 
     async def _cloudfare_async(self):
         content = await self.async_page.content()
@@ -443,59 +447,90 @@ class LinkResolver:
 
         return resolved_url, content
 
-    async def _resolve_url_async(
-        self, url: str, title=None, description=None, resolve_images: bool = False
-    ) -> UrlResult:
-        if not self.async_playwright:
-            self.async_playwright = await async_playwright().start()
-            self.async_browser = await self.async_playwright.chromium.launch()
+    async def _fetch_http_async(
+        self, url: str
+    ) -> Optional[tuple[str, str, tuple[str, dict, list[tuple[int, str]]]]]:
+        """
+        Fetch and parse the page without a browser, returns None if the
+        browser is needed.
+        """
+        try:
+            session = await get_http_session()
+            async with session.get(url, allow_redirects=True) as response:
+                content_type = response.headers.get("content-type", "")
+                if "html" not in content_type:
+                    return None
+                content = await response.text(errors="replace")
+                resolved_url = str(response.url)
+                parsed = self._parse_content(content)
+                if needs_browser(response.status, resolved_url, content, parsed[0]):
+                    return None
+                self.response_headers = {
+                    key.lower(): value for key, value in response.headers.items()
+                }
+                return resolved_url, content, parsed
+        except Exception as e:
+            logger.info(f"Http fetch failed for {url}, using browser: {e}")
+            return None
 
+    async def _fetch_browser_async(self, url: str) -> tuple[str, str]:
         await self._get_page_async(url)
         await self._cloudfare_async()
 
-        resolved_url, content = await self._resolve_content_async(url)
+        return await self._resolve_content_async(url)
+
+    async def _fetch_url_async(
+        self, url: str
+    ) -> tuple[str, str, Optional[tuple[str, dict, list[tuple[int, str]]]]]:
+        """
+        Fetch the page over http, or with a pooled browser page when needed.
+        The page is returned to the pool as soon as its content is loaded.
+        Only the http path returns the page already parsed.
+        """
+        if not prefers_browser(url):
+            fetched = await self._fetch_http_async(url)
+            record_resolve_path(url, escalated=fetched is None)
+            if fetched is not None:
+                return fetched
+
+        async with browser_pool.page() as page:
+            self.async_page = page
+            try:
+                resolved_url, content = await self._fetch_browser_async(url)
+            finally:
+                self.async_page = None
 
         if not content:
             raise Exception("Content could not be loaded")
+        return resolved_url, content, None
 
-        text, metadata, image_data = await self._resolve_text_w_metadata_async(
-            content, title, description, resolve_images
+    def _resolve_url_sync(
+        self, url: str, title=None, description=None, resolve_images: bool = False
+    ) -> UrlResult:
+        resolved_url, content, parsed = browser_pool.run(self._fetch_url_async(url))
+
+        # Parsing and the llm validation run in the calling thread, so the
+        # pool loop and its pages are only busy while fetching
+        text, metadata, image_urls = parsed or self._parse_content(content)
+        self._validate_text(
+            text,
+            title or metadata.get("title", ""),
+            description or metadata.get("description", ""),
         )
 
-        results = self._build_results(
+        image_data = None
+        if resolve_images:
+            image_data = browser_pool.run(
+                self._fetch_images_async(image_urls, resolved_url)
+            )
+
+        return self._build_results(
             url, resolved_url, content, text, metadata, image_data
         )
 
-        await self.async_page.close()
-        self.async_page = None
-
-        return results
-
-    async def async_close(self):
-        if self.async_browser is not None:
-            await self.async_browser.close()
-            self.async_browser = None
-        if self.async_playwright is not None:
-            await self.async_playwright.stop()
-            self.async_playwright = None
-
     def close(self):
-        try:
-            if self.is_async:
-                if asyncio.get_event_loop().is_running():
-                    nest_asyncio.apply()
-                    asyncio.run(self.async_close())
-                else:
-                    asyncio.run(self.async_close())
-            else:
-                if self.browser is not None:
-                    self.browser.close()
-                    self.browser = None
-                if self.playwright is not None:
-                    self.playwright.stop()
-                    self.playwright = None
-        except Exception as e:
-            print(f"Error while closing playwright: {e}")
+        # Pages are returned to the worker's browser pool after each resolve
+        self.async_page = None
 
     def resolve_url(
         self,
@@ -504,15 +539,24 @@ class LinkResolver:
         description: str = None,
         resolve_images: bool = False,
     ) -> UrlResult:
-        if self.is_async:
-            if asyncio.get_event_loop().is_running():
-                nest_asyncio.apply()
-                return asyncio.run(
-                    self._resolve_url_async(url, title, description, resolve_images)
-                )
-            else:
-                return asyncio.run(
-                    self._resolve_url_async(url, title, description, resolve_images)
-                )
-        else:
-            return self._resolve_url_sync(url, title, description, resolve_images)
+        # Links repeat across panels and cron runs, reuse the validated result
+        cached_result = get_cached_url_result(url)
+        if cached_result is not None and (
+            not resolve_images or cached_result.image_data is not None
+        ):
+            return cached_result
+
+        cached_failure = get_cached_failure(url)
+        if cached_failure is not None:
+            raise UnresolvableUrlError(
+                f"Resolving {url} failed recently: {cached_failure}"
+            )
+
+        try:
+            result = self._resolve_url_sync(url, title, description, resolve_images)
+        except UnresolvableUrlError as e:
+            store_url_failure(url, str(e))
+            raise
+
+        store_url_result(url, result, self.response_headers)
+        return result
@@ -1,26 +1,18 @@
 # import copy
-import datetime
 import json
-import re
-import time
 from typing import List, Optional, Tuple, Type, Union
-from celery import group
-from celery.result import AsyncResult
-import feedparser
+from celery import Signature
 from feedparser.util import FeedParserDict
 from langsmith import traceable
-from pygooglenews import GoogleNews
-from supabase import Client
 
-# from app.core.redis import sync_memoize
-from source.helpers.resolve_url import LinkResolver, parse_publish_date
+from source.helpers.feeds import fetch_feeds_sync
+from source.helpers.resolve_url import parse_publish_date
 from source.llm_exec.websource_exec import group_rss_items
 from source.models.structures.user import UserIDs
 from source.models.structures.web_source import WebSource
 from source.models.structures.panel import PanelRequestData
 from source.models.structures.sources import (
     GoogleNewsConfig,
-    GooglenewsFeedType,
     HackerNewsConfig,
     HackerNewsFeedType,
     TechCrunchNewsConfig,
@@ -33,31 +25,6 @@ from source.models.supabase.panel import PanelTranscript
 from source.tasks.web_sources import generate_resolve_tasks_for_websources
 
 
-# Google News
-
-
-def parse_since_value(since_value):
-    if since_value is None:
-        return None
-    print(f"GoogleNews: Parsing since value: {since_value}")
-    pattern = r"(\d+)([hdm])"
-    matches = re.findall(pattern, since_value)
-
-    total_timedelta = datetime.timedelta()
-
-    for amount, unit in matches:
-        time_amount = int(amount)
-
-        if unit == "h":
-            total_timedelta += datetime.timedelta(hours=time_amount)
-        elif unit == "d":
-            total_timedelta += datetime.timedelta(days=time_amount)
-        elif unit == "m":
-            total_timedelta += datetime.timedelta(days=(time_amount * 30.44))
-
-    return total_timedelta
-
-
 def create_web_source(
     entry,
     source: str,
@@ -103,43 +70,12 @@ def create_web_source(
         print(f"{source}: Issue with {original_source or entry.link} - {e}")
 
 
-# @sync_memoize(ttl=300)
-def memoized_google_feed_parse(config: GoogleNewsConfig) -> List[FeedParserDict]:
-    gn = GoogleNews(lang=config.lang, country=config.country)
-    time_span = parse_since_value(config.since)
-
-    print(f"GoogleNews: Time span for news items: {time_span}")
-    if config.feed_type == GooglenewsFeedType.SEARCH or config.query:
-        config.feed_type = GooglenewsFeedType.SEARCH
-        print(f"GoogleNews: Searching news with query: {config.query}")
-        news = gn.search(config.query, when=config.since)
-    elif config.feed_type == GooglenewsFeedType.LOCATION or config.location:
-        config.feed_type = GooglenewsFeedType.LOCATION
-        if isinstance(config.location, list):
-            news = gn.geo_multiple_headlines(config.location)
-        else:
-            news = gn.geo_headlines(config.location)
-    elif config.feed_type == GooglenewsFeedType.TOPIC or config.topic:
-        config.feed_type = GooglenewsFeedType.TOPIC
-        if isinstance(config.topic, list):
-            news = gn.topic_multiple_headlines(config.topic, time_span=time_span)
-        else:
-            news = gn.topic_headlines(config.topic)
-    else:
-        news = gn.top_news()
-
-    return news
-
-
-def fetch_google_news_items(config: GoogleNewsConfig) -> List[WebSource]:
-    print(f"GoogleNews: Fetching news items with config: {config!r}")
-
-    news = memoized_google_feed_parse(config)
-
-    # print(f"GoogleNews: Memoized response: {news=}")
+# Google News
 
-    # news["entries"] = [FeedParserDict(**item) for item in news["entries"]]
 
+def google_news_items_from_feed(
+    news: FeedParserDict, config: GoogleNewsConfig
+) -> List[WebSource]:
     print(f"GoogleNews: Number of news entries fetched: {len(news['entries'])}")
     news_items = []
     for entry in news["entries"]:
@@ -149,24 +85,20 @@ def fetch_google_news_items(config: GoogleNewsConfig) -> List[WebSource]:
         )
         if news_item is not None:
             news_items.append(news_item)
-        # links = WebSource.get_links(entry)
-        # print(f"GoogleNews: Get links results: \n\n{links=}\n\n")
-        # for link in links:
-        #     link_entry = FeedParserDict(**copy.deepcopy(entry))
-        #     link_entry.link = link[0]
-        #     link_entry.title = link[1]
-        #     news_item = create_web_source(
-        #         link_entry, source=link[2], rss_source="Google News", lang=config.lang
-        #     )
-        #     if news_item is not None:
-        #         news_items.append(news_item)
 
     return news_items
 
 
-# @sync_memoize(ttl=300)
-def memoized_feed_parse(feed_url) -> List[FeedParserDict]:
-    return feedparser.parse(feed_url)
+def fetch_google_news_items(config: GoogleNewsConfig) -> List[WebSource]:
+    print(f"GoogleNews: Fetching news items with config: {config!r}")
+    return google_news_items_from_feed(fetch_feeds_sync([config])[0], config)
+
+
+def memoized_feed_parse(feed_url) -> FeedParserDict:
+    feed = fetch_feeds_sync([feed_url])[0]
+    if feed is None:
+        raise ValueError(f"Unable to fetch feed {feed_url}")
+    return feed
 
 
 # Hacker News
@@ -199,11 +131,9 @@ def construct_hackernews_feed_url(config: HackerNewsConfig) -> str:
     return base_url
 
 
-def fetch_hackernews_items(config: HackerNewsConfig) -> List[WebSource]:
-    feed_url = construct_hackernews_feed_url(config)
-    print(f"HackerNews: Fetching HackerNews items from URL: {feed_url}")
-    # feed = [FeedParserDict(**item) for item in memoized_feed_parse(feed_url)]
-    feed = memoized_feed_parse(feed_url)
+def hackernews_items_from_feed(
+    feed: FeedParserDict, config: HackerNewsConfig
+) -> List[WebSource]:
     print(f"HackerNews: Number of items fetched: {len(feed.entries)}")
 
     news_items = []
@@ -215,15 +145,22 @@ def fetch_hackernews_items(config: HackerNewsConfig) -> List[WebSource]:
     return news_items
 
 
+def fetch_hackernews_items(config: HackerNewsConfig) -> List[WebSource]:
+    feed_url = construct_hackernews_feed_url(config)
+    print(f"HackerNews: Fetching HackerNews items from URL: {feed_url}")
+    return hackernews_items_from_feed(memoized_feed_parse(feed_url), config)
+
+
 # TechCrunch
 
 
-def fetch_techcrunch_news_items(config: TechCrunchNewsConfig) -> List[WebSource]:
-    feed_url = "https://techcrunch.com/feed/"
+def construct_techcrunch_feed_url(config: TechCrunchNewsConfig) -> str:
+    return "https://techcrunch.com/feed/"
 
-    print(f"TechCrunch: Fetching TechCrunch news items from URL: {feed_url}")
-    # feed = [FeedParserDict(**item) for item in memoized_feed_parse(feed_url)]
-    feed = memoized_feed_parse(feed_url)
+
+def techcrunch_items_from_feed(
+    feed: FeedParserDict, config: TechCrunchNewsConfig
+) -> List[WebSource]:
     print(f"TechCrunch: Number of items fetched: {len(feed.entries)}")
 
     news_items = []
@@ -235,10 +172,16 @@ def fetch_techcrunch_news_items(config: TechCrunchNewsConfig) -> List[WebSource]
     return news_items
 
 
+def fetch_techcrunch_news_items(config: TechCrunchNewsConfig) -> List[WebSource]:
+    feed_url = construct_techcrunch_feed_url(config)
+    print(f"TechCrunch: Fetching TechCrunch news items from URL: {feed_url}")
+    return techcrunch_items_from_feed(memoized_feed_parse(feed_url), config)
+
+
 # Yle
 
 
-def fetch_yle_news_items(config: YleNewsConfig) -> List[WebSource]:
+def construct_yle_feed_url(config: YleNewsConfig) -> str:
     source = "YLE_UUTISET" if config.lang == YleLanguage.FI else "YLE_NEWS"
     feed_url = f"https://feeds.yle.fi/uutiset/v1/{(config.feed_type or config.type).value}/YLE_UUTISET.rss"
 
@@ -248,9 +191,10 @@ def fetch_yle_news_items(config: YleNewsConfig) -> List[WebSource]:
         if len(concepts) > 0:
             feed_url += "&concepts=" + ",".join(concepts)
 
-    print(f"Yle: Fetching Yle news items from URL: {feed_url}")
-    # feed = [FeedParserDict(**item) for item in memoized_feed_parse(feed_url)]
-    feed = memoized_feed_parse(feed_url)
+    return feed_url
+
+
+def yle_items_from_feed(feed: FeedParserDict, config: YleNewsConfig) -> List[WebSource]:
     print(f"Yle: Number of items fetched: {len(feed.entries)}")
 
     news_items = []
@@ -262,9 +206,14 @@ def fetch_yle_news_items(config: YleNewsConfig) -> List[WebSource]:
     return news_items
 
 
+def fetch_yle_news_items(config: YleNewsConfig) -> List[WebSource]:
+    feed_url = construct_yle_feed_url(config)
+    print(f"Yle: Fetching Yle news items from URL: {feed_url}")
+    return yle_items_from_feed(memoized_feed_parse(feed_url), config)
+
+
 def fetch_urls_items(urls: List[str]) -> List[WebSource]:
-    # Initialize the LinkResolver
-    resolver = LinkResolver(reformat_text=True)
+    # The links are resolved later by the resolve tasks
     news_items = []
 
     for url in urls:
@@ -280,16 +229,25 @@ def fetch_urls_items(urls: List[str]) -> List[WebSource]:
         except Exception as e:
             print(f"Failed to resolve {url}: {e}")
 
-    resolver.close()
     return news_items
 
 
-@traceable(
-    run_type="llm",
-    name="Fetch transcript sources",
-)
-def fetch_links(
-    supabase: Client,
+def get_feed_request(source) -> Optional[Union[str, GoogleNewsConfig]]:
+    """
+    Return the feed url or Google News config to fetch for the source.
+    """
+    if isinstance(source, GoogleNewsConfig):
+        return source
+    elif isinstance(source, HackerNewsConfig):
+        return construct_hackernews_feed_url(source)
+    elif isinstance(source, TechCrunchNewsConfig):
+        return construct_techcrunch_feed_url(source)
+    elif isinstance(source, YleNewsConfig):
+        return construct_yle_feed_url(source)
+    return None
+
+
+def fetch_source_items(
     sources: List[
         Union[
             str,
@@ -300,22 +258,24 @@ def fetch_links(
             YleNewsConfig,
         ]
     ],
-    user_ids: UserIDs = None,
-    dry_run: bool = False,
-    guidance: str = None,
-    min_amount=5,
-    max_ids=5,
-    tokens: tuple = None,
-    previous_episodes: List[Tuple[PanelTranscript, str]] = None,
-) -> List[WebSourceCollection | WebSource]:
-    min_amount = int(min_amount)
-    max_ids = int(max_ids)
-    print(
-        f"Fetch links: Fetching links for sources ({min_amount}->{max_ids}): {sources}"
+) -> List[WebSource]:
+    # Fetch every configured feed concurrently through the shared feed cache
+    feed_requests = {}
+    for index, source in enumerate(sources):
+        try:
+            feed_request = get_feed_request(source)
+        except Exception as e:
+            print(f"Fetch links: Unable to build feed request {e=} \n\n {source=}")
+            continue
+        if feed_request is not None:
+            feed_requests[index] = feed_request
+    print(f"Fetch links: Fetching {len(feed_requests)} feeds")
+    feeds = dict(
+        zip(feed_requests.keys(), fetch_feeds_sync(list(feed_requests.values())))
     )
-    all_resolved_links: List[WebSourceCollection | WebSource] = []
+
     all_items: List[WebSource] = []
-    for source in sources:
+    for index, source in enumerate(sources):
         urls = None
         try:
             if isinstance(source, str):
@@ -330,23 +290,25 @@ def fetch_links(
                 urls = source
 
             if urls is not None:
-                # Use fetch_urls_items and fetch_url_links to resolve URLs
                 print(f"Fetch links: Fetching URL items for: {urls}")
                 items = fetch_urls_items(urls)
+            elif feeds.get(index) is None:
+                print(f"Fetch links: No feed available for {source=}")
+                continue
             elif isinstance(source, GoogleNewsConfig):
                 print(f"Fetch links: Fetching Google News items for config: {source}")
-                items = fetch_google_news_items(source)
+                items = google_news_items_from_feed(feeds[index], source)
             elif isinstance(source, HackerNewsConfig):
                 print(f"Fetch links: Fetching HackerNews items for config: {source}")
-                items = fetch_hackernews_items(source)
+                items = hackernews_items_from_feed(feeds[index], source)
             elif isinstance(source, TechCrunchNewsConfig):
                 print(
                     f"Fetch links: Fetching TechCrunch news items for config: {source}"
                 )
-                items = fetch_techcrunch_news_items(source)
+                items = techcrunch_items_from_feed(feeds[index], source)
             elif isinstance(source, YleNewsConfig):
                 print(f"Fetch links: Fetching Yle news items for config: {source}")
-                items = fetch_yle_news_items(source)
+                items = yle_items_from_feed(feeds[index], source)
             else:
                 continue
 
@@ -354,9 +316,19 @@ def fetch_links(
         except Exception as e:
             print(f"Fetch links: Unable to fetch source {e=} \n\n {source=}")
 
-    resolve_items: List[WebSourceCollection | WebSource] = None
+    return all_items
+
+
+def select_resolve_items(
+    all_items: List[WebSource],
+    guidance: str = None,
+    min_amount=5,
+    max_ids=5,
+    user_ids: UserIDs = None,
+    previous_episodes: List[Tuple[PanelTranscript, str]] = None,
+) -> List[WebSourceCollection | WebSource]:
     if len(all_items) > (max_ids + 1):
-        resolve_items = group_rss_items(
+        return group_rss_items(
             all_items,
             guidance,
             min_amount=min_amount,
@@ -364,137 +336,106 @@ def fetch_links(
             user_ids=user_ids,
             previous_episodes=previous_episodes,
         )
-    else:
-        resolve_items = all_items
-        # [
-        #     WebSourceCollection(web_sources=[item], title=item.title)
-        #     for item in all_items
-        # ]
-
-    if not dry_run:
-        # Initialize variables
-        successful_results = []
-        start_index = 0  # Start index for batching
-
-        while len(successful_results) < min_amount and start_index < len(resolve_items):
-            print(
-                f"Fetch links: Starting batch processing with {min_amount=}, starting from {start_index=}"
-            )
-            batch_tasks = []
-            task_mapping = []  # To track which item each task corresponds to
-            collection_task_counts = (
-                {}
-            )  # To track the number of tasks for each WebSourceCollection
-            collection_item_map = {}  # Map to track items by their keys
-
-            end_index = min(start_index + min_amount, len(resolve_items))
-            print(
-                f"Fetch links: Collecting tasks for items: start_index={start_index}, end_index={end_index}"
-            )
-            for idx, item in enumerate(
-                resolve_items[start_index:end_index], start=start_index
-            ):
-                print(f"Fetch links: Processing item at index {idx}: {item.title}")
-                if isinstance(item, WebSourceCollection):
-                    collection_key = (item.title, item.max_amount)
-                    tasks = item.generate_tasks(tokens, user_ids)
-                    batch_tasks.extend(tasks)
-                    collection_task_counts[collection_key] = len(
-                        tasks
-                    )  # Track the number of tasks
-                    collection_item_map[
-                        collection_key
-                    ] = item  # Map the key to the item
-                    task_mapping.extend(
-                        [collection_key] * len(tasks)
-                    )  # Map each task to the collection
-                else:
-                    standalone_task = generate_resolve_tasks_for_websources(
-                        [item], tokens, user_ids
-                    )[0]
-                    batch_tasks.append(standalone_task)
-                    task_mapping.append(item)  # Map the task to the standalone item
-
-            # Group and execute the batch of tasks
-            if batch_tasks:
-                print(f"Fetch links: Generated {len(batch_tasks)} tasks for the batch")
-                task_group = group(batch_tasks)
-                print("Fetch links: Executing task group asynchronously")
-                async_result: AsyncResult = task_group.apply_async(
-                    disable_sync_subtasks=False
-                )
+    return all_items
+
+
+def build_resolve_batch(
+    resolve_items: List[WebSourceCollection | WebSource],
+    start_index: int,
+    batch_size: int,
+    tokens: tuple = None,
+    user_ids: UserIDs = None,
+) -> Tuple[List[Signature], List[int], int]:
+    """
+    Create the resolve tasks for the next batch of items.
+
+    :return: The tasks, the index of the item each task belongs to and the
+        index where the next batch should start.
+    """
+    batch_tasks = []
+    task_item_index = []  # To track which item each task corresponds to
+
+    end_index = min(start_index + batch_size, len(resolve_items))
+    print(
+        f"Fetch links: Collecting tasks for items: start_index={start_index}, end_index={end_index}"
+    )
+    for idx, item in enumerate(resolve_items[start_index:end_index], start=start_index):
+        print(f"Fetch links: Processing item at index {idx}: {item.title}")
+        if isinstance(item, WebSourceCollection):
+            tasks = item.generate_tasks(tokens, user_ids)
+            batch_tasks.extend(tasks)
+            task_item_index.extend(
+                [idx] * len(tasks)
+            )  # Map each task to the collection
+        else:
+            standalone_task = generate_resolve_tasks_for_websources(
+                [item], tokens, user_ids
+            )[0]
+            batch_tasks.append(standalone_task)
+            task_item_index.append(idx)  # Map the task to the standalone item
+
+    return batch_tasks, task_item_index, end_index
+
+
+def get_resolved_item_indexes(
+    task_item_index: List[int], task_results: List
+) -> List[int]:
+    """
+    Return the indexes of items which had at least one successful resolve task.
+    """
+    return sorted(
+        {
+            item_index
+            for item_index, task_result in zip(task_item_index, task_results)
+            if task_result
+        }
+    )
+
+
+@traceable(
+    run_type="llm",
+    name="Fetch transcript sources",
+)
+def fetch_links(
+    sources: List[
+        Union[
+            str,
+            List[str],
+            GoogleNewsConfig,
+            HackerNewsConfig,
+            TechCrunchNewsConfig,
+            YleNewsConfig,
+        ]
+    ],
+    user_ids: UserIDs = None,
+    guidance: str = None,
+    min_amount=5,
+    max_ids=5,
+    previous_episodes: List[Tuple[PanelTranscript, str]] = None,
+) -> List[WebSourceCollection | WebSource]:
+    """
+    Fetch and group the items of the sources without resolving them, the
+    panel pipeline resolves the selected items with its own tasks.
+    """
+    min_amount = int(min_amount)
+    max_ids = int(max_ids)
+    print(
+        f"Fetch links: Fetching links for sources ({min_amount}->{max_ids}): {sources}"
+    )
+    all_items = fetch_source_items(sources)
+
+    resolve_items = select_resolve_items(
+        all_items,
+        guidance,
+        min_amount=min_amount,
+        max_ids=max_ids,
+        user_ids=user_ids,
+        previous_episodes=previous_episodes,
+    )
 
-                start_time = time.time()
-                timeout = 15 * 60
-                elapsed_time = 0
-
-                # Poll for task completion without blocking
-                while not async_result.ready() and elapsed_time < timeout:
-                    elapsed_time = time.time() - start_time
-                    print(
-                        f"Fetch links: Waiting for tasks to complete ({elapsed_time:.2f}s)..."
-                    )
-                    time.sleep(30)  # Sleep for 5 seconds to avoid busy-waiting
-
-                if not async_result.ready() and elapsed_time >= timeout:
-                    print("Timeout reached! Revoking pending tasks...")
-                    for task in batch_tasks:
-                        if task is None or task.id is None:
-                            continue
-                        async_task_result = AsyncResult(task.id)
-                        task_state = async_task_result.state
-                        if task_state == "PENDING":
-                            async_task_result.revoke(
-                                terminate=False
-                            )  # Only cancel pending tasks
-                            print(f"Task {task.id} revoked (state: {task_state}).")
-                        else:
-                            print(f"Task {task.id} not revoked (state: {task_state}).")
-
-                # Process results asynchronously
-                if async_result.successful():
-                    print("Fetch links: Tasks completed. Retrieving results...")
-                    task_results = async_result.get(disable_sync_subtasks=False)
-                    print(
-                        f"Fetch links: Retrieved {len(task_results)} results from the batch"
-                    )
-
-                    # Process results
-                    result_index = 0
-                    for item in resolve_items[start_index:end_index]:
-                        if len(successful_results) >= min_amount:
-                            break  # Stop if min_amount successful results are achieved
-                        if isinstance(item, WebSourceCollection):
-                            collection_key = (item.title, item.max_amount)
-                            task_count = collection_task_counts[collection_key]
-                            collection_results = task_results[
-                                result_index : result_index + task_count
-                            ]
-                            result_index += task_count
-                            if any(
-                                collection_results
-                            ):  # Check if all tasks in the group were successful
-                                item.load_from_supabase_sync(supabase=supabase)
-                                successful_results.append(item)
-                        else:
-                            if task_results[
-                                result_index
-                            ]:  # Check if the standalone task was successful
-                                item.load_from_supabase_sync(supabase=supabase)
-                                successful_results.append(item)
-                            result_index += 1
-                else:
-                    print("Fetch links: Some tasks failed. Handling errors...")
-
-            start_index = end_index
-
-        # Add successful results to all_resolved_links
-        all_resolved_links.extend(successful_results)
-    else:
-        all_resolved_links.extend(resolve_items[:min_amount])
-
-    print(f"Fetch links: Total resolved links: {len(all_resolved_links)}")
-    return all_resolved_links
+    all_links = resolve_items[:min_amount]
+    print(f"Fetch links: Total links: {len(all_links)}")
+    return all_links
 
 
 def deduplicate_and_validate_configs(
@@ -0,0 +1,139 @@
+import base64
+import os
+import time
+from typing import Dict
+
+import httpx
+from supabase import Client
+
+from source.load_env import SETTINGS
+from source.models.config.logging import logger
+
+# Supabase only accepts resumable uploads in chunks of exactly 6 MB
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024
+RESUMABLE_MAX_ATTEMPTS = 5
+RESUMABLE_RETRY_DELAY = 2
+RESUMABLE_TIMEOUT = 60
+TUS_VERSION = "1.0.0"
+
+
+def _tus_metadata(**values) -> str:
+    return ",".join(
+        f"{key} {base64.b64encode(str(value).encode('utf-8')).decode('ascii')}"
+        for key, value in values.items()
+    )
+
+
+def _auth_headers(supabase_client: Client) -> Dict[str, str]:
+    headers = {
+        key: value
+        for key, value in supabase_client.options.headers.items()
+        if key.lower() in ("apikey", "authorization")
+    }
+    try:
+        session = supabase_client.auth.get_session()
+        if session:
+            headers["Authorization"] = f"Bearer {session.access_token}"
+    except Exception as e:
+        logger.debug(f"Unable to read session for upload, using client key: {e}")
+    return headers
+
+
+def _upload_offset(client: httpx.Client, location: str, headers: dict, offset: int):
+    try:
+        response = client.head(location, headers=headers)
+        response.raise_for_status()
+        return int(response.headers["Upload-Offset"])
+    except Exception as e:
+        logger.error(f"Unable to read upload offset of {location}: {e}")
+        return offset
+
+
+def resumable_upload(
+    supabase_client: Client,
+    bucket_id: str,
+    path: str,
+    file_path: str,
+    content_type: str,
+    upsert: bool = True,
+):
+    """
+    Upload the file through the TUS endpoint of Supabase storage. The file is
+    read one chunk at a time and a failed chunk continues from the offset
+    the server has confirmed instead of restarting the upload.
+    """
+    endpoint = f"{SETTINGS.supabase_url.rstrip('/')}/storage/v1/upload/resumable"
+    size = os.path.getsize(file_path)
+    headers = {**_auth_headers(supabase_client), "Tus-Resumable": TUS_VERSION}
+
+    with httpx.Client(timeout=RESUMABLE_TIMEOUT) as client, open(
+        file_path, "rb"
+    ) as file:
+        response = client.post(
+            endpoint,
+            headers={
+                **headers,
+                "Upload-Length": str(size),
+                "Upload-Metadata": _tus_metadata(
+                    bucketName=bucket_id,
+                    objectName=path,
+                    contentType=content_type,
+                    cacheControl=3600,
+                ),
+                "x-upsert": "true" if upsert else "false",
+            },
+        )
+        response.raise_for_status()
+        location = str(httpx.URL(endpoint).join(response.headers["Location"]))
+
+        offset = 0
+        attempt = 0
+        while offset < size:
+            try:
+                file.seek(offset)
+                response = client.patch(
+                    location,
+                    headers={
+                        **headers,
+                        "Upload-Offset": str(offset),
+                        "Content-Type": "application/offset+octet-stream",
+                    },
+                    content=file.read(RESUMABLE_CHUNK_SIZE),
+                )
+                response.raise_for_status()
+                offset = int(response.headers["Upload-Offset"])
+                attempt = 0
+            except httpx.HTTPError as e:
+                attempt += 1
+                if attempt >= RESUMABLE_MAX_ATTEMPTS:
+                    raise
+                logger.warning(
+                    f"Upload of {path} failed at {offset}/{size} bytes, retrying: {e}"
+                )
+                time.sleep(RESUMABLE_RETRY_DELAY * 2 ** (attempt - 1))
+                offset = _upload_offset(client, location, headers, offset)
+
+
+def upload_file(
+    supabase_client: Client,
+    bucket_id: str,
+    path: str,
+    file_path: str,
+    content_type: str,
+):
+    """
+    Upload the file from disk, files larger than a single chunk go through
+    the resumable upload.
+    """
+    if os.path.getsize(file_path) > RESUMABLE_CHUNK_SIZE:
+        try:
+            resumable_upload(supabase_client, bucket_id, path, file_path, content_type)
+            return
+        except Exception as e:
+            logger.error(f"Resumable upload of {path} failed, uploading at once: {e}")
+
+    supabase_client.storage.from_(bucket_id).upload(
+        path,
+        file_path,
+        file_options={"upsert": "true", "content-type": content_type},
+    )
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional, Tuple
+
+from pydub import AudioSegment
+from transcript_to_audio.schemas import SpeakerConfig, TTSConfig
+
+from app.core.supabase import get_sync_supabase_service_client
+from source.load_env import SETTINGS
+from source.models.config.logging import logger
+
+CLIP_FORMAT = "flac"
+# Clips used this recently belong to a running render and are never evicted
+CLIP_MIN_AGE = 60 * 60
+
+_eviction_lock = threading.Lock()
+
+
+def normalize_utterance(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _config_fingerprint(config) -> Optional[dict]:
+    if config is None:
+        return None
+    data = (
+        config.model_dump(mode="json")
+        if hasattr(config, "model_dump")
+        else dict(vars(config))
+    )
+    data.pop("api_key", None)
+    return data
+
+
+def utterance_cache_key(
+    text: str, voice_config: SpeakerConfig, tts_model: str, tts_config: TTSConfig
+) -> str:
+    payload = json.dumps(
+        {
+            "text": normalize_utterance(text),
+            "voice": _config_fingerprint(voice_config),
+            "model": tts_model,
+            "config": _config_fingerprint(tts_config),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _local_paths(key: str) -> Tuple[str, str]:
+    base = os.path.join(SETTINGS.tts_cache_path, key[:2], key)
+    return f"{base}.{CLIP_FORMAT}", f"{base}.txt"
+
+
+def _remote_paths(key: str) -> Tuple[str, str]:
+    return f"{key[:2]}/{key}.{CLIP_FORMAT}", f"{key[:2]}/{key}.txt"
+
+
+def _write_atomic(path: str, data: bytes):
+    # Renamed into place so a reader never sees a partial clip
+    partial_path = f"{path}.{threading.get_ident()}.part"
+    with open(partial_path, "wb") as f:
+        f.write(data)
+    os.replace(partial_path, path)
+
+
+def _download_clip(key: str) -> bool:
+    if not SETTINGS.tts_cache_bucket:
+        return False
+    clip_path, text_path = _local_paths(key)
+    remote_clip, remote_text = _remote_paths(key)
+    try:
+        bucket = get_sync_supabase_service_client().storage.from_(
+            SETTINGS.tts_cache_bucket
+        )
+        text = bucket.download(remote_text)
+        clip = bucket.download(remote_clip)
+    except Exception as e:
+        logger.debug(f"TTS clip {key} not in bucket: {e}")
+        return False
+    os.makedirs(os.path.dirname(clip_path), exist_ok=True)
+    _write_atomic(text_path, text)
+    _write_atomic(clip_path, clip)
+    return True
+
+
+def _upload_clip(key: str):
+    if not SETTINGS.tts_cache_bucket:
+        return
+    clip_path, text_path = _local_paths(key)
+    remote_clip, remote_text = _remote_paths(key)
+    try:
+        bucket = get_sync_supabase_service_client().storage.from_(
+            SETTINGS.tts_cache_bucket
+        )
+        bucket.upload(remote_clip, clip_path, file_options={"upsert": "true"})
+        bucket.upload(remote_text, text_path, file_options={"upsert": "true"})
+    except Exception as e:
+        logger.error(f"Unable to upload TTS clip {key}: {e}")
+
+
+def get_clip(key: str) -> Optional[Tuple[str, str]]:
+    """
+    Return the TTS updated text and the local path of the cached clip,
+    fetching it from the bucket to the local cache when needed.
+    """
+    clip_path, text_path = _local_paths(key)
+    if not (os.path.exists(clip_path) and os.path.exists(text_path)):
+        if not _download_clip(key):
+            return None
+    try:
+        # The modification time orders the clips for eviction
+        os.utime(clip_path)
+        with open(text_path, "r", encoding="utf-8") as f:
+            return f.read(), clip_path
+    except FileNotFoundError:
+        # Evicted by another process in between
+        return None
+
+
+def store_clip(key: str, text: str, audio: AudioSegment) -> Tuple[str, str]:
+    """
+    Encode the clip to the local cache and share it through the bucket.
+    Returns the text and the local path of the clip.
+    """
+    clip_path, text_path = _local_paths(key)
+    os.makedirs(os.path.dirname(clip_path), exist_ok=True)
+    _write_atomic(text_path, text.encode("utf-8"))
+    partial_path = f"{clip_path}.{threading.get_ident()}.part"
+    audio.export(partial_path, format=CLIP_FORMAT)
+    os.replace(partial_path, clip_path)
+
+    _upload_clip(key)
+    evict_clips()
+    return text, clip_path
+
+
+def evict_clips(max_size: int = SETTINGS.tts_cache_max_size):
+    """
+    Remove the least recently used clips until the local cache fits in
+    max_size bytes.
+    """
+    with _eviction_lock:
+        clips = []
+        total = 0
+        for root, _, files in os.walk(SETTINGS.tts_cache_path):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                total += stat.st_size
+                if name.endswith(f".{CLIP_FORMAT}"):
+                    clips.append((stat.st_mtime, stat.st_size, path))
+        if total <= max_size:
+            return
+
+        min_age = time.time() - CLIP_MIN_AGE
+        for mtime, size, path in sorted(clips):
+            if total <= max_size or mtime > min_age:
+                break
+            text_path = f"{path[: -len(CLIP_FORMAT) - 1]}.txt"
+            for file_path in (path, text_path):
+                try:
+                    total -= os.path.getsize(file_path)
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+        logger.info(f"TTS cache evicted to {total} bytes")
@@ -0,0 +1,101 @@
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from cachetools import TTLCache
+
+from app.core.redis import get_async_redis_client, get_sync_redis_client
+from source.models.config.logging import logger
+
+USER_CONTEXT_VERSION_PREFIX = "user_context:version:user"
+ORGANIZATION_CONTEXT_VERSION_KEY = "user_context:version:organizations"
+# Contexts are also reloaded after this when Redis can not be reached
+USER_CONTEXT_TTL = 60
+USER_CONTEXT_CACHE_SIZE = 1000
+
+ContextVersion = Tuple[Optional[str], Optional[str]]
+
+
+class UserContext:
+    """
+    The profile, organizations, teams, roles and memberships of a user as
+    loaded by UserData.fetch_context.
+    """
+
+    def __init__(self, data: Dict[str, Any], version: ContextVersion = (None, None)):
+        self.data = data
+        self.version = version
+
+
+_contexts: TTLCache[str, UserContext] = TTLCache(
+    maxsize=USER_CONTEXT_CACHE_SIZE, ttl=USER_CONTEXT_TTL
+)
+_contexts_lock = threading.Lock()
+
+
+def _user_version_key(auth_id) -> str:
+    return f"{USER_CONTEXT_VERSION_PREFIX}:{auth_id}"
+
+
+async def get_context_version(auth_id: UUID) -> Optional[ContextVersion]:
+    """
+    Current version of the user's own rows and of the organization rows,
+    None when Redis can not be reached.
+    """
+    try:
+        redis_client = await get_async_redis_client()
+        user_version, organization_version = await redis_client.mget(
+            _user_version_key(auth_id), ORGANIZATION_CONTEXT_VERSION_KEY
+        )
+        return user_version, organization_version
+    except Exception as e:
+        logger.error(f"Unable to read user context version for {auth_id}: {e}")
+        return None
+
+
+def get_user_context(
+    auth_id: UUID, version: Optional[ContextVersion]
+) -> Optional[UserContext]:
+    with _contexts_lock:
+        context = _contexts.get(str(auth_id))
+    if context is None or (version is not None and context.version != version):
+        return None
+    return context
+
+
+def store_user_context(auth_id: UUID, context: UserContext):
+    with _contexts_lock:
+        _contexts[str(auth_id)] = context
+
+
+def invalidate_user_context(auth_ids: Iterable):
+    """
+    Bump the version of the users whose profile, organization user or team
+    membership rows changed.
+    """
+    auth_ids = {str(auth_id) for auth_id in auth_ids if auth_id}
+    if not auth_ids:
+        return
+    with _contexts_lock:
+        for auth_id in auth_ids:
+            _contexts.pop(auth_id, None)
+    try:
+        pipe = get_sync_redis_client().pipeline()
+        for auth_id in auth_ids:
+            pipe.incr(_user_version_key(auth_id))
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Unable to invalidate user context of {auth_ids}: {e}")
+
+
+def invalidate_organization_context():
+    """
+    Bump the version of the organization rows, organizations, teams and
+    roles are shared by many users so this invalidates all contexts.
+    """
+    with _contexts_lock:
+        _contexts.clear()
+    try:
+        get_sync_redis_client().incr(ORGANIZATION_CONTEXT_VERSION_KEY)
+    except Exception as e:
+        logger.error(f"Unable to invalidate organization context: {e}")
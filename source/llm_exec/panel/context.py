@@ -0,0 +1,286 @@
+import hashlib
+import re
+import threading
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Sequence, Union
+
+from cachetools import TTLCache
+
+from source.chains.chain_factory import get_chain_model_settings
+from source.models.structures.web_source import WebSource
+from source.models.structures.web_source_collection import WebSourceCollection
+
+try:
+    import tiktoken
+except ImportError:  # Installed with langchain-openai
+    tiktoken = None
+
+# Share of the model context left after the output given to the sources and
+# to the previous episodes, the rest is for the transcript and instructions
+CONTENT_CONTEXT_SHARE = 0.5
+EPISODES_CONTEXT_SHARE = 0.1
+# Used when the tokenizer of the model is not available
+CHARS_PER_TOKEN = 4
+# Sections that would be trimmed shorter than this are left out
+MIN_SECTION_TOKENS = 64
+# Main items get this many times the share of the other sources
+MAIN_ITEM_WEIGHT = 2.0
+
+# Assembled contexts, reused by the calls and tasks of the same run
+CONTEXT_CACHE_SIZE = 128
+CONTEXT_CACHE_TTL = 60 * 60
+
+_contexts: TTLCache[str, str] = TTLCache(
+    maxsize=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL
+)
+_contexts_lock = threading.Lock()
+
+
+class ContextBudget(NamedTuple):
+    model: Optional[str]
+    content_tokens: int
+    episode_tokens: int
+
+
+class ContextSection(NamedTuple):
+    text: str
+    weight: float
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Not an OpenAI model, close enough for a budget
+        pass
+    except Exception as e:
+        print(f"Unable to load tokenizer for {model}: {e}")
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Unable to load tokenizer for {model}: {e}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def trim_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Cut the text to max_tokens, ending on a paragraph or a sentence when one
+    is close to the cut.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _get_encoding(model)
+    if encoding is None:
+        trimmed = text[: max_tokens * CHARS_PER_TOKEN]
+    else:
+        trimmed = encoding.decode(
+            encoding.encode(text, disallowed_special=())[:max_tokens]
+        )
+    cut = max(trimmed.rfind("\n\n"), trimmed.rfind(". "))
+    if cut > len(trimmed) * 3 // 4:
+        trimmed = trimmed[: cut + 1]
+    return trimmed.rstrip() + " ..."
+
+
+def get_context_budget(chain_ids: Sequence[str]) -> Optional[ContextBudget]:
+    """
+    Budget of the chains sharing a context, set by the smallest model.
+    None when no model has a context size.
+    """
+    budgets = []
+    for chain_id in chain_ids:
+        try:
+            settings = get_chain_model_settings(chain_id)
+        except Exception as e:
+            print(f"Unable to resolve model of {chain_id}: {e}")
+            continue
+        if not settings.context_size:
+            continue
+        available = settings.context_size - (settings.max_tokens or 0)
+        content_tokens = int(available * CONTENT_CONTEXT_SHARE)
+        if settings.char_limit:
+            content_tokens = min(content_tokens, settings.char_limit // CHARS_PER_TOKEN)
+        budgets.append(
+            ContextBudget(
+                settings.model,
+                max(content_tokens, MIN_SECTION_TOKENS),
+                max(int(available * EPISODES_CONTEXT_SHARE), MIN_SECTION_TOKENS),
+            )
+        )
+    return min(budgets, key=lambda budget: budget.content_tokens, default=None)
+
+
+def source_sections(
+    sources: Sequence[Union[WebSource, WebSourceCollection, str]],
+) -> List[ContextSection]:
+    sections = []
+    for source in sources:
+        if not source:
+            continue
+        if isinstance(source, WebSourceCollection):
+            web_sources = (
+                source.web_sources
+                if source.max_amount is None
+                else source.web_sources[: source.max_amount]
+            )
+            for web_source in web_sources:
+                text = str(web_source)
+                if text:
+                    weight = (
+                        MAIN_ITEM_WEIGHT
+                        if source.main_item or web_source.main_item
+                        else 1.0
+                    )
+                    sections.append(ContextSection(text, weight))
+        elif isinstance(source, WebSource):
+            weight = MAIN_ITEM_WEIGHT if source.main_item else 1.0
+            sections.append(ContextSection(str(source), weight))
+        else:
+            # Input text written for the episode
+            sections.append(ContextSection(str(source), MAIN_ITEM_WEIGHT))
+    return sections
+
+
+def allocate_tokens(
+    sizes: Sequence[int], weights: Sequence[float], budget: int
+) -> List[int]:
+    """
+    Split the budget by weight, sections smaller than their share are kept
+    whole and the rest of their share goes to the larger ones.
+    """
+    allocation = list(sizes)
+    pending = set(range(len(sizes)))
+    remaining = budget
+    while pending:
+        total_weight = sum(weights[i] for i in pending)
+        fits = [i for i in pending if sizes[i] <= remaining * weights[i] / total_weight]
+        if not fits:
+            for i in pending:
+                allocation[i] = int(remaining * weights[i] / total_weight)
+            break
+        for i in fits:
+            remaining -= sizes[i]
+            pending.remove(i)
+    return allocation
+
+
+def _cache_key(kind: str, budget: ContextBudget, *parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in (kind, str(budget), *parts):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _cached(key: str) -> Optional[str]:
+    with _contexts_lock:
+        return _contexts.get(key)
+
+
+def _store(key: str, context: str) -> str:
+    with _contexts_lock:
+        _contexts[key] = context
+    return context
+
+
+def build_source_context(
+    sources: Sequence[Union[WebSource, WebSourceCollection, str]],
+    chain_ids: Sequence[str],
+) -> str:
+    """
+    Join the sources for the prompts of the chains. Past the budget of the
+    smallest model every source is given a share by weight, main items and
+    input text first, and trimmed to it.
+    """
+    sections = source_sections(sources)
+    content = "\n\n".join(section.text for section in sections)
+    budget = get_context_budget(chain_ids)
+    if budget is None or not content:
+        return content
+
+    key = _cache_key("sources", budget, content)
+    cached = _cached(key)
+    if cached is not None:
+        return cached
+
+    sizes = [count_tokens(section.text, budget.model) for section in sections]
+    if sum(sizes) <= budget.content_tokens:
+        return _store(key, content)
+
+    allocation = allocate_tokens(
+        sizes, [section.weight for section in sections], budget.content_tokens
+    )
+    trimmed = [
+        (
+            section.text
+            if tokens >= size
+            else trim_to_tokens(section.text, tokens, budget.model)
+        )
+        for section, size, tokens in zip(sections, sizes, allocation)
+        if tokens >= min(size, MIN_SECTION_TOKENS)
+    ]
+    print(
+        f"Source context trimmed from {sum(sizes)} to {budget.content_tokens} tokens, {len(trimmed)}/{len(sections)} sources"
+    )
+    return _store(key, "\n\n".join(trimmed))
+
+
+def _terms(text: str) -> set[str]:
+    return {term for term in re.findall(r"\w{4,}", text.lower())}
+
+
+def build_episode_context(
+    previous_episodes: Optional[str], content: str, chain_ids: Sequence[str]
+) -> Optional[str]:
+    """
+    Fit the previous episodes to the budget of the chains. Episodes sharing
+    the most terms with the content are kept first, the newest on a tie, the
+    first one that does not fit is trimmed and the rest are left out.
+    """
+    budget = get_context_budget(chain_ids)
+    if budget is None or not previous_episodes:
+        return previous_episodes
+
+    key = _cache_key("episodes", budget, previous_episodes, content or "")
+    cached = _cached(key)
+    if cached is not None:
+        return cached
+
+    if count_tokens(previous_episodes, budget.model) <= budget.episode_tokens:
+        return _store(key, previous_episodes)
+
+    episodes = re.split(r"\n\n(?=Episode )", previous_episodes.strip())
+    content_terms = _terms(content or "")
+    # The episodes are formatted oldest first, the later index is newer
+    ranked = sorted(
+        range(len(episodes)),
+        key=lambda i: (-len(_terms(episodes[i]) & content_terms), -i),
+    )
+
+    selected = {}
+    remaining = budget.episode_tokens
+    for i in ranked:
+        tokens = count_tokens(episodes[i], budget.model)
+        if tokens <= remaining:
+            selected[i] = episodes[i]
+            remaining -= tokens
+        else:
+            if remaining >= MIN_SECTION_TOKENS:
+                selected[i] = trim_to_tokens(episodes[i], remaining, budget.model)
+            break
+
+    print(
+        f"Previous episodes trimmed to {budget.episode_tokens} tokens, {len(selected)}/{len(episodes)} episodes"
+    )
+    return _store(key, "\n\n".join(selected[i] for i in sorted(selected)) + "\n\n")
@@ -1,3 +1,5 @@
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Union
 
@@ -14,8 +16,32 @@ from source.models.structures.web_source_collection import WebSourceCollection
 
 # Relative imports from the same package
 from .base import count_words
+from .context import build_episode_context, build_source_context
 from .modify import transcript_rewriter
 
+# Intro and bridge generations running at once in transcript_combiner
+COMBINER_CONCURRENCY = 4
+
+# Chains given the sources and previous episodes, the context is fitted to
+# the smallest of their models
+REWRITER_CONTEXT_CHAINS = (
+    "transcript_rewriter",
+    "transcript_rewriter_extend",
+    "transcript_rewriter_reduce",
+    "transcript_extend",
+    "verify_transcript_quality",
+)
+TRANSCRIPT_CONTEXT_CHAINS = ("transcript_writer",) + REWRITER_CONTEXT_CHAINS
+COMBINER_CONTEXT_CHAINS = (
+    "transcript_intro_writer",
+    "transcript_short_intro_writer",
+) + REWRITER_CONTEXT_CHAINS
+
+
+def _submit(executor: ThreadPoolExecutor, fn, *args, **kwargs) -> Future:
+    # Run in a copy of the context so the piece is traced under the caller
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
 
 @traceable(
     run_type="llm",
@@ -330,9 +356,14 @@ def generate_and_verify_transcript(
     if sources:
         all_sources.extend(sources)
 
-    # Build content string if not provided
-    if content is None:
-        content = "\n\n".join([str(s) for s in all_sources if s])
+    # Build content string if not provided, the content and the previous
+    # episodes are fitted once and reused by every call below
+    content = build_source_context(
+        all_sources if content is None else [content], TRANSCRIPT_CONTEXT_CHAINS
+    )
+    previous_episodes = build_episode_context(
+        previous_episodes, content, TRANSCRIPT_CONTEXT_CHAINS
+    )
 
     if not content:
         print("Warning: No content provided for transcript generation.")
@@ -372,7 +403,9 @@ def generate_and_verify_transcript(
                 )
 
                 segment = transcript_writer(
-                    str(item),  # Use string representation of the item as content
+                    build_source_context(
+                        [item], TRANSCRIPT_CONTEXT_CHAINS
+                    ),  # Use string representation of the item as content
                     conversation_config,
                     item_main_item,  # Pass item's main_item status
                     previous_transcripts=(previous_transcripts or [])
@@ -468,8 +501,11 @@ def transcript_combiner(
     article_count = 0  # Initialize count
 
     if sources:
-        content = "\n\n".join([str(src) for src in sources if src])
+        content = build_source_context(sources, COMBINER_CONTEXT_CHAINS)
         article_count = len(sources)
+    previous_episodes = build_episode_context(
+        previous_episodes, content, COMBINER_CONTEXT_CHAINS
+    )
     # else: # Removed redundant else block
     # raise ValueError("Sources needed for combining resulting transcripts.") # Consider if sources are truly mandatory
 
@@ -481,40 +517,56 @@ def transcript_combiner(
         print("Error: No transcripts provided to combine.")
         raise ValueError("No transcripts provided to combine.")
 
-    # Add Intro
-    if not conversation_config.disable_intro_and_conclusion:
-        try:
-            intro = transcript_intro_writer(
+    # The intro and the bridges only depend on the segments, generate them
+    # concurrently and the conclusion once they are all done
+    with_intro = not conversation_config.disable_intro_and_conclusion
+    with ThreadPoolExecutor(max_workers=COMBINER_CONCURRENCY) as executor:
+        intro_future = (
+            _submit(
+                executor,
+                transcript_intro_writer,
                 transcripts[0],  # Provide context from the first segment for intro
                 content,
                 conversation_config,
                 previous_episodes,
             )
-            combined_transcripts_parts.append(intro)
-        except Exception as e:
-            print(f"Error generating intro: {e}. Skipping intro.")
-
-    # Add Transcripts and Bridges
-    for i, transcript_segment in enumerate(transcripts):
-        combined_transcripts_parts.append(transcript_segment)
+            if with_intro
+            else None
+        )
+        bridge_futures = [
+            _submit(
+                executor,
+                transcript_bridge_writer,
+                transcript_1=transcripts[i],  # End of current segment
+                transcript_2=transcripts[i + 1],  # Start of next segment
+                conversation_config=conversation_config,
+            )
+            for i in range(len(transcripts) - 1)
+        ]
 
-        # Add bridge if not the last segment
-        if i < len(transcripts) - 1:
+        # Add Intro
+        if intro_future is not None:
             try:
-                bridge = transcript_bridge_writer(
-                    transcript_1=transcript_segment,  # End of current segment
-                    transcript_2=transcripts[i + 1],  # Start of next segment
-                    conversation_config=conversation_config,
-                )
-                combined_transcripts_parts.append(bridge)
-            except ValueError as e:
-                print(
-                    f"Skipping bridge generation between segments {i + 1} and {i + 2} due to error: {e}"
-                )
-                continue  # Skip bridge on error
+                combined_transcripts_parts.append(intro_future.result())
+            except Exception as e:
+                print(f"Error generating intro: {e}. Skipping intro.")
+
+        # Add Transcripts and Bridges
+        for i, transcript_segment in enumerate(transcripts):
+            combined_transcripts_parts.append(transcript_segment)
+
+            # Add bridge if not the last segment
+            if i < len(bridge_futures):
+                try:
+                    combined_transcripts_parts.append(bridge_futures[i].result())
+                except ValueError as e:
+                    print(
+                        f"Skipping bridge generation between segments {i + 1} and {i + 2} due to error: {e}"
+                    )
+                    continue  # Skip bridge on error
 
     # Add Conclusion
-    if not conversation_config.disable_intro_and_conclusion:
+    if with_intro:
         try:
             # Provide context from the combined parts so far for the conclusion
             conclusion_context = "\n".join(combined_transcripts_parts)
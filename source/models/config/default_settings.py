@@ -54,6 +54,10 @@ class Settings(BaseSettings):
     supabase_service_key: str = Field(
         default_factory=lambda: os.getenv("SUPABASE_SERVICE_KEY")
     )
+    # Legacy HS256 secret, projects on asymmetric keys are verified with JWKS
+    supabase_jwt_secret: Optional[str] = Field(
+        default_factory=lambda: os.getenv("SUPABASE_JWT_SECRET")
+    )
     supabase_cache_ttl: int = Field(
         default_factory=lambda: int(os.getenv("SUPABASE_CACHE_TTL", 30))
     )
@@ -84,6 +88,55 @@ class Settings(BaseSettings):
     redis_backend_url: str = Field(
         default_factory=lambda: os.getenv("REDIS_BACKEND", "redis://localhost:6379/0")
     )
+    # Resolved url cache, entries older than the ttl are revalidated
+    resolve_cache_ttl: int = Field(
+        default_factory=lambda: int(os.getenv("RESOLVE_CACHE_TTL", 6 * 60 * 60))
+    )
+    resolve_cache_max_age: int = Field(
+        default_factory=lambda: int(
+            os.getenv("RESOLVE_CACHE_MAX_AGE", 7 * 24 * 60 * 60)
+        )
+    )
+
+    # Turns off the response cache of the chains that opted in with a cache_ttl
+    llm_cache_enabled: bool = Field(
+        default_factory=lambda: os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    )
+    llm_cache_max_entries: int = Field(
+        default_factory=lambda: int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+    )
+
+    # Rendered TTS clips, evicted least recently used first past the max size
+    tts_cache_path: str = Field(
+        default_factory=lambda: os.getenv(
+            "TTS_CACHE_PATH",
+            str(
+                Path(os.path.abspath(__file__)).parent.parent.parent.parent
+                / "file_repository"
+                / "tts_cache"
+            ),
+        )
+    )
+    tts_cache_max_size: int = Field(
+        default_factory=lambda: int(
+            os.getenv("TTS_CACHE_MAX_SIZE", 2 * 1024 * 1024 * 1024)
+        )
+    )
+    # Storage bucket shared by the workers, the cache is local only when unset
+    tts_cache_bucket: Optional[str] = Field(
+        default_factory=lambda: os.getenv("TTS_CACHE_BUCKET")
+    )
+
+    # Browser pool shared by the link resolves of a worker process
+    browser_pool_contexts: int = Field(
+        default_factory=lambda: int(os.getenv("BROWSER_POOL_CONTEXTS", 2))
+    )
+    browser_pool_max_pages: int = Field(
+        default_factory=lambda: int(os.getenv("BROWSER_POOL_MAX_PAGES", 4))
+    )
+    browser_pool_max_navigations: int = Field(
+        default_factory=lambda: int(os.getenv("BROWSER_POOL_MAX_NAVIGATIONS", 100))
+    )
 
     # Celery and Flower configuration
     celery_host: str = Field(
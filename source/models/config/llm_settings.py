@@ -30,6 +30,7 @@ class ProviderModelSettings(BaseSettings):
     ratelimit_per_sec: Optional[float] = None
     ratelimit_interval: Optional[float] = None
     ratelimit_bucket: Optional[float] = None
+    ratelimit_tokens_per_min: Optional[float] = None
 
 
 class ModelDefaults(BaseSettings):
@@ -63,6 +64,10 @@ class ProviderSettings(BaseSettings):
     api_type: Optional[str] = None
     api_base: Optional[str] = None
     api_version: Optional[str] = None
+    # Limits shared by all models of the provider
+    ratelimit_per_sec: Optional[float] = None
+    ratelimit_bucket: Optional[float] = None
+    ratelimit_tokens_per_min: Optional[float] = None
     models: List[ProviderModelSettings] = []
 
 
@@ -12,13 +12,22 @@ from source.models.config.logging import logger
 from source.models.config.mapping import EMBEDDING_MODEL_MAP, LLM_MODEL_MAP, LLM_MODELS
 
 
+def _optional_float(name: str):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
 def setup_llm(SETTINGS: Settings):
     LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "OLLAMA").upper().split(",")
     SETTINGS.default_llms = ModelDefaults()
     for provider in LLM_PROVIDERS:
         logger.info(f"Loading {provider} settings...")
         provider_settings = ProviderSettings(
-            type=provider, class_model=LLM_MODEL_MAP[provider]
+            type=provider,
+            class_model=LLM_MODEL_MAP[provider],
+            ratelimit_per_sec=_optional_float(f"{provider}_PER_SEC"),
+            ratelimit_bucket=_optional_float(f"{provider}_BUCKET"),
+            ratelimit_tokens_per_min=_optional_float(f"{provider}_TOKENS_PER_MIN"),
         )
 
         if provider == "OLLAMA":
@@ -79,6 +88,9 @@ def setup_llm(SETTINGS: Settings):
                     ratelimit_bucket=float(
                         os.getenv(f"{provider}_{type.upper()}_BUCKET", 1)
                     ),
+                    ratelimit_tokens_per_min=_optional_float(
+                        f"{provider}_{type.upper()}_TOKENS_PER_MIN"
+                    ),
                 )
                 if SETTINGS.default_llms.__getattribute__("default") is None:
                     SETTINGS.default_llms.default = type_settings
@@ -15,6 +15,20 @@ from source.models.supabase.acl import (
     ACLGroupModel,
     UserACL,
 )
+from source.helpers.acl_cache import (
+    ACLSnapshot,
+    get_acl_snapshot,
+    get_acl_version,
+    invalidate_user_acl,
+    store_acl_snapshot,
+)
+from source.helpers.user_cache import (
+    ContextVersion,
+    UserContext,
+    get_context_version,
+    get_user_context,
+    store_user_context,
+)
 from uuid import UUID
 from postgrest import APIResponse
 from supabase.client import AsyncClient
@@ -49,6 +63,17 @@ class UserPreferencesData(BaseModel):
     payment_details: Optional[Dict]
 
 
+# The attributes loaded by fetch_context
+USER_CONTEXT_ATTRIBUTES = (
+    "profile",
+    "organizations",
+    "teams",
+    "roles",
+    "memberships",
+    "as_user",
+)
+
+
 class UserData:
     def __init__(
         self,
@@ -86,6 +111,8 @@ class UserData:
         # The ACL group models the user is a part of. Initialized as None and fetched when needed.
         self.acl_group: Optional[List[ACLGroupModel]] = None
         self.user_data: Optional[List[UserDataModel]] = None
+        # The version of the context loaded by fetch_context, None when not loaded.
+        self.context_version: Optional[ContextVersion] = None
 
     @staticmethod
     async def create_organization_user(
@@ -278,6 +305,47 @@ class UserData:
         # Run all upsert operations concurrently
         await asyncio.gather(*upsert_tasks)
 
+    async def fetch_context(self, refresh: bool = False) -> None:
+        """
+        Fetch the profile, organizations, teams, roles and memberships of the
+        user with concurrent bulk queries. The loaded context is shared between
+        requests until one of its rows is written.
+
+        :param refresh: Whether to refresh the data from Supabase, defaults to False
+        :type refresh: bool, optional
+        """
+        version = await get_context_version(self.auth_id)
+        context = None if refresh else get_user_context(self.auth_id, version)
+        if context is None:
+            await asyncio.gather(
+                self.fetch_user_profile(refresh=True),
+                self.fetch_organizations(refresh=True),
+                self.fetch_memberships(refresh=True),
+                self.fetch_as_user(refresh=True),
+            )
+            await asyncio.gather(
+                self.fetch_teams(refresh=True), self.fetch_roles(refresh=True)
+            )
+            context = UserContext(
+                {name: getattr(self, name) for name in USER_CONTEXT_ATTRIBUTES},
+                version or (None, None),
+            )
+            store_user_context(self.auth_id, context)
+        else:
+            for name, value in context.data.items():
+                setattr(self, name, value)
+        self.context_version = version
+
+    async def is_context_current(self) -> bool:
+        """
+        Check if the loaded context is still the latest version.
+
+        :return: True if none of the context rows have been written since it was loaded
+        :rtype: bool
+        """
+        version = await get_context_version(self.auth_id)
+        return version is not None and version == self.context_version
+
     async def fetch_user_profile(
         self, refresh: bool = False
     ) -> Optional[UserProfileModel]:
@@ -332,16 +400,17 @@ class UserData:
             if not self.organizations:
                 await self.fetch_organizations()
 
-            # If organizations are available, fetch teams for each organization
+            # If organizations are available, fetch teams of all organizations at once
             if self.organizations:
-                self.teams = {}
-                for organization in self.organizations:
-                    self.teams[
-                        organization.id
-                    ] = await OrganizationTeamModel.fetch_existing_from_supabase(
-                        self.supabase,
-                        filter={"organization_id": str(organization.id)},
-                    )
+                teams = await OrganizationTeamModel.fetch_grouped_from_supabase(
+                    self.supabase,
+                    [organization.id for organization in self.organizations],
+                    id_column="organization_id",
+                )
+                self.teams = {
+                    organization.id: teams.get(str(organization.id), [])
+                    for organization in self.organizations
+                }
         return self.teams
 
     async def fetch_roles(
@@ -360,16 +429,17 @@ class UserData:
             if not self.organizations:
                 await self.fetch_organizations()
 
-            # If organizations are available, fetch roles for each organization
+            # If organizations are available, fetch roles of all organizations at once
             if self.organizations:
-                self.roles = {}
-                for organization in self.organizations:
-                    self.roles[
-                        organization.id
-                    ] = await OrganizationRoleModel.fetch_existing_from_supabase(
-                        self.supabase,
-                        filter={"organization_id": str(organization.id)},
-                    )
+                roles = await OrganizationRoleModel.fetch_grouped_from_supabase(
+                    self.supabase,
+                    [organization.id for organization in self.organizations],
+                    id_column="organization_id",
+                )
+                self.roles = {
+                    organization.id: roles.get(str(organization.id), [])
+                    for organization in self.organizations
+                }
         return self.roles
 
     async def fetch_user_data(self, refresh: bool = False) -> List[UserDataModel]:
@@ -494,6 +564,33 @@ class UserData:
             group.acl_group_id == acl_group_id for group in self.user_in_acl_group
         )
 
+    async def fetch_acl_snapshot(self, refresh: bool = False) -> ACLSnapshot:
+        """
+        Fetch the items the user can access through their ACL groups. The
+        snapshot is shared between requests until the user's group memberships
+        or the group items change.
+
+        :param refresh: Whether to refresh the data from Supabase, defaults to False
+        :type refresh: bool, optional
+        :return: The ACL snapshot of the user
+        :rtype: ACLSnapshot
+        """
+        snapshot = None if refresh else await get_acl_snapshot(self.auth_id)
+        if snapshot is None:
+            # The version is read before the rows, a change in between only
+            # causes a reload on the next check
+            memberships = await ACLGroupUsersModel.fetch_existing_from_supabase(
+                self.supabase, filter={"auth_id": str(self.auth_id)}
+            )
+            acl_group_ids = [group.acl_group_id for group in memberships]
+            version = await get_acl_version(self.auth_id, acl_group_ids)
+            rows = await ACLGroupUsersWithItems.fetch_for_user(
+                self.supabase, self.auth_id
+            )
+            snapshot = ACLSnapshot(rows, acl_group_ids, version or ())
+            store_acl_snapshot(self.auth_id, snapshot)
+        return snapshot
+
     async def has_access_to_item(self, item_id: UUID, item_type: str) -> bool:
         """
         Check if the user has access to a specific item based on their ACL groups.
@@ -505,14 +602,24 @@ class UserData:
         :return: True if the user has access to the item, False otherwise
         :rtype: bool
         """
-        return await ACLGroupUsersWithItems.exists_in_supabase(
-            self.supabase,
-            value={
-                "auth_id": str(self.auth_id),
-                "item_id": str(item_id),
-                "item_type": item_type,
-            },
-        )
+        snapshot = await self.fetch_acl_snapshot()
+        return snapshot.has_access(item_id, item_type)
+
+    async def filter_accessible(
+        self, item_ids: List[UUID], item_type: str
+    ) -> List[UUID]:
+        """
+        Filter the items down to the ones the user has access to.
+
+        :param item_ids: The IDs of the items
+        :type item_ids: List[UUID]
+        :param item_type: The type of the items
+        :type item_type: str
+        :return: The accessible item IDs in their original order
+        :rtype: List[UUID]
+        """
+        snapshot = await self.fetch_acl_snapshot()
+        return snapshot.filter_accessible(item_ids, item_type)
 
     async def connect_with_acl_group(
         self, organization_id: UUID, acl_group_id: UUID, acl: UserACL
@@ -528,6 +635,7 @@ class UserData:
         await self.as_user[organization_id].connect_with_acl_group(
             self.supabase, acl_group_id, acl
         )
+        invalidate_user_acl([self.auth_id])
         await self.fetch_acl(refresh=True)
 
     async def disconnect_from_acl_group(
@@ -544,6 +652,7 @@ class UserData:
         await self.as_user[organization_id].disconnect_with_acl_group(
             self.supabase, acl_group_id
         )
+        invalidate_user_acl([self.auth_id])
         await self.fetch_acl(refresh=True)
 
     async def get_teams_by_organization(
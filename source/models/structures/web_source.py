@@ -247,6 +247,45 @@ class WebSource(BaseModel):
         else:
             print(f"No result found for: {self.original_source}")
 
+    @classmethod
+    def load_many_from_supabase_sync(
+        cls, supabase: Client, items: List["WebSource"]
+    ) -> List["WebSource"]:
+        """
+        Load all items with a single batched query instead of one per item.
+        """
+        print(f"Loading {len(items)} sources from Supabase")
+        results = SourceModel.fetch_many_from_supabase_sync(
+            supabase,
+            [str(item.original_source) for item in items],
+            id_column="original_source",
+        )
+        for item in items:
+            result = results.get(str(item.original_source))
+            if result:
+                item._update_from_(result)
+            else:
+                print(f"No result found for: {item.original_source}")
+        return items
+
+    @classmethod
+    async def load_many_from_supabase(
+        cls, supabase: AsyncClient, items: List["WebSource"]
+    ) -> List["WebSource"]:
+        """
+        Load all items with a single batched query instead of one per item.
+        """
+        results = await SourceModel.fetch_many_from_supabase(
+            supabase,
+            [str(item.original_source) for item in items],
+            id_column="original_source",
+        )
+        for item in items:
+            result = results.get(str(item.original_source))
+            if result:
+                item._update_from_(result)
+        return items
+
     async def check_if_exists(self, supabase: AsyncClient) -> bool:
         print(f"Asynchronously checking if source exists for: {self.original_source}")
         return await SourceModel.exists_in_supabase(
@@ -1,9 +1,12 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import hashlib
 import json
 from typing import Any, Generator, List, Optional, Type, TypeVar, Union
 from supabase import AsyncClient, Client
 from source.llm_exec.news_exec import web_source_article_builder_sync
+from source.load_env import SETTINGS
 from source.models.structures.news_article import NewsArticle
 from source.tasks.web_sources import generate_resolve_tasks_for_websources
 from source.models.structures.user import UserIDs
@@ -257,8 +260,25 @@ class WebSourceCollection(BaseModel):
         else:
             sources = self.web_sources[: self.max_amount]
 
-        for item in sources:
-            if item.resolve_and_store_link(supabase, user_ids=user_ids):
+        # Prefork workers run one task at a time, the sources of a collection
+        # are resolved in parallel and share the browser pool of the process.
+        # Each thread gets a copy of the context, e.g. the llm priority lane
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(len(sources), SETTINGS.browser_pool_max_pages))
+        ) as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    item.resolve_and_store_link,
+                    supabase,
+                    user_ids,
+                )
+                for item in sources
+            ]
+            results = [future.result() for future in futures]
+
+        for item, item_resolved in zip(sources, results):
+            if item_resolved:
                 resolved = True
                 resolved_sources.append(item)
 
@@ -269,31 +289,40 @@ class WebSourceCollection(BaseModel):
 
         return resolved
 
-    async def load_from_supabase(self, supabase: AsyncClient):
-        sources: List[WebSource] = None
-
+    def _get_sources_to_load(self) -> List[WebSource]:
         if self.max_amount is None:
-            sources = self.web_sources
-        else:
-            sources = self.web_sources[: self.max_amount]
+            return self.web_sources
+        return self.web_sources[: self.max_amount]
 
-        for item in sources:
-            item.load_from_supabase(supabase)
+    @classmethod
+    def load_items_from_supabase_sync(
+        cls, supabase: Client, items: List[Union[WebSource, "WebSourceCollection"]]
+    ) -> List[Union[WebSource, "WebSourceCollection"]]:
+        """
+        Load a mixed list of sources and collections with one batched query.
+        """
+        sources: List[WebSource] = []
+        for item in items:
+            if isinstance(item, WebSourceCollection):
+                item.web_sources = item._get_sources_to_load()
+                sources.extend(item.web_sources)
+            else:
+                sources.append(item)
+
+        WebSource.load_many_from_supabase_sync(supabase, sources)
+        return items
+
+    async def load_from_supabase(self, supabase: AsyncClient):
+        sources = self._get_sources_to_load()
+        await WebSource.load_many_from_supabase(supabase, sources)
 
         self.web_sources = sources
 
         return sources
 
     def load_from_supabase_sync(self, supabase: Client):
-        sources: List[WebSource] = None
-
-        if self.max_amount is None:
-            sources = self.web_sources
-        else:
-            sources = self.web_sources[: self.max_amount]
-
-        for item in sources:
-            item.load_from_supabase_sync(supabase)
+        sources = self._get_sources_to_load()
+        WebSource.load_many_from_supabase_sync(supabase, sources)
 
         self.web_sources = sources
 
@@ -506,15 +535,16 @@ class WebSourceCollection(BaseModel):
         # Fetch relationships and populate web sources
         relationships: list[
             SourceRelationshipModel
-        ] = SourceRelationshipModel.fetch_from_supabase_sync(
-            supabase, value=collection_id, id_column="source_id"
+        ] = SourceRelationshipModel.fetch_existing_from_supabase_sync(
+            supabase, filter={"source_id": collection_id}
         )
         self.relationships = relationships
+        related_sources = SourceModel.fetch_many_from_supabase_sync(
+            supabase, [relationship.related_source_id for relationship in relationships]
+        )
         self.web_sources = []
         for relationship in relationships:
-            related_source = SourceModel.fetch_from_supabase_sync(
-                supabase, value=relationship.related_source_id, id_column="id"
-            )
+            related_source = related_sources.get(str(relationship.related_source_id))
             if related_source:
                 web_source = WebSource()
                 web_source._update_from_(related_source)
@@ -553,22 +583,25 @@ class WebSourceCollection(BaseModel):
         # Fetch relationships where the source_id matches
         relationships: List[
             SourceRelationshipModel
-        ] = await SourceRelationshipModel.fetch_from_supabase(
+        ] = await SourceRelationshipModel.fetch_existing_from_supabase(
             supabase,
-            value=source.source_id if isinstance(source, WebSource) else source,
-            id_column="source_id",
+            filter={
+                "source_id": (
+                    source.source_id if isinstance(source, WebSource) else source
+                )
+            },
         )
 
         if not relationships:
             return None
 
         # Fetch linked sources
+        source_models = await SourceModel.fetch_many_from_supabase(
+            supabase, [relationship.related_source_id for relationship in relationships]
+        )
         linked_sources = []
         for relationship in relationships:
-            related_source_id = relationship.related_source_id
-            source_model = await SourceModel.fetch_from_supabase(
-                supabase, value=related_source_id, id_column="id"
-            )
+            source_model = source_models.get(str(relationship.related_source_id))
             if source_model:
                 # Convert SourceModel to WebSource
                 web_source = WebSource()
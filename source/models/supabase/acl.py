@@ -1,11 +1,15 @@
+from source.helpers.acl_cache import invalidate_item_acl, invalidate_user_acl
 from source.models.supabase.supabase_model import SupabaseModel
 from uuid import UUID
 from pydantic import Field
 from datetime import datetime
-from typing import ClassVar, Optional
+from typing import Any, ClassVar, Dict, List, Optional
 from enum import Enum
 from supabase.client import AsyncClient
 
+# Rows per request when paging, PostgREST caps a response at max_rows anyway
+ACL_PAGE_SIZE = 1000
+
 
 class ACL(str, Enum):
     public = "public"
@@ -89,6 +93,10 @@ class ACLGroupItemsModel(SupabaseModel):
             supabase, value=value, id_column=id_column
         )
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_item_acl(row.get("acl_group_id") for row in rows)
+
 
 class ACLGroupUsersModel(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "acl_group_users"
@@ -146,6 +154,10 @@ class ACLGroupUsersModel(SupabaseModel):
             supabase, value=value, id_column=id_column
         )
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_user_acl(row.get("auth_id") for row in rows)
+
 
 class ACLGroupUsersWithItems(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "acl_group_users_with_items"
@@ -163,3 +175,26 @@ class ACLGroupUsersWithItems(SupabaseModel):
     user_created_at: Optional[datetime]
     user_disabled: bool
     user_disabled_at: Optional[datetime]
+
+    @classmethod
+    async def fetch_for_user(
+        cls, supabase: AsyncClient, auth_id: UUID, page_size: int = ACL_PAGE_SIZE
+    ) -> List["ACLGroupUsersWithItems"]:
+        """
+        Fetch all rows of the user page by page, a single select is cut off
+        at the max_rows of PostgREST.
+        """
+        rows = []
+        while True:
+            response = await (
+                supabase.table(cls.TABLE_NAME)
+                .select("*")
+                .eq("auth_id", str(auth_id))
+                .order("acl_group_id")
+                .order("item_id")
+                .range(len(rows), len(rows) + page_size - 1)
+                .execute()
+            )
+            if not response.data:
+                return rows
+            rows.extend(cls(**data) for data in response.data)
@@ -1,11 +1,15 @@
 import json
-from typing import ClassVar, Dict, Optional
+from typing import Any, ClassVar, Dict, List, Optional
 from uuid import UUID
 from pydantic import Field, field_validator
 from pydantic.types import PositiveInt
 from datetime import datetime
 from supabase.client import AsyncClient
 
+from source.helpers.user_cache import (
+    invalidate_organization_context,
+    invalidate_user_context,
+)
 from source.models.supabase.supabase_model import SupabaseModel
 from source.models.supabase.acl import ACLGroupUsersModel, UserACL
 
@@ -38,6 +42,10 @@ class UserProfileModel(SupabaseModel):
             return json.dumps(v)
         return v
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_user_context(row.get("auth_id") for row in rows)
+
 
 class UserDataModel(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "user_data"
@@ -71,6 +79,10 @@ class OrganizationRoleModel(SupabaseModel):
             return json.dumps(v)
         return v
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_organization_context()
+
 
 class OrganizationTeamModel(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "organization_team"
@@ -92,6 +104,10 @@ class OrganizationTeamModel(SupabaseModel):
             return json.dumps(v)
         return v
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_organization_context()
+
 
 class OrganizationTeamMembersModel(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "organization_team_members"
@@ -155,6 +171,10 @@ class OrganizationTeamMembersModel(SupabaseModel):
             supabase, value=value, id_column=id_column
         )
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_user_context(row.get("auth_id") for row in rows)
+
 
 class OrganizationUsersModel(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "organization_users"
@@ -243,7 +263,7 @@ class OrganizationUsersModel(SupabaseModel):
         if existing_acl_group_user:
             # If the relationship exists, update the ACL level
             existing_acl_group_user.acl = acl
-            await existing_acl_group_user.update()
+            await existing_acl_group_user.update(supabase)
         else:
             # Otherwise, create a new ACL group user relationship
             acl_group_user = ACLGroupUsersModel(
@@ -279,6 +299,10 @@ class OrganizationUsersModel(SupabaseModel):
 
         return org_user
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_user_context(row.get("auth_id") for row in rows)
+
 
 class OrganizationsModel(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "organizations"
@@ -302,3 +326,7 @@ class OrganizationsModel(SupabaseModel):
         elif isinstance(v, dict):
             return json.dumps(v)
         return v
+
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_organization_context()
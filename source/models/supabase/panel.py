@@ -1,8 +1,12 @@
 from datetime import datetime
 from enum import Enum
-from typing import ClassVar, Dict, Optional, List
+from typing import Any, ClassVar, Dict, Optional, List
 from uuid import UUID
 from pydantic import Field
+from source.helpers.panel_cache import (
+    invalidate_panel_details,
+    invalidate_panel_details_async,
+)
 from source.models.supabase.supabase_model import SupabaseModel
 
 
@@ -35,6 +39,16 @@ class PanelAudio(SupabaseModel):
     owner_id: Optional[UUID] = Field(default=None)
     organization_id: Optional[UUID] = Field(default=None)
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_panel_details(panel_ids=[row.get("panel_id") for row in rows])
+
+    @classmethod
+    async def _after_write_async(cls, rows: List[Dict[str, Any]]):
+        await invalidate_panel_details_async(
+            panel_ids=[row.get("panel_id") for row in rows]
+        )
+
 
 class PanelDiscussion(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "panel_discussion"
@@ -50,6 +64,14 @@ class PanelDiscussion(SupabaseModel):
     owner_id: Optional[UUID] = Field(default=None)
     organization_id: Optional[UUID] = Field(default=None)
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_panel_details(panel_ids=[row.get("id") for row in rows])
+
+    @classmethod
+    async def _after_write_async(cls, rows: List[Dict[str, Any]]):
+        await invalidate_panel_details_async(panel_ids=[row.get("id") for row in rows])
+
 
 class PanelTranscript(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "panel_transcript"
@@ -75,6 +97,16 @@ class PanelTranscript(SupabaseModel):
     owner_id: Optional[UUID] = Field(default=None)
     organization_id: Optional[UUID] = Field(default=None)
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_panel_details(panel_ids=[row.get("panel_id") for row in rows])
+
+    @classmethod
+    async def _after_write_async(cls, rows: List[Dict[str, Any]]):
+        await invalidate_panel_details_async(
+            panel_ids=[row.get("panel_id") for row in rows]
+        )
+
 
 class PanelTranscriptOrder(SupabaseModel):
     TABLE_NAME: ClassVar[str] = "panel_transcript_order"
@@ -111,3 +143,15 @@ class PanelTranscriptSourceReference(SupabaseModel):
     updated_at: Optional[datetime] = Field(default=None)
     owner_id: Optional[UUID] = Field(default=None)
     organization_id: Optional[UUID] = Field(default=None)
+
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        invalidate_panel_details(
+            transcript_ids=[row.get("transcript_id") for row in rows]
+        )
+
+    @classmethod
+    async def _after_write_async(cls, rows: List[Dict[str, Any]]):
+        await invalidate_panel_details_async(
+            transcript_ids=[row.get("transcript_id") for row in rows]
+        )
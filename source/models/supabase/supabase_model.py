@@ -1,6 +1,17 @@
 import enum
 import json
-from typing import Any, ClassVar, Dict, Iterable, List, Optional, Type, TypeVar, Union
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+)
 from pydantic import BaseModel, Field
 from pydantic.fields import FieldInfo
 from supabase.client import AsyncClient, Client
@@ -10,6 +21,9 @@ from source.models.config.logging import logger
 
 T = TypeVar("T", bound="SupabaseModel")
 
+# Max amount of keys in a single in_() query, keeps the request url short
+BATCH_CHUNK_SIZE = 50
+
 
 class SupabaseModel(BaseModel):
     # Constant table name for each subclass
@@ -43,6 +57,22 @@ class SupabaseModel(BaseModel):
             )
         }
 
+    @classmethod
+    def _after_write(cls, rows: List[Dict[str, Any]]):
+        """
+        Called with the rows returned by an insert, update, upsert or delete.
+        Models override this to invalidate caches built from their table.
+        """
+        pass
+
+    @classmethod
+    async def _after_write_async(cls, rows: List[Dict[str, Any]]):
+        """
+        _after_write for the async writes, models with an async invalidation
+        override this as well.
+        """
+        cls._after_write(rows)
+
     async def create(self, supabase: AsyncClient) -> T:
         """Create a new record in the database."""
         return await self.save_to_supabase(supabase, self)
@@ -148,6 +178,8 @@ class SupabaseModel(BaseModel):
                 .execute()
             )
 
+            await cls._after_write_async(response.data)
+
             id_to_updated_data = {}
             if isinstance(id_column, list):
                 for item in response.data:
@@ -215,6 +247,8 @@ class SupabaseModel(BaseModel):
                 .execute()
             )
 
+            cls._after_write(response.data)
+
             id_to_updated_data = {}
             if isinstance(id_column, list):
                 for item in response.data:
@@ -295,6 +329,7 @@ class SupabaseModel(BaseModel):
                 for key, value in response.data[0].items():
                     instance._set_attribute(key, value)
                 instance.dirty = False
+                await cls._after_write_async(response.data)
 
         return instance
 
@@ -346,6 +381,7 @@ class SupabaseModel(BaseModel):
                 for key, value in response.data[0].items():
                     instance._set_attribute(key, value)
                 instance.dirty = False
+                cls._after_write(response.data)
 
         return instance
 
@@ -527,6 +563,106 @@ class SupabaseModel(BaseModel):
 
         return [cls(**data) for data in response.data]
 
+    @classmethod
+    def _batch_values(
+        cls, values: Iterable[Any], chunk_size: int
+    ) -> Iterator[List[str]]:
+        unique_values = list(dict.fromkeys(str(value) for value in values if value))
+        for i in range(0, len(unique_values), chunk_size):
+            yield unique_values[i : i + chunk_size]
+
+    @classmethod
+    async def fetch_many_from_supabase(
+        cls: Type[T],
+        supabase: AsyncClient,
+        values: Iterable[Any],
+        id_column: str = "id",
+        chunk_size: int = BATCH_CHUNK_SIZE,
+    ) -> Dict[str, T]:
+        """
+        Fetch records for all values with one in_() query per chunk.
+        Returns the records keyed by the string value of id_column.
+        """
+        grouped = await cls.fetch_grouped_from_supabase(
+            supabase, values, id_column=id_column, chunk_size=chunk_size
+        )
+        return {key: items[0] for key, items in grouped.items()}
+
+    @classmethod
+    def fetch_many_from_supabase_sync(
+        cls: Type[T],
+        supabase: Client,
+        values: Iterable[Any],
+        id_column: str = "id",
+        chunk_size: int = BATCH_CHUNK_SIZE,
+    ) -> Dict[str, T]:
+        """
+        Fetch records for all values with one in_() query per chunk (synchronous).
+        Returns the records keyed by the string value of id_column.
+        """
+        grouped = cls.fetch_grouped_from_supabase_sync(
+            supabase, values, id_column=id_column, chunk_size=chunk_size
+        )
+        return {key: items[0] for key, items in grouped.items()}
+
+    @classmethod
+    async def fetch_grouped_from_supabase(
+        cls: Type[T],
+        supabase: AsyncClient,
+        values: Iterable[Any],
+        id_column: str = "id",
+        chunk_size: int = BATCH_CHUNK_SIZE,
+    ) -> Dict[str, List[T]]:
+        """
+        Fetch all records matching any of the values and group them by the
+        string value of id_column, e.g. all references for a set of transcripts.
+        """
+        assert cls.TABLE_NAME, "TABLE_NAME must be set for the model."
+
+        grouped: Dict[str, List[T]] = {}
+        for chunk in cls._batch_values(values, chunk_size):
+            response: APIResponse = (
+                await supabase.table(cls.TABLE_NAME)
+                .select("*")
+                .in_(id_column, chunk)
+                .execute()
+            )
+            for data in response.data or []:
+                instance = cls(**data)
+                instance.dirty = False
+                grouped.setdefault(str(data[id_column]), []).append(instance)
+
+        return grouped
+
+    @classmethod
+    def fetch_grouped_from_supabase_sync(
+        cls: Type[T],
+        supabase: Client,
+        values: Iterable[Any],
+        id_column: str = "id",
+        chunk_size: int = BATCH_CHUNK_SIZE,
+    ) -> Dict[str, List[T]]:
+        """
+        Fetch all records matching any of the values and group them by the
+        string value of id_column (synchronous).
+        """
+        assert cls.TABLE_NAME, "TABLE_NAME must be set for the model."
+
+        grouped: Dict[str, List[T]] = {}
+        for chunk in cls._batch_values(values, chunk_size):
+            response: APIResponse = (
+                supabase.table(cls.TABLE_NAME)
+                .select("*")
+                .in_(id_column, chunk)
+                .execute()
+            )
+            for data in response.data or []:
+                instance = cls(**data)
+                instance.dirty = False
+                grouped.setdefault(str(data[id_column]), []).append(instance)
+
+        return grouped
+
     def _set_attribute(self, key: str, value: Any):
         if key in self.model_fields:
             field_info: FieldInfo = self.model_fields[key]
@@ -631,6 +767,7 @@ class SupabaseModel(BaseModel):
 
         if hasattr(response, "data") and len(response.data) > 0:
             logger.debug(response.data)
+            await cls._after_write_async(response.data)
             return True
 
         return False
@@ -657,6 +794,7 @@ class SupabaseModel(BaseModel):
 
         if hasattr(response, "data") and len(response.data) > 0:
             logger.debug(response.data)
+            cls._after_write(response.data)
             return True
 
         return False
@@ -32,16 +32,17 @@ class User:
     def is_initialized(self) -> bool:
         return self._initialize_task is not None and self._initialize_task.done()
 
-    async def initialize(self) -> None:
-        if self._initialize_task is None:
+    async def initialize(self, reload: bool = False) -> None:
+        if self._initialize_task is None or (reload and self.is_initialized):
             self._initialize_task = asyncio.create_task(self._initialize())
         await self._initialize_task
 
     async def _initialize(self) -> None:
         if self.model is None:
             self.model = UserData(self.supabase, auth_id=self.auth_id)
-        await self.model.fetch_user_profile()
-        await self.model.fetch_organizations()
+        await self.model.fetch_context()
+        self._organization_dict = {}
+        self._preferences = None
 
     async def connect_to_organization(
         self,
@@ -217,6 +218,11 @@ class User:
     async def has_access_to_item(self, item_id: UUID, item_type: str) -> bool:
         return await self.model.has_access_to_item(item_id, item_type)
 
+    async def filter_accessible(
+        self, item_ids: List[UUID], item_type: str
+    ) -> List[UUID]:
+        return await self.model.filter_accessible(item_ids, item_type)
+
 
 async def get_current_user(supabase: AsyncClient) -> User:
     session: Session = await supabase.auth.get_session()
@@ -230,5 +236,7 @@ async def get_current_user(supabase: AsyncClient) -> User:
 
     if not user.is_initialized:
         await user.initialize()
+    elif not await user.model.is_context_current():
+        await user.initialize(reload=True)
 
     return user
@@ -1,12 +1,20 @@
 import datetime
+import os
+import re
+import subprocess
+import tempfile
+import threading
 import time
-from typing import Dict, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
 from uuid import UUID
-from io import BytesIO
 from supabase import Client
 from pydub import AudioSegment
 from app.core.supabase import get_sync_supabase_client
+from source.helpers import tts_cache
+from source.helpers.storage_upload import upload_file
 from source.load_env import SETTINGS
+from source.models.config.logging import logger
 from transcript_to_audio.schemas import TTSConfig, SpeakerConfig
 from transcript_to_audio.text_to_speech import TextToSpeech
 
@@ -23,6 +31,126 @@ from source.models.structures.panel import (
 )
 
 
+# Segments are rendered in parallel, each with its own retries
+SEGMENT_CONCURRENCY = 4
+SEGMENT_MAX_ATTEMPTS = 3
+SEGMENT_RETRY_DELAY = 5
+SEGMENT_PATTERN = re.compile(
+    r"<Person(\d+)\b[^>]*>.*?</Person\1\s*>", re.DOTALL | re.IGNORECASE
+)
+
+
+def split_transcript_segments(transcript_text: str) -> List[Tuple[int, str]]:
+    """
+    Split the transcript to the <PersonN> blocks written by TranscriptParser,
+    returns (speaker, block) pairs in order.
+    """
+    segments = [
+        (int(match.group(1)), match.group(0).strip())
+        for match in SEGMENT_PATTERN.finditer(transcript_text)
+    ]
+    return segments or [(1, transcript_text.strip())]
+
+
+def render_segment(
+    get_tts: Callable[[], TextToSpeech],
+    text: str,
+    voice_configs: Dict[int, SpeakerConfig],
+    key: str,
+) -> Tuple[str, str]:
+    """
+    Return the cached clip of the segment, or render it retrying with a
+    growing delay and add it to the cache. Returns the segment text as
+    updated by the TTS and the path of the clip.
+    """
+    clip = tts_cache.get_clip(key)
+    if clip is not None:
+        return clip
+
+    for attempt in range(SEGMENT_MAX_ATTEMPTS):
+        try:
+            updated_text, audio = get_tts().convert_to_speech(
+                text, voice_configs, None, save_to_file=False
+            )
+            break
+        except Exception as e:
+            if attempt + 1 >= SEGMENT_MAX_ATTEMPTS:
+                raise
+            delay = SEGMENT_RETRY_DELAY * 2**attempt
+            logger.warning(f"Segment audio failed, retrying in {delay}s: {e}")
+            time.sleep(delay)
+
+    return tts_cache.store_clip(key, updated_text.strip(), audio)
+
+
+def render_segments(
+    segments: List[Tuple[int, str]],
+    voice_configs: Dict[int, SpeakerConfig],
+    tts_model: str,
+    tts_config: TTSConfig,
+) -> Tuple[str, List[str]]:
+    """
+    Render the segments with bounded concurrency, identical segments are
+    rendered once and segments in the clip cache not at all. Returns the
+    updated transcript and the clip files in transcript order.
+    """
+    local = threading.local()
+
+    def get_tts() -> TextToSpeech:
+        if not hasattr(local, "tts"):
+            local.tts = TextToSpeech(provider=tts_model, tts_config=tts_config)
+        return local.tts
+
+    futures: Dict[str, Future] = {}
+    ordered: List[Future] = []
+    with ThreadPoolExecutor(max_workers=SEGMENT_CONCURRENCY) as executor:
+        for speaker, text in segments:
+            key = tts_cache.utterance_cache_key(
+                text, voice_configs.get(speaker), tts_model, tts_config
+            )
+            if key not in futures:
+                futures[key] = executor.submit(
+                    render_segment, get_tts, text, voice_configs, key
+                )
+            ordered.append(futures[key])
+        results = [future.result() for future in ordered]
+
+    updated_transcript = "\n".join(text for text, _ in results)
+    return updated_transcript, [file_path for _, file_path in results]
+
+
+def encode_segments(files: List[str], output_path: str, audio_format: str = "mp3"):
+    """
+    Concatenate and encode the segment files with ffmpeg, which streams
+    them from disk instead of holding the episode in memory.
+    """
+    list_path = f"{output_path}.list"
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.writelines(f"file '{file_path}'\n" for file_path in files)
+    try:
+        subprocess.run(
+            [
+                AudioSegment.converter,
+                "-y",
+                "-loglevel",
+                "error",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_path,
+                "-f",
+                audio_format,
+                output_path,
+            ],
+            check=True,
+            capture_output=True,
+        )
+    finally:
+        os.remove(list_path)
+
+
 def create_panel_audio(
     tokens: Tuple[str, str],
     request_data: PanelRequestData,
@@ -162,54 +290,50 @@ def create_panel_audio(
     # )
     panel_audio.file = bucket_audio_file
 
-    # Prepare TTS
-    tts = TextToSpeech(provider=tts_model, tts_config=lang_tts_config)
-
-    # Try TTS conversion: returns (updated_transcript_path, audio_segment)
-    # audio_segment is a pydub.AudioSegment object
+    # Render the <PersonN> blocks separately, a failed line is retried on its
+    # own and lines rendered before with the same voice come from the cache
+    segments = split_transcript_segments(transcript_text)
+    print(f"{voice_configs=}, rendering {len(segments)} segments")
     try:
-        print(f"{voice_configs=}")
-        audio_segment: AudioSegment = None
-        updated_transcript, audio_segment = tts.convert_to_speech(
-            transcript_text, voice_configs, None, save_to_file=False
+        updated_transcript, segment_files = render_segments(
+            segments, voice_configs, tts_model, lang_tts_config
         )
     except Exception as e:
         print(f"Error during audio generation: {e}")
-        # Retry logic
-        try:
-            time.sleep(60)  # Wait for 60 seconds before retrying
-            updated_transcript, audio_segment = tts.convert_to_speech(
-                transcript_text, voice_configs, None, save_to_file=False
-            )
-        except Exception as e:
-            print(f"Error during second attempt of audio generation: {e}")
-            panel_audio.process_state = ProcessState.failed
-            panel_audio.process_state_message = str(e)
-            panel_audio.update_sync(supabase=supabase_client)
-            raise RuntimeError("Failed to generate podcast audio after retry") from e
+        panel_audio.process_state = ProcessState.failed
+        panel_audio.process_state_message = str(e)
+        panel_audio.update_sync(supabase=supabase_client)
+        raise RuntimeError("Failed to generate podcast audio") from e
 
     # Upload new transcript file to bucket (replace previous)
-    # with open(updated_transcript_path, "rb") as new_transcript_file:
     supabase_client.storage.from_(request_data.bucket_name).upload(
         bucket_transcript_file,
         updated_transcript.encode("utf-8"),
         file_options={"upsert": "true"},
     )
 
-    # Export audio_segment (pydub.AudioSegment) to BytesIO and upload directly
-    audio_buffer = BytesIO()
-    audio_segment.export(audio_buffer, format="mp3")
-    audio_buffer.seek(0)
-    supabase_client.storage.from_(request_data.bucket_name).upload(
-        bucket_audio_file,
-        audio_buffer.getvalue(),
-        file_options={"upsert": "true"},
+    print(
+        f"Uploading audio file: {bucket_audio_file} to bucket: {request_data.bucket_name}"
     )
+    try:
+        with tempfile.TemporaryDirectory() as audio_dir:
+            audio_path = os.path.join(audio_dir, f"audio_{panel_audio.id}.mp3")
+            encode_segments(segment_files, audio_path, "mp3")
+            upload_file(
+                supabase_client,
+                request_data.bucket_name,
+                bucket_audio_file,
+                audio_path,
+                "audio/mpeg",
+            )
+    except Exception as e:
+        print(f"Error during audio upload: {e}")
+        panel_audio.process_state = ProcessState.failed
+        panel_audio.process_state_message = str(e)
+        panel_audio.update_sync(supabase=supabase_client)
+        raise RuntimeError("Failed to upload podcast audio") from e
 
     panel_audio.process_state = ProcessState.done
     panel_audio.update_sync(supabase=supabase_client)
 
-    print(
-        f"Uploading audio file: {bucket_audio_file} to bucket: {request_data.bucket_name}"
-    )
     return panel_audio.id
@@ -0,0 +1,524 @@
+from typing import List, Optional, Tuple
+from celery import Signature, Task, chain, chord
+from supabase import Client
+
+from app.core.celery_app import ResilientTask, celery_app
+from app.core.supabase import (
+    get_sync_supabase_client,
+    get_sync_supabase_service_client,
+)
+from source.chains.resilience import ProviderUnavailable
+from source.helpers.sources import (
+    build_resolve_batch,
+    fetch_source_items,
+    get_resolved_item_indexes,
+    select_resolve_items,
+)
+from source.models.structures.panel import PanelRequestData
+from source.models.structures.web_source import WebSource
+from source.models.structures.web_source_collection import WebSourceCollection
+from source.models.supabase.panel import PanelDiscussion, PanelTranscript
+from source.panel.audio import create_panel_audio
+from source.panel.transcript import (
+    build_transcript_tasks,
+    collect_transcript_sources,
+    combine_panel_transcripts,
+    create_panel_transcript_translation,
+    fetch_panel_metadata_and_config,
+    finalize_panel_transcript,
+    format_previous_episodes,
+    get_request_input_text,
+    get_request_user_ids,
+    get_translation_languages,
+    load_previous_episodes,
+    mark_panel_transcript_failed,
+    start_panel_transcript,
+)
+from source.tasks.transcript import deserialize_sources, serialize_sources
+
+# Each stage of the panel pipeline is its own task. Stages pass a JSON
+# serializable state dict forward and fan out with chords, replacing
+# themselves with the chord so that no worker waits on another worker.
+
+RESULT_PANEL = "panel"
+RESULT_PANEL_TRANSCRIPTS = "panel_transcripts"
+RESULT_TRANSCRIPTS = "transcripts"
+
+
+def get_pipeline_supabase_client(state: dict) -> Client:
+    tokens = state.get("tokens")
+    if state.get("use_service_account") or not tokens:
+        return get_sync_supabase_service_client()
+    return get_sync_supabase_client(access_token=tokens[0], refresh_token=tokens[1])
+
+
+def get_pipeline_request_data(state: dict) -> PanelRequestData:
+    return PanelRequestData.model_validate_json(state["request_data_json"])
+
+
+def get_pipeline_transcript(
+    supabase_client: Client, state: dict
+) -> Tuple[PanelTranscript, PanelDiscussion]:
+    panel_transcript = PanelTranscript.fetch_from_supabase_sync(
+        supabase_client, state["panel_transcript_id"]
+    )
+    panel = PanelDiscussion.fetch_from_supabase_sync(
+        supabase_client, panel_transcript.panel_id
+    )
+    return panel_transcript, panel
+
+
+def pipeline_failed(supabase_client: Client, state: dict, error: Exception):
+    print(f"Panel pipeline: Stage failed with {repr(error)}")
+    if not state.get("panel_transcript_id"):
+        return
+    try:
+        panel_transcript = PanelTranscript.fetch_from_supabase_sync(
+            supabase_client, state["panel_transcript_id"]
+        )
+        if panel_transcript is not None:
+            mark_panel_transcript_failed(supabase_client, panel_transcript, error)
+    except Exception as e:
+        print(f"Panel pipeline: Unable to mark transcript as failed: {e}")
+
+
+def on_stage_error(state: dict) -> Signature:
+    return panel_pipeline_failed_task.s(
+        {
+            "tokens": state.get("tokens"),
+            "use_service_account": state.get("use_service_account", False),
+            "panel_transcript_id": state.get("panel_transcript_id"),
+        }
+    )
+
+
+class PipelineStageTask(ResilientTask):
+    """
+    Base of the pipeline stages. The stages handle their own errors, but a
+    provider that stays unavailable fails the task after its last re-queue,
+    outside of the stage.
+    """
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        super().on_failure(exc, task_id, args, kwargs, einfo)
+        if not isinstance(exc, ProviderUnavailable):
+            return
+        state = kwargs.get("state") or next(
+            (arg for arg in args if isinstance(arg, dict) and "panel_id" in arg),
+            None,
+        )
+        if state is not None:
+            pipeline_failed(get_pipeline_supabase_client(state), state, exc)
+
+
+@celery_app.task
+def panel_pipeline_failed_task(request, exc, traceback, state: dict):
+    """
+    Error callback for chord stages, called when one of the chord tasks fails.
+    """
+    pipeline_failed(get_pipeline_supabase_client(state), state, exc)
+
+
+@celery_app.task(base=PipelineStageTask)
+def prepare_transcript_stage(state: dict) -> dict:
+    """
+    Create the transcript record and load the previous episodes.
+    """
+    supabase_client = get_pipeline_supabase_client(state)
+    request_data = get_pipeline_request_data(state)
+    panel_transcript, _, _, _ = start_panel_transcript(supabase_client, request_data)
+    state["panel_transcript_id"] = str(panel_transcript.id)
+    try:
+        previous_episodes_with_summary = load_previous_episodes(
+            supabase_client, request_data.panel_id, 5
+        )
+        state["previous_transcripts"] = [
+            transcript.model_dump(mode="json")
+            for transcript, _ in previous_episodes_with_summary
+        ]
+        state["previous_episodes"] = format_previous_episodes(
+            previous_episodes_with_summary
+        )
+    except Exception as e:
+        pipeline_failed(supabase_client, state, e)
+        raise RuntimeError("Failed to generate podcast transcript") from e
+
+    return state
+
+
+@celery_app.task(base=PipelineStageTask)
+def fetch_sources_stage(state: dict) -> dict:
+    """
+    Fetch the configured news feeds and urls.
+    """
+    supabase_client = get_pipeline_supabase_client(state)
+    try:
+        request_data = get_pipeline_request_data(state)
+        _, metadata, _ = fetch_panel_metadata_and_config(
+            supabase_client, request_data.panel_id, request_data
+        )
+        sources = collect_transcript_sources(request_data, metadata)
+        state["source_items"] = serialize_sources(fetch_source_items(sources))
+    except Exception as e:
+        pipeline_failed(supabase_client, state, e)
+        raise RuntimeError("Failed to fetch transcript sources") from e
+
+    return state
+
+
+@celery_app.task(base=PipelineStageTask)
+def group_sources_stage(state: dict) -> dict:
+    """
+    Group the fetched feed items into the items to resolve.
+    """
+    supabase_client = get_pipeline_supabase_client(state)
+    try:
+        request_data = get_pipeline_request_data(state)
+        # Grouping only uses the transcript metadata of the previous episodes
+        previous_episodes = [
+            (PanelTranscript(**transcript), "")
+            for transcript in state.pop("previous_transcripts", [])
+        ]
+        resolve_items = select_resolve_items(
+            deserialize_sources(state.pop("source_items")),
+            request_data.news_guidance,
+            min_amount=int(request_data.segments),
+            max_ids=int(request_data.news_items),
+            user_ids=get_request_user_ids(request_data),
+            previous_episodes=previous_episodes,
+        )
+        state["resolve_items"] = serialize_sources(resolve_items)
+        state["resolve_start"] = 0
+        state["resolved_indexes"] = []
+    except Exception as e:
+        pipeline_failed(supabase_client, state, e)
+        raise RuntimeError("Failed to group transcript sources") from e
+
+    return state
+
+
+@celery_app.task(base=PipelineStageTask, bind=True)
+def resolve_links_stage(self: Task, state: dict):
+    """
+    Resolve the next batch of items, looping through collect_resolved_links_stage
+    until enough items have been resolved or all items have been tried.
+    """
+    try:
+        request_data = get_pipeline_request_data(state)
+        min_amount = int(request_data.segments)
+        resolve_items = deserialize_sources(state["resolve_items"])
+        start_index = state["resolve_start"]
+
+        if len(state["resolved_indexes"]) >= min_amount or start_index >= len(
+            resolve_items
+        ):
+            print(
+                f"Panel pipeline: Resolved {len(state['resolved_indexes'])} of {len(resolve_items)} items"
+            )
+            return state
+
+        batch_tasks, task_item_index, end_index = build_resolve_batch(
+            resolve_items,
+            start_index,
+            min_amount,
+            state.get("tokens"),
+            get_request_user_ids(request_data),
+        )
+        state["resolve_start"] = end_index
+    except Exception as e:
+        pipeline_failed(get_pipeline_supabase_client(state), state, e)
+        raise RuntimeError("Failed to resolve transcript sources") from e
+
+    if not batch_tasks:
+        return self.replace(resolve_links_stage.s(state))
+
+    return self.replace(
+        chord(
+            batch_tasks,
+            collect_resolved_links_stage.s(state, task_item_index),
+        ).on_error(on_stage_error(state))
+    )
+
+
+@celery_app.task(base=PipelineStageTask, bind=True)
+def collect_resolved_links_stage(
+    self: Task, task_results: list, state: dict, task_item_index: List[int]
+):
+    try:
+        request_data = get_pipeline_request_data(state)
+        needed = int(request_data.segments) - len(state["resolved_indexes"])
+        state["resolved_indexes"] += get_resolved_item_indexes(
+            task_item_index, task_results
+        )[:needed]
+    except Exception as e:
+        pipeline_failed(get_pipeline_supabase_client(state), state, e)
+        raise RuntimeError("Failed to resolve transcript sources") from e
+
+    return self.replace(resolve_links_stage.s(state))
+
+
+@celery_app.task(base=PipelineStageTask, bind=True)
+def write_segments_stage(self: Task, state: dict):
+    """
+    Load the resolved items and write a transcript for each segment in parallel.
+    """
+    supabase_client = get_pipeline_supabase_client(state)
+    try:
+        request_data = get_pipeline_request_data(state)
+        panel_transcript, _ = get_pipeline_transcript(supabase_client, state)
+        conversation_config, metadata, _ = fetch_panel_metadata_and_config(
+            supabase_client, request_data.panel_id, request_data
+        )
+        user_ids = get_request_user_ids(request_data)
+
+        resolve_items: List[WebSource | WebSourceCollection] = deserialize_sources(
+            state.pop("resolve_items")
+        )
+        ordered_groups = [resolve_items[i] for i in state.pop("resolved_indexes")]
+        WebSourceCollection.load_items_from_supabase_sync(
+            supabase_client, ordered_groups
+        )
+        for item in ordered_groups:
+            item.create_panel_transcript_source_reference_sync(
+                supabase_client, panel_transcript, user_ids
+            )
+        state["ordered_groups"] = serialize_sources(ordered_groups)
+
+        tasks, combined_sources = build_transcript_tasks(
+            conversation_config,
+            get_request_input_text(request_data, metadata),
+            ordered_groups,
+            request_data.longform,
+            previous_episodes=state["previous_episodes"],
+        )
+        state["combined_sources"] = serialize_sources(combined_sources)
+    except Exception as e:
+        pipeline_failed(supabase_client, state, e)
+        raise RuntimeError("Failed to generate podcast transcript") from e
+
+    return self.replace(
+        chord(tasks, combine_transcript_stage.s(state)).on_error(on_stage_error(state))
+    )
+
+
+@celery_app.task(base=PipelineStageTask)
+def combine_transcript_stage(all_transcripts: list, state: dict) -> dict:
+    supabase_client = get_pipeline_supabase_client(state)
+    try:
+        request_data = get_pipeline_request_data(state)
+        conversation_config, _, _ = fetch_panel_metadata_and_config(
+            supabase_client, request_data.panel_id, request_data
+        )
+        state["final_transcript"] = combine_panel_transcripts(
+            [transcript for transcript in all_transcripts if transcript],
+            deserialize_sources(state["combined_sources"]),
+            conversation_config,
+            previous_episodes=state["previous_episodes"],
+        )
+    except Exception as e:
+        pipeline_failed(supabase_client, state, e)
+        raise RuntimeError("Failed to generate podcast transcript") from e
+
+    return state
+
+
+@celery_app.task(base=PipelineStageTask)
+def summarize_transcript_stage(state: dict) -> dict:
+    """
+    Write the summary for the combined transcript and upload it.
+    """
+    supabase_client = get_pipeline_supabase_client(state)
+    try:
+        request_data = get_pipeline_request_data(state)
+        panel_transcript, panel = get_pipeline_transcript(supabase_client, state)
+        conversation_config, _, _ = fetch_panel_metadata_and_config(
+            supabase_client, panel, request_data
+        )
+        finalize_panel_transcript(
+            supabase_client,
+            panel,
+            panel_transcript,
+            state["final_transcript"],
+            deserialize_sources(state["combined_sources"]),
+            conversation_config,
+            request_data.bucket_name,
+        )
+        state["transcript_ids"] = [str(panel_transcript.id)]
+    except Exception as e:
+        pipeline_failed(supabase_client, state, e)
+        raise RuntimeError("Failed to generate podcast transcript") from e
+
+    return state
+
+
+@celery_app.task
+def translate_transcript_task(state: dict, language: str) -> dict:
+    """
+    Translate the transcript to the language. Failures are returned instead
+    of raised so the other languages carry on.
+    """
+    result = {"language": language, "transcript_id": None, "error": None}
+    supabase_client = get_pipeline_supabase_client(state)
+    try:
+        panel_transcript, panel = get_pipeline_transcript(supabase_client, state)
+        transcript_id, error = create_panel_transcript_translation(
+            request_data=get_pipeline_request_data(state),
+            panel=panel,
+            parent_transcript=panel_transcript,
+            transcript=state["final_transcript"],
+            language=language,
+            sources=deserialize_sources(state["ordered_groups"]),
+            combined_sources=deserialize_sources(state["combined_sources"]),
+            supabase_client=supabase_client,
+        )
+        result["transcript_id"] = str(transcript_id)
+        if error is not None:
+            raise error
+    except Exception as e:
+        print(f"Panel pipeline: Translation to {language} failed with {repr(e)}")
+        result["error"] = repr(e)
+    return result
+
+
+@celery_app.task
+def create_transcript_audio_task(result: dict, state: dict) -> dict:
+    """
+    Create the audio for the transcript of the result, skipped when the
+    transcript failed.
+    """
+    result = {**result, "audio_id": None}
+    if result.get("error") or not result.get("transcript_id"):
+        return result
+
+    try:
+        audio_request_data = PanelRequestData.model_validate_json(
+            state["audio_request_data_json"]
+        )
+        audio_request_data.transcript_id = result["transcript_id"]
+        audio_id = create_panel_audio(
+            state.get("tokens"),
+            audio_request_data,
+            get_pipeline_supabase_client(state),
+        )
+        result["audio_id"] = str(audio_id) if audio_id else None
+    except Exception as e:
+        print(
+            f"Panel pipeline: Audio for {result['transcript_id']} failed with {repr(e)}"
+        )
+        result["error"] = repr(e)
+    return result
+
+
+@celery_app.task(base=PipelineStageTask, bind=True)
+def translate_transcripts_stage(self: Task, state: dict):
+    """
+    Translate the transcript to each of the panel languages in parallel. When
+    audio is requested each translation continues to its own audio as soon as
+    it is done, and the audio of the main transcript starts right away.
+    """
+    supabase_client = get_pipeline_supabase_client(state)
+    try:
+        panel_transcript, panel = get_pipeline_transcript(supabase_client, state)
+        languages = get_translation_languages(panel.metadata or {}, panel_transcript)
+        with_audio = state.get("audio_request_data_json") is not None
+
+        branches = []
+        if with_audio:
+            branches.extend(
+                create_transcript_audio_task.s({"transcript_id": transcript_id}, state)
+                for transcript_id in state.get("transcript_ids", [])
+            )
+        for language in languages:
+            translation = translate_transcript_task.s(state, language)
+            branches.append(
+                translation | create_transcript_audio_task.s(state)
+                if with_audio
+                else translation
+            )
+    except Exception as e:
+        pipeline_failed(supabase_client, state, e)
+        raise RuntimeError("Failed to translate podcast transcript") from e
+
+    if not branches:
+        return state
+
+    return self.replace(
+        chord(branches, collect_translations_stage.s(state)).on_error(
+            on_stage_error(state)
+        )
+    )
+
+
+@celery_app.task(base=PipelineStageTask)
+def collect_translations_stage(results: list, state: dict) -> dict:
+    """
+    Aggregate the translated transcripts, their audios and the failures.
+    """
+    for result in results:
+        if result.get("language") and result.get("transcript_id"):
+            state["transcript_ids"].append(result["transcript_id"])
+        if result.get("audio_id"):
+            state.setdefault("audio_ids", []).append(result["audio_id"])
+        if result.get("error"):
+            state.setdefault("failures", []).append(result)
+
+    if state.get("failures"):
+        print(f"Panel pipeline: Failed translations or audio {state['failures']}")
+    return state
+
+
+@celery_app.task(base=PipelineStageTask)
+def finish_pipeline_stage(state: dict):
+    panel_id = state.get("panel_id")
+    transcript_ids = state.get("transcript_ids", [])
+    audio_ids = state.get("audio_ids", [])
+    print(f"Panel pipeline: Completed {panel_id=} {transcript_ids=} {audio_ids=}")
+
+    if state.get("result") == RESULT_TRANSCRIPTS:
+        return transcript_ids
+    if state.get("result") == RESULT_PANEL_TRANSCRIPTS:
+        return panel_id, transcript_ids
+    return panel_id, transcript_ids, audio_ids
+
+
+def build_panel_pipeline(
+    tokens: Optional[Tuple[str, str]],
+    request_data: PanelRequestData,
+    audio_request_data: Optional[PanelRequestData] = None,
+    use_service_account: bool = False,
+    result: str = RESULT_PANEL,
+) -> Signature:
+    """
+    Build the stage pipeline for generating a transcript for an existing panel.
+
+    :param tokens: Supabase tokens, or None when using the service account.
+    :param request_data: Request data with panel_id set.
+    :param audio_request_data: Request data for the audio stage, audio is not
+        created when not provided.
+    :param use_service_account: Use the service account client in the stages.
+    :param result: The shape of the pipeline result, one of RESULT_PANEL,
+        RESULT_PANEL_TRANSCRIPTS or RESULT_TRANSCRIPTS.
+    """
+    state = {
+        "tokens": list(tokens) if tokens else None,
+        "use_service_account": use_service_account,
+        "panel_id": str(request_data.panel_id),
+        "request_data_json": request_data.to_json(),
+        "audio_request_data_json": (
+            audio_request_data.to_json() if audio_request_data else None
+        ),
+        "result": result,
+    }
+
+    stages = [
+        prepare_transcript_stage.s(state),
+        fetch_sources_stage.s(),
+        group_sources_stage.s(),
+        resolve_links_stage.s(),
+        write_segments_stage.s(),
+        summarize_transcript_stage.s(),
+        translate_transcripts_stage.s(),
+        finish_pipeline_stage.s(),
+    ]
+
+    return chain(*stages)
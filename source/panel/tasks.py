@@ -2,18 +2,24 @@ import datetime
 import json
 from typing import Tuple
 from uuid import UUID
-from celery import Task, chord
+from celery import Signature, Task, chord
 from supabase import Client
 from croniter import croniter
 
 from app.core.celery_app import celery_app
+from source.chains.rate_limiter import batch_priority
 from app.core.supabase import (
     get_sync_supabase_client,
     get_sync_supabase_service_client,
 )
 from source.panel.panel import create_panel
-from source.panel.transcript import create_panel_transcript
 from source.panel.audio import create_panel_audio
+from source.panel.pipeline import (
+    RESULT_PANEL,
+    RESULT_PANEL_TRANSCRIPTS,
+    RESULT_TRANSCRIPTS,
+    build_panel_pipeline,
+)
 from source.helpers.communication import send_email_about_new_shows_task
 from source.models.structures.panel import (
     PanelRequestData,
@@ -23,10 +29,14 @@ from source.models.supabase.panel import PanelTranscript, PanelDiscussion, Panel
 from source.tasks.utils import collect_results
 
 
-@celery_app.task
-def create_panel_transcription_task(tokens: Tuple[str, str], request_data_json):
+@celery_app.task(bind=True)
+def create_panel_transcription_task(
+    self: Task, tokens: Tuple[str, str], request_data_json
+):
     request_data = PanelRequestData.model_validate_json(request_data_json)
-    return create_panel_transcript(tokens, request_data)
+    return self.replace(
+        build_panel_pipeline(tokens, request_data, result=RESULT_TRANSCRIPTS)
+    )
 
 
 @celery_app.task(bind=True)
@@ -37,9 +47,9 @@ def create_panel_w_transcript_task(
     panel_id = create_panel(tokens, request_data, self.request)
     request_data.panel_id = panel_id
 
-    transcript_ids = create_panel_transcript(tokens, request_data)
-
-    return panel_id, transcript_ids
+    return self.replace(
+        build_panel_pipeline(tokens, request_data, result=RESULT_PANEL_TRANSCRIPTS)
+    )
 
 
 @celery_app.task
@@ -61,14 +71,13 @@ def create_panel_task(
     panel_id = create_panel(tokens, request_data, self.request)
     request_data.panel_id = panel_id
 
-    transcript_ids = create_panel_transcript(tokens, request_data)
-    audio_ids = []
-    for transcript_id in transcript_ids:
-        audio_request_data = request_data.model_copy()
-        audio_request_data.transcript_id = transcript_id
-        audio_ids.append(create_panel_audio(tokens, audio_request_data))
-
-    return panel_id, transcript_ids, audio_ids
+    # The stages run as their own tasks, the result of this task is the
+    # result of the last stage
+    return self.replace(
+        build_panel_pipeline(
+            tokens, request_data, audio_request_data=request_data, result=RESULT_PANEL
+        )
+    )
 
 
 @celery_app.task(bind=True)
@@ -97,11 +106,13 @@ def generate_transcripts_task(
         if transcript.generation_cronjob != ""
     ]
 
-    # Create a chord to execute tasks in parallel and collect results
-    chord(
-        process_transcript_task.s(transcript.id, tokens, use_service_account)
-        for transcript in transcripts_with_cronjob
-    )(collect_results.s() | handle_transcript_cron_results.s())
+    # Create a chord to execute tasks in parallel and collect results, the
+    # scheduled generations give way to interactive llm calls
+    with batch_priority():
+        chord(
+            process_transcript_task.s(transcript.id, tokens, use_service_account)
+            for transcript in transcripts_with_cronjob
+        )(collect_results.s() | handle_transcript_cron_results.s())
 
 
 @celery_app.task
@@ -126,9 +137,9 @@ def handle_transcript_cron_results(new_transcript_ids):
         send_email_about_new_shows_task.delay(new_transcript_ids)
 
 
-@celery_app.task
+@celery_app.task(bind=True)
 def process_transcript_task(
-    transcript_id: UUID, tokens: Tuple[str, str], use_service_account=False
+    self: Task, transcript_id: UUID, tokens: Tuple[str, str], use_service_account=False
 ):
     supabase_client = (
         get_sync_supabase_service_client()
@@ -197,29 +208,28 @@ def process_transcript_task(
         # )
         # transcript_ids = [transcript.id for transcript in transcript_ids]
         # transcript_ids.append(transcript.id)
-        transcript_ids = process_transcript_generation(
-            tokens, transcript, panel, metadata, supabase_client
+        return self.replace(
+            build_transcript_generation_pipeline(
+                tokens,
+                transcript,
+                panel,
+                metadata,
+                supabase_client,
+                use_service_account,
+            )
         )
-        ret_ids = []
-        for transcript_id in transcript_ids:
-            if isinstance(transcript_id, list):
-                ret_ids.extend([str(id) for id in transcript_id])
-            else:
-                ret_ids.append(str(transcript_id))
-
-        return ret_ids
-        # return [str(transcript_id) for transcript_id in transcript_ids ]
     else:
         return None
 
 
-def process_transcript_generation(
+def build_transcript_generation_pipeline(
     tokens: Tuple,
     transcript: PanelTranscript,
     panel: PanelDiscussion,
     metadata: dict,
     supabase_client: Client,
-) -> list[UUID]:
+    use_service_account: bool = False,
+) -> Signature:
     # Extend the metadata with the PanelTranscript model
     transcript_metadata = (transcript.metadata or {}) if transcript is not None else {}
 
@@ -267,28 +277,18 @@ def process_transcript_generation(
         tts_config=metadata.get("tts_config", None),
     )
 
-    print(f"Generating timed transcript for {transcript.id}.")
-    if tokens is not None:
-        transcript_ids = create_panel_transcript(tokens, new_transcript_request)
-    else:
-        transcript_ids = create_panel_transcript(
-            tokens, new_transcript_request, supabase_client
-        )
-
-    metadata.update(audio_metadata)
+    audio_transcript_request = new_transcript_request.model_copy()
     conversation_config = conversation_config.model_copy(
         update=audio_metadata.get("conversation_config", {})
     )
-    metadata["conversation_config"] = conversation_config.model_dump()
-    new_transcript_request.tts_model = audio_metadata.get("tts_model", "elevenlabs")
-    new_transcript_request.conversation_config = conversation_config
-
-    for transcript_id in transcript_ids:
-        audio_transcript_request = new_transcript_request.model_copy()
-        audio_transcript_request.transcript_id = transcript_id
-        if tokens is not None:
-            create_panel_audio(tokens, audio_transcript_request)
-        else:
-            create_panel_audio(tokens, audio_transcript_request, supabase_client)
+    audio_transcript_request.tts_model = audio_metadata.get("tts_model", "elevenlabs")
+    audio_transcript_request.conversation_config = conversation_config
 
-    return transcript_ids
+    print(f"Generating timed transcript for {transcript.id}.")
+    return build_panel_pipeline(
+        tokens,
+        new_transcript_request,
+        audio_request_data=audio_transcript_request,
+        use_service_account=use_service_account or tokens is None,
+        result=RESULT_TRANSCRIPTS,
+    )
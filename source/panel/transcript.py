@@ -1,11 +1,11 @@
 import datetime
-import time
+import hashlib
 import os  # Import os module for path manipulation
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from uuid import UUID, uuid4
+from pydantic import BaseModel
 from supabase import Client
-from celery import group
-from celery.result import AsyncResult
+from celery import Signature
 from app.core.supabase import get_sync_supabase_client
 
 # from source.llm_exec.websource_exec import group_web_sources
@@ -18,10 +18,8 @@ from source.models.structures.panel import (
     ConversationConfig,
 )
 
-from source.helpers.sources import (
-    fetch_links,
-    manage_news_sources,
-)
+from source.helpers.episode_cache import get_episode_context
+from source.helpers.sources import manage_news_sources
 from source.llm_exec.panel.structure import transcript_combiner
 from source.llm_exec.panel.summary import transcript_summary_writer
 from source.llm_exec.panel.modify import transcript_translate
@@ -64,31 +62,6 @@ def fetch_panel_metadata_and_config(
     return conversation_config, metadata, panel
 
 
-def fetch_links_and_process_articles(
-    supabase_client: Client,
-    sources: List,
-    user_ids: UserIDs = None,
-    guidance="",
-    min_amount=5,
-    max_ids=5,
-    tokens: tuple = None,
-    previous_episodes: List[Tuple[PanelTranscript, str]] = None,
-) -> List[WebSource | WebSourceCollection]:
-    article_news_items = []
-    for news_item in fetch_links(
-        supabase_client,
-        sources,
-        user_ids=user_ids,
-        guidance=guidance,
-        min_amount=min_amount,
-        max_ids=max_ids,
-        tokens=tokens,
-        previous_episodes=previous_episodes,
-    ):
-        article_news_items.append(news_item)
-    return article_news_items
-
-
 def construct_transcript_title(
     panel: PanelDiscussion,
     conversation_config: ConversationConfig,
@@ -178,17 +151,15 @@ def create_and_update_panel_transcript(
     return panel_transcript
 
 
-def generate_transcripts(
+def build_transcript_tasks(
     conversation_config: ConversationConfig,
     input_text: str,
     sources: List[WebSourceCollection],
     longform: bool,
     previous_episodes: str = None,
-) -> Tuple[List[str], str]:
-    all_transcripts = []
+) -> Tuple[List[Signature], List[WebSourceCollection | WebSource | str]]:
     combined_sources = []
     total_count = len(sources) + 1
-    # Prepare tasks for parallel execution
     tasks = []
 
     if longform:
@@ -240,46 +211,82 @@ def generate_transcripts(
         )  # Set the task ID
         tasks.append(task)
 
-    # Execute tasks in parallel using Celery group
-    task_group = group(tasks)
-    async_result: AsyncResult = task_group.apply_async(disable_sync_subtasks=False)
-    start_time = time.time()
-    timeout = 30 * 60
-    elapsed_time = 0
-    while not async_result.ready() and elapsed_time < timeout:
-        elapsed_time = time.time() - start_time
-        print(
-            f"Build transcripts: Waiting for tasks to complete ({elapsed_time:.2f}s)..."
-        )
-        time.sleep(30)  # Sleep for 5 seconds to avoid busy-waiting
+    return tasks, combined_sources
 
-    if not async_result.ready() and elapsed_time >= timeout:
-        print("Timeout reached! Revoking pending tasks...")
-        for task in task_group:
-            if task is None or isinstance(task, str) or task.id is None:
-                print(f"Unable to resolve task: {task=}")
-                continue
-            async_task_result = AsyncResult(task.id)
-            task_state = async_task_result.state
-            if task_state == "PENDING":
-                async_task_result.revoke(terminate=False)  # Only cancel pending tasks
-                print(f"Task {task.id} revoked (state: {task_state}).")
-            else:
-                print(f"Task {task.id} not revoked (state: {task_state}).")
-
-    results = None
-    # Process results asynchronously
-    if async_result.successful():
-        results = async_result.get(disable_sync_subtasks=False)
+
+def combine_panel_transcripts(
+    all_transcripts: List[str],
+    combined_sources: List[WebSourceCollection | WebSource | str],
+    conversation_config: ConversationConfig,
+    previous_episodes: str = None,
+) -> str:
+    if len(combined_sources) > 1:
+        try:
+            final_transcript = transcript_combiner(
+                all_transcripts,
+                combined_sources,
+                conversation_config,
+                previous_episodes=previous_episodes,
+            )
+        except ValueError as e:
+            print(f"Skipping transcript combination due to error: {e}")
+            final_transcript = "\n\n".join(all_transcripts)
     else:
-        raise Exception("Error while generating transcripts...")
+        final_transcript = "\n\n".join(all_transcripts)
 
-    # Collect results
-    for result in results:
-        if result:  # Ensure the task succeeded
-            all_transcripts.append(result)
+    if not final_transcript:
+        raise ValueError("Unable to create transcript, check logs.")
 
-    return all_transcripts, combined_sources
+    return final_transcript
+
+
+def finalize_panel_transcript(
+    supabase_client: Client,
+    panel: PanelDiscussion,
+    panel_transcript: PanelTranscript,
+    final_transcript: str,
+    combined_sources: List[WebSourceCollection | WebSource | str],
+    conversation_config: ConversationConfig,
+    bucket_name: str,
+):
+    transcript_summaries = transcript_summary_writer(
+        final_transcript, combined_sources, conversation_config
+    )
+
+    panel_transcript.title = transcript_summaries.title
+    panel_transcript.metadata["subjects"] = transcript_summaries.subjects
+    panel_transcript.metadata["description"] = transcript_summaries.description
+
+    if "images" not in panel_transcript.metadata:
+        panel_transcript.metadata["images"] = []
+
+    for source in combined_sources:
+        if isinstance(source, WebSourceCollection):
+            panel_transcript.metadata["images"].extend(
+                [item.image for item in source.web_sources if item.image]
+            )
+        elif isinstance(source, WebSource):
+            panel_transcript.metadata["images"].append(source.image)
+
+    upload_transcript_to_supabase(
+        supabase_client,
+        panel,
+        panel_transcript,
+        final_transcript,
+        bucket_name,
+    )
+
+
+def mark_panel_transcript_failed(
+    supabase_client: Client, panel_transcript: PanelTranscript, error: Exception
+):
+    panel_transcript.process_state = ProcessState.failed
+    panel_transcript.process_state_message = str(error)
+    panel_transcript.update_sync(supabase=supabase_client)
+
+
+def transcript_content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
 
 def upload_transcript_to_supabase(
@@ -303,41 +310,52 @@ def upload_transcript_to_supabase(
     # Remove potential duplicates or empty strings from the list
     existing_file_paths = list(filter(None, set(existing_file_paths)))
 
+    if panel_transcript.metadata is None:
+        panel_transcript.metadata = {}
+    # SHA-256 of the content of each uploaded file, keyed by file path
+    file_hashes: dict = panel_transcript.metadata.setdefault("transcript_hashes", {})
+    content_hash = transcript_content_hash(final_transcript)
+
     for path_to_check in existing_file_paths:
-        try:
-            print(f"Checking for duplicate content against: {path_to_check}")
-            response = supabase_client.storage.from_(bucket_name).download(
-                path_to_check
-            )
-            existing_content = response.decode("utf-8")
-            if existing_content == final_transcript:
-                print(
-                    f"Duplicate content found matching existing file: {path_to_check}. Updating record to point to existing file."
+        if path_to_check not in file_hashes:
+            # Files uploaded before the hashes were recorded are hashed once
+            try:
+                print(f"Hashing content of existing file: {path_to_check}")
+                response = supabase_client.storage.from_(bucket_name).download(
+                    path_to_check
                 )
-                # Update file pointer to the existing duplicate
-                panel_transcript.file = path_to_check
-                # Ensure metadata and history list exist
-                if panel_transcript.metadata is None:
-                    panel_transcript.metadata = {}
-                history: List[str] = panel_transcript.metadata.setdefault(
-                    "transcript_history", []
+                file_hashes[path_to_check] = transcript_content_hash(
+                    response.decode("utf-8")
                 )
-                # Add the previous file path to history if it's valid and not already the last item
-                if (
-                    previous_file_path
-                    and previous_file_path != path_to_check
-                    and (not history or history[-1] != previous_file_path)
-                ):
-                    history.append(previous_file_path)
-                # Mark as done and save the updated record
-                panel_transcript.process_state = ProcessState.done
-                panel_transcript.update_sync(supabase=supabase_client)
-                return  # Exit early, record updated
-        except Exception as e:
-            # Log specific Supabase storage errors if possible, otherwise generic error
-            error_message = f"Warning: Could not check content of {path_to_check}: {getattr(e, 'message', repr(e))}"
-            print(error_message)
-            # Continue checking other files even if one fails
+            except Exception as e:
+                # Log specific Supabase storage errors if possible, otherwise generic error
+                error_message = f"Warning: Could not check content of {path_to_check}: {getattr(e, 'message', repr(e))}"
+                print(error_message)
+                # Continue checking other files even if one fails
+                continue
+
+        if file_hashes[path_to_check] == content_hash:
+            print(
+                f"Duplicate content found matching existing file: {path_to_check}. Updating record to point to existing file."
+            )
+            # Update file pointer to the existing duplicate
+            panel_transcript.file = path_to_check
+            history: List[str] = panel_transcript.metadata.setdefault(
+                "transcript_history", []
+            )
+            # Add the previous file path to history if it's valid and not already the last item
+            if (
+                previous_file_path
+                and previous_file_path != path_to_check
+                and (not history or history[-1] != previous_file_path)
+            ):
+                history.append(previous_file_path)
+            # Mark as done and save the updated record, including hashes
+            # recorded for older files
+            panel_transcript.process_state = ProcessState.done
+            panel_transcript.dirty = True
+            panel_transcript.update_sync(supabase=supabase_client)
+            return  # Exit early, record updated
 
     print("No duplicate content found. Proceeding with upload.")
     # --- End: Duplicate Content Check ---
@@ -378,6 +396,7 @@ def upload_transcript_to_supabase(
 
     # Update the transcript record with the new file path and state
     panel_transcript.file = bucket_transcript_file
+    file_hashes[bucket_transcript_file] = content_hash
     panel_transcript.process_state = ProcessState.done
     # update_sync saves the entire object, including metadata changes
     # Only call update_sync here if we actually uploaded a new file
@@ -385,185 +404,100 @@ def upload_transcript_to_supabase(
     print(f"Successfully uploaded new transcript version: {bucket_transcript_file}")
 
 
-def create_panel_transcript(
-    tokens: Tuple[str, str],
-    request_data: PanelRequestData,
-    supabase_client: Client = None,
-) -> list[UUID]:
-    supabase_client = initialize_supabase_client(tokens, supabase_client)
-    conversation_config, metadata, panel = fetch_panel_metadata_and_config(
-        supabase_client, request_data.panel_id, request_data
-    )
-
-    title = construct_transcript_title(panel, conversation_config, request_data)
-    panel_transcript = create_and_update_panel_transcript(
-        supabase_client,
-        request_data,
-        title,
-        conversation_config,
-        request_data.longform,
-        (conversation_config.output_language if conversation_config else "en"),
-    )
-    transcript_ids = []
-    try:
-        user_ids = (
-            UserIDs(
-                user_id=request_data.owner_id,
-                organization_id=request_data.organization_id,
-            )
-            if request_data.organization_id
-            else None
+def get_request_user_ids(request_data: PanelRequestData) -> UserIDs | None:
+    return (
+        UserIDs(
+            user_id=request_data.owner_id,
+            organization_id=request_data.organization_id,
         )
+        if request_data.organization_id
+        else None
+    )
 
-        sources = manage_news_sources(request_data, metadata)
-
-        input_sources = set()
-
-        if request_data.input_source:
-            input_sources.update(
-                request_data.input_source
-                if isinstance(request_data.input_source, list)
-                else [request_data.input_source]
-            )
-
-        if metadata.get("input_source"):
-            metadata_sources = (
-                metadata["input_source"]
-                if isinstance(metadata["input_source"], list)
-                else [metadata["input_source"]]
-            )
-            input_sources.update(metadata_sources)
 
-        if metadata.get("urls"):
-            metadata_urls = (
-                metadata["urls"]
-                if isinstance(metadata["urls"], list)
-                else [metadata["urls"]]
-            )
-            input_sources.update(metadata_urls)
+def collect_transcript_sources(
+    request_data: PanelRequestData, metadata: dict
+) -> List[str | list | BaseModel]:
+    sources = manage_news_sources(request_data, metadata)
 
-        if len(input_sources) > 0:
-            sources.extend(list(input_sources))
+    input_sources = set()
 
-        previous_transcripts_with_content = load_last_transcripts_with_content(
-            supabase_client, request_data.panel_id, 5
+    if request_data.input_source:
+        input_sources.update(
+            request_data.input_source
+            if isinstance(request_data.input_source, list)
+            else [request_data.input_source]
         )
 
-        ordered_groups = fetch_links_and_process_articles(
-            supabase_client,
-            sources,
-            user_ids,
-            guidance=request_data.news_guidance,
-            min_amount=request_data.segments,
-            max_ids=request_data.news_items,
-            tokens=tokens,
-            previous_episodes=previous_transcripts_with_content,
+    if metadata.get("input_source"):
+        metadata_sources = (
+            metadata["input_source"]
+            if isinstance(metadata["input_source"], list)
+            else [metadata["input_source"]]
         )
+        input_sources.update(metadata_sources)
 
-        for item in ordered_groups:
-            item.create_panel_transcript_source_reference_sync(
-                supabase_client, panel_transcript, user_ids
-            )
-
-        # ordered_groups = group_web_sources(web_sources)
+    if metadata.get("urls"):
+        metadata_urls = (
+            metadata["urls"]
+            if isinstance(metadata["urls"], list)
+            else [metadata["urls"]]
+        )
+        input_sources.update(metadata_urls)
 
-        previous_episodes = ""
+    if len(input_sources) > 0:
+        sources.extend(list(input_sources))
 
-        for transcript, content in previous_transcripts_with_content:
-            previous_episodes = f"Episode {transcript.created_at.strftime('%Y-%m-%d (%a) %H:%M:%S')}:\nTitle: {transcript.title}\nTranscript:\n{content}\n\n"
-            print(
-                f"Episode {transcript.created_at.strftime('%Y-%m-%d (%a) %H:%M:%S')}:\nTitle: {transcript.title}"
-            )
+    return sources
 
-        all_transcripts, combined_sources = generate_transcripts(
-            conversation_config,
-            (
-                request_data.input_text
-                if request_data.input_text
-                else metadata.get("input_text", "")
-            ),
-            ordered_groups,
-            request_data.longform,
-            previous_episodes=previous_episodes,
-        )
-        if len(combined_sources) > 1:
-            try:
-                final_transcript = transcript_combiner(
-                    all_transcripts,
-                    combined_sources,
-                    conversation_config,
-                    previous_episodes=previous_episodes,
-                )
-            except ValueError as e:
-                print(f"Skipping transcript combination due to error: {e}")
-                final_transcript = "\n\n".join(all_transcripts)
-        else:
-            final_transcript = "\n\n".join(all_transcripts)
 
-        if not final_transcript:
-            raise ValueError("Unable to create transcript, check logs.")
+def format_previous_episodes(
+    previous_episodes_with_summary: List[Tuple[PanelTranscript, str]],
+) -> str:
+    previous_episodes = ""
 
-        transcript_summaries = transcript_summary_writer(
-            final_transcript, combined_sources, conversation_config
+    for transcript, summary in previous_episodes_with_summary:
+        previous_episodes += f"Episode {transcript.created_at.strftime('%Y-%m-%d (%a) %H:%M:%S')}:\nTitle: {transcript.title}\n{summary}\n\n"
+        print(
+            f"Episode {transcript.created_at.strftime('%Y-%m-%d (%a) %H:%M:%S')}:\nTitle: {transcript.title}"
         )
 
-        panel_transcript.title = transcript_summaries.title
-        panel_transcript.metadata["subjects"] = transcript_summaries.subjects
-        panel_transcript.metadata["description"] = transcript_summaries.description
+    return previous_episodes
 
-        if "images" not in panel_transcript.metadata:
-            panel_transcript.metadata["images"] = []
 
-        for source in combined_sources:
-            if isinstance(source, WebSourceCollection):
-                panel_transcript.metadata["images"].extend(
-                    [item.image for item in source.web_sources if item.image]
-                )
-            elif isinstance(source, WebSource):
-                panel_transcript.metadata["images"].append(source.image)
+def get_request_input_text(request_data: PanelRequestData, metadata: dict) -> str:
+    return (
+        request_data.input_text
+        if request_data.input_text
+        else metadata.get("input_text", "")
+    )
 
-        # panel_transcript.metadata["images"] = [
-        #     str(web_source.image)
-        #     for collection in combined_sources
-        #     if isinstance(collection, WebSourceCollection)
-        #     for web_source in collection.web_sources
-        #     if isinstance(web_source, WebSource) and web_source.image
-        # ]
 
-        transcript_ids.append(panel_transcript.id)
+def start_panel_transcript(
+    supabase_client: Client, request_data: PanelRequestData
+) -> Tuple[PanelTranscript, ConversationConfig, dict, PanelDiscussion]:
+    conversation_config, metadata, panel = fetch_panel_metadata_and_config(
+        supabase_client, request_data.panel_id, request_data
+    )
 
-        upload_transcript_to_supabase(
-            supabase_client,
-            panel,
-            panel_transcript,
-            final_transcript,
-            request_data.bucket_name,
-        )
+    title = construct_transcript_title(panel, conversation_config, request_data)
+    panel_transcript = create_and_update_panel_transcript(
+        supabase_client,
+        request_data,
+        title,
+        conversation_config,
+        request_data.longform,
+        (conversation_config.output_language if conversation_config else "en"),
+    )
+    return panel_transcript, conversation_config, metadata, panel
 
-        if metadata.get("languages"):
-            languages = metadata.get("languages")
-            for language in languages:
-                if str(language) == panel_transcript.lang:
-                    continue
-                transcript_ids.append(
-                    create_panel_transcript_translation(
-                        request_data=request_data,
-                        panel=panel,
-                        parent_transcript=panel_transcript,
-                        transcript=final_transcript,
-                        language=language,
-                        sources=ordered_groups,
-                        combined_sources=combined_sources,
-                        supabase_client=supabase_client,
-                    )
-                )
-    except Exception as e:
-        panel_transcript.process_state = ProcessState.failed
-        panel_transcript.process_state_message = str(e)
-        panel_transcript.update_sync(supabase=supabase_client)
-        raise RuntimeError("Failed to generate podcast transcript") from e
 
-    return transcript_ids
+def get_translation_languages(metadata: dict, panel_transcript: PanelTranscript):
+    return [
+        language
+        for language in (metadata.get("languages") or [])
+        if str(language) != panel_transcript.lang
+    ]
 
 
 def create_panel_transcript_translation(
@@ -575,7 +509,12 @@ def create_panel_transcript_translation(
     sources: List[WebSource | WebSourceCollection],
     combined_sources: List[WebSource | WebSourceCollection | str] = [],
     supabase_client: Client = None,
-) -> UUID:
+) -> Tuple[UUID, Optional[Exception]]:
+    """
+    Translate the transcript and create its record. Returns the id of the
+    translated transcript and, when the translation failed, the error. The
+    transcript is then marked as failed.
+    """
     conversation_config, metadata, panel = fetch_panel_metadata_and_config(
         supabase_client, panel, request_data
     )
@@ -583,14 +522,7 @@ def create_panel_transcript_translation(
     conversation_config = conversation_config.model_copy()
     conversation_config.output_language = language
 
-    user_ids = (
-        UserIDs(
-            user_id=request_data.owner_id,
-            organization_id=request_data.organization_id,
-        )
-        if request_data.organization_id
-        else None
-    )
+    user_ids = get_request_user_ids(request_data)
 
     title = construct_transcript_title(panel, conversation_config, request_data)
     panel_transcript = create_and_update_panel_transcript(
@@ -634,34 +566,19 @@ def create_panel_transcript_translation(
             request_data.bucket_name,
         )
     except Exception as e:
-        panel_transcript.process_state = ProcessState.failed
-        panel_transcript.process_state_message = str(e)
-        panel_transcript.update_sync(supabase=supabase_client)
-        # raise RuntimeError("Failed to generate podcast transcript") from e
+        mark_panel_transcript_failed(supabase_client, panel_transcript, e)
+        return panel_transcript.id, e
 
-    return panel_transcript.id
+    return panel_transcript.id, None
 
 
-def load_last_transcripts_with_content(
+def fetch_last_transcripts(
     supabase_client: Client, panel_id: UUID, num_transcripts: int, lang: str = "en"
-) -> List[Tuple[PanelTranscript, str]]:
+) -> List[PanelTranscript]:
     """
-    Load the last N transcripts for a given panelId from Supabase, including their content.
-
-    Args:
-        supabase_client (Client): The Supabase client instance.
-        panel_id (UUID): The ID of the panel.
-        num_transcripts (int): The number of transcripts to fetch.
-
-    Returns:
-        List[Tuple[PanelTranscript, str]]: A list of tuples, each containing a transcript object and its content.
+    Fetch the last N finished transcripts of the past week for a given panelId,
+    oldest first.
     """
-    # Fetch transcripts for the given panel_id
-    # transcripts = PanelTranscript.fetch_existing_from_supabase_sync(
-    #     supabase_client,
-    #     filter={"panel_id": str(panel_id)},
-    # )
-
     transcripts = PanelTranscript.fetch_existing_from_supabase_sync(
         supabase_client,
         filter={
@@ -675,33 +592,34 @@ def load_last_transcripts_with_content(
     )
 
     # Sort by updated_at in descending order and limit to num_transcripts
-    # transcripts = [
-    #     t
-    #     for t in transcripts
-    #     if t.process_state == ProcessState.done
-    #     and (not t.lang or str(t.lang) == str(lang))
-    # ]
-    transcripts.sort(key=lambda t: t.updated_at)
+    transcripts.sort(key=lambda t: t.updated_at, reverse=True)
     transcripts = transcripts[:num_transcripts]
+    transcripts.reverse()
+    return transcripts
 
-    # Load content from Supabase storage for each transcript
-    transcript_tuples = []
-    for transcript in transcripts:
-        bucket_name = transcript.bucket_id
-        file_path = transcript.file
 
-        # Download the file content from Supabase storage
-        try:
-            print(
-                f"Load transcript: {transcript.title}, from {bucket_name} with name {file_path}"
-            )
-            response = supabase_client.storage.from_(bucket_name).download(file_path)
-            transcript_content = response.decode("utf-8")  # Decode the content
-        except Exception as e:
-            print(f"Failed to load transcript {transcript.title} because {repr(e)}")
-            continue
+def load_previous_episodes(
+    supabase_client: Client, panel_id: UUID, num_transcripts: int, lang: str = "en"
+) -> List[Tuple[PanelTranscript, str]]:
+    """
+    Load the last N transcripts for a given panelId with a compact summary of
+    each, for the previous_episodes prompts.
+
+    Args:
+        supabase_client (Client): The Supabase client instance.
+        panel_id (UUID): The ID of the panel.
+        num_transcripts (int): The number of transcripts to fetch.
 
-        # Append the tuple (transcript, content) to the result list
-        transcript_tuples.append((transcript, transcript_content))
+    Returns:
+        List[Tuple[PanelTranscript, str]]: A list of tuples, each containing a transcript object and its summary.
+    """
+    episodes = []
+    for transcript in fetch_last_transcripts(
+        supabase_client, panel_id, num_transcripts, lang
+    ):
+        episode = get_episode_context(supabase_client, transcript)
+        if episode is None:
+            continue
+        episodes.append((transcript, episode.summary))
 
-    return transcript_tuples
+    return episodes
@@ -29,8 +29,13 @@ def resolve_and_store_link_task(serialized_web_source, tokens, serialized_user_i
     else:
         supabase_client = get_sync_supabase_service_client()
 
-    # Call resolve_and_store_link and return the result
-    return web_source.resolve_and_store_link(supabase_client, user_ids)
+    # Call resolve_and_store_link and return the result, a failed link must
+    # not fail the chord the task is part of
+    try:
+        return web_source.resolve_and_store_link(supabase_client, user_ids)
+    except Exception as e:
+        print(f"Failed to resolve and store {web_source.original_source}: {e}")
+        return False
 
 
 def generate_resolve_tasks_for_websources(web_sources, tokens, user_ids):
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+from source.helpers.acl_cache import ACLSnapshot
+
+PANEL_A = uuid4()
+PANEL_B = uuid4()
+SOURCE_A = uuid4()
+
+
+def _snapshot():
+    rows = [
+        SimpleNamespace(item_type="panel", item_id=PANEL_A),
+        SimpleNamespace(item_type="source", item_id=SOURCE_A),
+    ]
+    return ACLSnapshot(rows, [uuid4()])
+
+
+def test_filter_accessible_keeps_order_and_type():
+    snapshot = _snapshot()
+
+    assert snapshot.filter_accessible([PANEL_B, PANEL_A, SOURCE_A], "panel") == [
+        PANEL_A
+    ]
+    assert snapshot.filter_accessible([SOURCE_A, PANEL_A], "source") == [SOURCE_A]
+
+
+def test_filter_accessible_matches_string_ids():
+    snapshot = _snapshot()
+
+    assert snapshot.filter_accessible([str(PANEL_A)], "panel") == [str(PANEL_A)]
+
+
+def test_filter_accessible_unknown_type():
+    assert _snapshot().filter_accessible([PANEL_A], "transcript") == []
+
+
+def test_has_access():
+    snapshot = _snapshot()
+
+    assert snapshot.has_access(PANEL_A, "panel")
+    assert not snapshot.has_access(PANEL_A, "source")
+    assert not snapshot.has_access(PANEL_B, "panel")
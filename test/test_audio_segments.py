@@ -0,0 +1,23 @@
+from source.panel.audio import split_transcript_segments
+
+
+def test_split_transcript_segments_in_order():
+    transcript = (
+        "<Person1>Welcome to the show.</Person1>\n"
+        '<Person2 voice="b">Thanks,\nglad to be here.</Person2>\n'
+        "<Person1>Let's start.</Person1>"
+    )
+    assert split_transcript_segments(transcript) == [
+        (1, "<Person1>Welcome to the show.</Person1>"),
+        (2, '<Person2 voice="b">Thanks,\nglad to be here.</Person2>'),
+        (1, "<Person1>Let's start.</Person1>"),
+    ]
+
+
+def test_split_transcript_segments_needs_matching_close_tag():
+    transcript = "<Person1>Hello</Person2><Person2>Hi</Person2>"
+    assert split_transcript_segments(transcript) == [(2, "<Person2>Hi</Person2>")]
+
+
+def test_split_transcript_segments_without_tags():
+    assert split_transcript_segments("  Just text.\n") == [(1, "Just text.")]
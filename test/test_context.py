@@ -0,0 +1,45 @@
+import pytest
+
+from source.llm_exec.panel import context
+from source.llm_exec.panel.context import allocate_tokens, trim_to_tokens
+
+
+@pytest.fixture(autouse=True)
+def no_tokenizer(monkeypatch):
+    # Count with CHARS_PER_TOKEN so the results do not depend on tiktoken
+    monkeypatch.setattr(context, "_get_encoding", lambda model: None)
+
+
+def test_allocate_tokens_keeps_sections_that_fit():
+    assert allocate_tokens([10, 20], [1, 1], 100) == [10, 20]
+
+
+def test_allocate_tokens_gives_unused_share_to_larger_sections():
+    assert allocate_tokens([100, 1000, 1000], [1, 1, 1], 1200) == [100, 550, 550]
+
+
+def test_allocate_tokens_splits_by_weight():
+    assert allocate_tokens([1000, 1000], [2, 1], 300) == [200, 100]
+
+
+def test_allocate_tokens_empty():
+    assert allocate_tokens([], [], 100) == []
+
+
+def test_trim_to_tokens_leaves_short_text():
+    text = "a" * 100
+    assert trim_to_tokens(text, 100) == text
+
+
+def test_trim_to_tokens_ends_on_sentence():
+    text = "x" * 80 + ". " + "y" * 40
+    assert trim_to_tokens(text, 25) == "x" * 80 + ". ..."
+
+
+def test_trim_to_tokens_ends_on_paragraph():
+    text = "x" * 90 + "\n\n" + "y" * 40
+    assert trim_to_tokens(text, 25) == "x" * 90 + " ..."
+
+
+def test_trim_to_tokens_cuts_without_boundary():
+    assert trim_to_tokens("z" * 200, 10) == "z" * 40 + " ..."
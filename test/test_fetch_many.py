@@ -0,0 +1,106 @@
+import asyncio
+from types import SimpleNamespace
+from typing import ClassVar, Optional
+
+from source.models.supabase.supabase_model import SupabaseModel
+
+
+class Item(SupabaseModel):
+    TABLE_NAME: ClassVar[str] = "items"
+
+    id: str
+    parent_id: Optional[str] = None
+
+
+ROWS = [{"id": str(i), "parent_id": str(i % 2)} for i in range(7)]
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.column = None
+        self.values = None
+
+    def select(self, columns):
+        return self
+
+    def in_(self, column, values):
+        self.column = column
+        self.values = values
+        self.client.queries.append((self.table, column, list(values)))
+        return self
+
+    def _response(self):
+        rows = [row for row in ROWS if row[self.column] in self.values]
+        return SimpleNamespace(data=rows)
+
+    def execute(self):
+        if self.client.is_async:
+            return self._execute_async()
+        return self._response()
+
+    async def _execute_async(self):
+        return self._response()
+
+
+class FakeSupabase:
+    def __init__(self, is_async=False):
+        self.is_async = is_async
+        self.queries = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def test_fetch_many_queries_in_chunks():
+    supabase = FakeSupabase()
+    ids = ["0", "1", "2", "3", "4", "5", "6"]
+
+    items = Item.fetch_many_from_supabase_sync(supabase, ids, chunk_size=3)
+
+    assert supabase.queries == [
+        ("items", "id", ["0", "1", "2"]),
+        ("items", "id", ["3", "4", "5"]),
+        ("items", "id", ["6"]),
+    ]
+    assert sorted(items) == ids
+    assert all(not item.dirty for item in items.values())
+
+
+def test_fetch_many_skips_duplicates_and_empty_values():
+    supabase = FakeSupabase()
+
+    items = Item.fetch_many_from_supabase_sync(
+        supabase, ["1", 1, None, "", "2", "missing"], chunk_size=2
+    )
+
+    assert supabase.queries == [
+        ("items", "id", ["1", "2"]),
+        ("items", "id", ["missing"]),
+    ]
+    assert sorted(items) == ["1", "2"]
+
+
+def test_fetch_many_without_values_runs_no_query():
+    supabase = FakeSupabase()
+
+    assert Item.fetch_many_from_supabase_sync(supabase, []) == {}
+    assert supabase.queries == []
+
+
+def test_fetch_grouped_async_groups_by_column():
+    supabase = FakeSupabase(is_async=True)
+
+    grouped = asyncio.run(
+        Item.fetch_grouped_from_supabase(
+            supabase, ["0", "1"], id_column="parent_id", chunk_size=1
+        )
+    )
+
+    assert supabase.queries == [
+        ("items", "parent_id", ["0"]),
+        ("items", "parent_id", ["1"]),
+    ]
+    assert [item.id for item in grouped["0"]] == ["0", "2", "4", "6"]
+    assert [item.id for item in grouped["1"]] == ["1", "3", "5"]
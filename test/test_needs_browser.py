@@ -0,0 +1,40 @@
+from source.helpers.resolve_url import (
+    JS_MARKER_MAX_TEXT_LENGTH,
+    MIN_HTTP_TEXT_LENGTH,
+    needs_browser,
+)
+
+URL = "https://example.com/article"
+ARTICLE_TEXT = "word " * (JS_MARKER_MAX_TEXT_LENGTH // 5 + 1)
+
+
+def test_full_article_does_not_need_browser():
+    assert not needs_browser(200, URL, "<html><p>...</p></html>", ARTICLE_TEXT)
+
+
+def test_error_status_needs_browser():
+    assert needs_browser(403, URL, "<html></html>", ARTICLE_TEXT)
+
+
+def test_consent_redirect_needs_browser():
+    assert needs_browser(
+        200, "https://consent.example.com/?continue=1", "<html></html>", ARTICLE_TEXT
+    )
+
+
+def test_cloudflare_challenge_needs_browser():
+    content = "<html><title>Just a moment...</title><div id='cf-chl'></div></html>"
+    assert needs_browser(200, URL, content, ARTICLE_TEXT)
+
+
+def test_short_text_needs_browser():
+    text = "x" * (MIN_HTTP_TEXT_LENGTH - 1)
+    assert needs_browser(200, URL, "<html></html>", text)
+    assert needs_browser(200, URL, "<html></html>", None)
+
+
+def test_js_marker_only_counts_for_short_pages():
+    content = "<html><noscript>Please enable JavaScript</noscript></html>"
+    short_text = "x" * (JS_MARKER_MAX_TEXT_LENGTH - 1)
+    assert needs_browser(200, URL, content, short_text)
+    assert not needs_browser(200, URL, content, ARTICLE_TEXT)
@@ -0,0 +1,104 @@
+import pytest
+
+from source.helpers import resolve_cache, resolve_url
+from source.helpers.resolve_cache import (
+    get_cached_failure,
+    normalize_url,
+    store_url_failure,
+)
+from source.helpers.resolve_url import LinkResolver, UnresolvableUrlError
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.expiry[key] = ex
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(resolve_cache, "get_sync_redis_client", lambda: client)
+    return client
+
+
+def test_normalize_url_lowercases_scheme_and_host():
+    assert normalize_url("HTTPS://Example.COM/Path") == "https://example.com/Path"
+
+
+def test_normalize_url_strips_default_port_and_fragment():
+    assert normalize_url("http://example.com:80/a#comments") == "http://example.com/a"
+    assert normalize_url("https://example.com:443") == "https://example.com/"
+    assert normalize_url("https://example.com:8443/a") == "https://example.com:8443/a"
+
+
+def test_normalize_url_drops_tracking_params_and_sorts_query():
+    assert (
+        normalize_url(
+            "https://example.com/a?utm_source=rss&b=2&fbclid=x&a=1&UTM_medium=feed"
+        )
+        == "https://example.com/a?a=1&b=2"
+    )
+
+
+def test_normalize_url_same_article_from_different_feeds():
+    assert normalize_url("https://example.com/a?id=1&utm_source=x") == normalize_url(
+        "https://EXAMPLE.com/a?utm_campaign=y&id=1#top"
+    )
+
+
+def test_store_url_failure_expires(redis_client):
+    store_url_failure("https://example.com/a?utm_source=x", "404")
+
+    assert get_cached_failure("https://example.com/a") == "404"
+    assert list(redis_client.expiry.values()) == [resolve_cache.FAILED_URL_TTL]
+
+
+def test_get_cached_failure_without_redis(monkeypatch):
+    def unavailable():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(resolve_cache, "get_sync_redis_client", unavailable)
+    assert get_cached_failure("https://example.com/a") is None
+
+
+@pytest.fixture
+def resolver(monkeypatch, redis_client):
+    monkeypatch.setattr(resolve_url, "get_cached_url_result", lambda url: None)
+    return LinkResolver()
+
+
+def test_resolve_url_caches_unresolvable_url(monkeypatch, resolver):
+    calls = []
+
+    def resolve(*args):
+        calls.append(args)
+        raise UnresolvableUrlError("Page returned 404")
+
+    monkeypatch.setattr(resolver, "_resolve_url_sync", resolve)
+
+    for _ in range(2):
+        with pytest.raises(UnresolvableUrlError):
+            resolver.resolve_url("https://example.com/a")
+
+    assert len(calls) == 1
+    assert get_cached_failure("https://example.com/a") == "Page returned 404"
+
+
+def test_resolve_url_does_not_cache_transient_errors(monkeypatch, resolver):
+    def resolve(*args):
+        raise TimeoutError("timed out")
+
+    monkeypatch.setattr(resolver, "_resolve_url_sync", resolve)
+
+    with pytest.raises(TimeoutError):
+        resolver.resolve_url("https://example.com/a")
+
+    assert get_cached_failure("https://example.com/a") is None
@@ -0,0 +1,79 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from source.helpers import tts_cache
+from source.helpers.tts_cache import evict_clips, utterance_cache_key
+
+VOICE = SimpleNamespace(voice="alloy", speed=1.0)
+CONFIG = SimpleNamespace(api_key="secret", output_format="mp3")
+
+
+def test_utterance_cache_key_normalizes_whitespace():
+    assert utterance_cache_key(
+        "Hello   there,\n world ", VOICE, "tts-1", CONFIG
+    ) == utterance_cache_key("Hello there, world", VOICE, "tts-1", CONFIG)
+
+
+def test_utterance_cache_key_ignores_api_key():
+    other_config = SimpleNamespace(api_key="other", output_format="mp3")
+    assert utterance_cache_key("Hello", VOICE, "tts-1", CONFIG) == (
+        utterance_cache_key("Hello", VOICE, "tts-1", other_config)
+    )
+
+
+def test_utterance_cache_key_depends_on_voice_and_model():
+    key = utterance_cache_key("Hello", VOICE, "tts-1", CONFIG)
+    other_voice = SimpleNamespace(voice="echo", speed=1.0)
+    assert key != utterance_cache_key("Hello", other_voice, "tts-1", CONFIG)
+    assert key != utterance_cache_key("Hello", VOICE, "tts-1-hd", CONFIG)
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_cache.SETTINGS, "tts_cache_path", str(tmp_path))
+    return tmp_path
+
+
+def _write_clip(cache_path, key, size, age):
+    directory = cache_path / key[:2]
+    directory.mkdir(exist_ok=True)
+    clip_path = directory / f"{key}.{tts_cache.CLIP_FORMAT}"
+    text_path = directory / f"{key}.txt"
+    clip_path.write_bytes(b"0" * size)
+    text_path.write_text("text")
+    mtime = time.time() - age
+    for path in (clip_path, text_path):
+        os.utime(path, (mtime, mtime))
+    return clip_path, text_path
+
+
+def test_evict_clips_removes_oldest_first(cache_path):
+    oldest = _write_clip(cache_path, "aa1", 100, 3 * 60 * 60)
+    older = _write_clip(cache_path, "bb2", 100, 2 * 60 * 60)
+    newer = _write_clip(cache_path, "cc3", 100, 2 * 60 * 60 - 60)
+
+    evict_clips(250)
+
+    assert not any(path.exists() for path in oldest)
+    assert all(path.exists() for path in older + newer)
+
+
+def test_evict_clips_keeps_recent_clips(cache_path):
+    old = _write_clip(cache_path, "aa1", 100, 3 * 60 * 60)
+    recent = _write_clip(cache_path, "bb2", 100, 60)
+
+    evict_clips(50)
+
+    assert not any(path.exists() for path in old)
+    assert all(path.exists() for path in recent)
+
+
+def test_evict_clips_within_max_size(cache_path):
+    clip = _write_clip(cache_path, "aa1", 100, 3 * 60 * 60)
+
+    evict_clips(1000)
+
+    assert all(path.exists() for path in clip)